@@ -7,6 +7,7 @@ from farmbot_interfaces.srv import StringRepReq
 from camera_handler.panorama import Panorama
 from camera_handler.calib import CalibrateCamera
 from camera_handler.plant_detection import PlantDetection
+from camera_handler.processing_queue import ProcessingQueue
 import math
 
 class CameraController(Node):
@@ -17,6 +18,9 @@ class CameraController(Node):
         self.panorama_ = Panorama(self)
         self.calib_ = CalibrateCamera(self)
         self.plant_detection_ = PlantDetection(self)
+        # The pictures are processed in the background, the gantry only waits for them to be taken
+        self.declare_parameter('max_queued_pictures', 10)
+        self.processing_ = ProcessingQueue(self, self.get_parameter('max_queued_pictures').get_parameter_value().integer_value)
         # Sequencing Service Server
         self.panorama_sequencing_server_ = self.create_service(StringRepReq, 'panorama_sequence', self.panorama_server_callback)
 
@@ -33,7 +37,9 @@ class CameraController(Node):
     def stitch_image_server(self, request, response):
         '''
         Service server that handles the luxonis camera node.
-        Primary task is taking a picture of the map and stitching it accordingly
+        Primary task is taking a picture of the map and stitching it accordingly.
+        The server answers once the picture is taken, the stitching (or mosaic
+        saving, weed detection) is queued and runs in the background
         '''
         # Assuming request success
         response.data = 'SUCCESS'
@@ -52,17 +58,18 @@ class CameraController(Node):
             return response
         elif request.data.split(' ')[0] == 'MAP':
             info = request.data.split(' ')
-            self.panorama_.map_x = float(info[1])
-            self.panorama_.map_y = float(info[2])
-            self.get_logger().info(f'Updated camera map dimensions to {self.panorama_.map_x} and {self.panorama_.map_y}')
+            self.panorama_.set_map_dimensions(float(info[1]), float(info[2]))
+            self.get_logger().info(f'Updated camera map dimensions to {info[1]} and {info[2]}')
         elif request.data.split(' ')[0] == 'MOSAIC':
             # Save image for mosaic
             # Sequencing constructed successfully and server returns it
-            self.panorama_.save_image_for_mosaic(num = int(msg[1]))
-            self.get_logger().info('Picture saved for mosaic successfully')
+            self.processing_.submit('Mosaic picture', self.panorama_.save_image_for_mosaic,
+                                    int(msg[1]), self.grab(self.panorama_.rgb_image_), panorama = True)
+            self.get_logger().info('Picture taken for the mosaic')
         elif request.data.split(' ')[0] == 'DETECT_WEEDS':
-            self.plant_detection_.detect_weeds(x = float(msg[1]), y = float(msg[2]))
-            self.get_logger().info('Weed detection ran successfully')
+            self.processing_.submit('Weed detection', self.plant_detection_.detect_weeds,
+                                    float(msg[1]), float(msg[2]), self.grab(self.plant_detection_.rgb_image))
+            self.get_logger().info('Picture taken for the weed detection')
         elif len(msg) == 3: # Ensuring the command information is complete
             if float(msg[2]) != 0.0:    # Ensuring the z-axis is homed
                 self.get_logger().warn('Z Axis is not in home position for the panorama stitching! Panorama command cancelled')
@@ -70,8 +77,9 @@ class CameraController(Node):
                 return response
             # Stitch image to panorama
             # Sequencing constructed successfully and server returns it
-            self.panorama_.stitch_image_onto_map(x = float(msg[0]), y = float(msg[1]))
-            self.get_logger().info('Picture stitched to the panorama successfully')
+            self.processing_.submit('Panorama stitching', self.panorama_.stitch_image_onto_map,
+                                    float(msg[0]), float(msg[1]), self.grab(self.panorama_.rgb_image_), panorama = True)
+            self.get_logger().info('Picture taken for the panorama')
         else:
             self.get_logger.warn('Command not recognized! Request ignored')
             response.data = 'FAILED'
@@ -79,6 +87,14 @@ class CameraController(Node):
 
         return response
 
+    def grab(self, image):
+        '''
+        Copies the latest frame of the camera for a queued job, so the job processes the
+        picture taken at the pose of the request even if a later frame replaced it
+        (None if no frame arrived yet)
+        '''
+        return image.copy() if image is not None else None
+
     def calibration_server_callback(self, request, response):
         '''
         Service server that handles the luxonis camera calibration.
@@ -117,13 +133,14 @@ class CameraController(Node):
         x_inc, y_inc = self.panorama_.get_panorama_increments()
         self.get_logger().info(f'Panorama increments {x_inc}, {y_inc}')
 
-        if self.panorama_.map_x != -1.0 and self.panorama_.map_y != -1.0:
-            self.get_logger().info(f'Panorama max_x: {self.panorama_.map_x}, map_y: {self.panorama_.map_y}')
-            x_pos_count = math.ceil(self.panorama_.map_x / x_inc)
-            y_pos_count = math.ceil(self.panorama_.map_y / y_inc)
+        map_x, map_y = self.panorama_.map_dimensions()
+        if map_x != -1.0 and map_y != -1.0:
+            self.get_logger().info(f'Panorama max_x: {map_x}, map_y: {map_y}')
+            x_pos_count = math.ceil(map_x / x_inc)
+            y_pos_count = math.ceil(map_y / y_inc)
 
-            x_inc = self.panorama_.map_x / x_pos_count
-            y_inc = self.panorama_.map_y / y_pos_count
+            x_inc = map_x / x_pos_count
+            y_inc = map_y / y_pos_count
             num = int(1)
 
             for y_pos in range(y_pos_count + 1):
@@ -146,6 +163,7 @@ class CameraController(Node):
                         seq += 'VC_P\nPAN\n'
                     num += 1
 
+            self.processing_.expect(num - 1)
             self.get_logger().info('Panorama sequence formed successfully')
         else:
             self.get_logger().warn('Could not form panorama sequence')
@@ -166,6 +184,8 @@ def main(args = None):
     except KeyboardInterrupt:
         pass
 
+    # Finish processing the pictures taken
+    camera_controller.processing_.stop()
     rclpy.shutdown()
 
 if __name__ == '__main__':
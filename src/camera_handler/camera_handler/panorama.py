@@ -6,6 +6,7 @@ from ament_index_python.packages import get_package_share_directory
 from cv_bridge import CvBridge
 from sensor_msgs.msg import Image
 import math
+import threading
 from rclpy.node import Node
 
 class Panorama:
@@ -19,8 +20,14 @@ class Panorama:
         '''
         self.node_ = node
         
+        # Map dimensions, set by the service callbacks and read by the stitching on the
+        # processing worker (see camera_controller)
+        self.map_lock_ = threading.Lock()
         self.map_x = -1.0
         self.map_y = -1.0
+        # Size of the panorama image in pixels, only used by the stitching on the processing worker
+        self.map_size_x_px = 0
+        self.map_size_y_px = 0
         self.config_directory_ = os.path.join(get_package_share_directory('camera_handler'), 'config')
         self.calib_file_ = 'camera_calibration.yaml'
         
@@ -69,48 +76,72 @@ class Panorama:
                 self.node_.get_logger().warn(f"Error reading YAML file: {e}")
                 return None
     
-    def save_image_for_mosaic(self, num: int):
+    def set_map_dimensions(self, x: float, y: float):
+        '''
+        Sets the dimensions (mm) of the map the panorama covers
+        '''
+        with self.map_lock_:
+            self.map_x = x
+            self.map_y = y
+
+    def map_dimensions(self) -> tuple:
+        '''
+        Returns the (x, y) dimensions of the map. If they were not set at the start of
+        the run, they are loaded from the active map (-1.0 if it cannot be loaded)
+        '''
+        with self.map_lock_:
+            if self.map_x == -1.0 or self.map_y == -1.0:
+                # Load map instance
+                map_directory_ = os.path.join(get_package_share_directory('map_handler'), 'config')
+                map_file = 'active_map.yaml'
+                map_instance = self.load_from_yaml(map_directory_, map_file)
+                if map_instance:
+                    # Get map dimensions
+                    self.map_x = map_instance['map_reference']['x_len']
+                    self.map_y = map_instance['map_reference']['y_len']
+
+                    self.node_.get_logger().info('Loading map dimensions from active map file')
+            return self.map_x, self.map_y
+
+    def save_image_for_mosaic(self, num: int, image = None):
+        '''
+        Saves a picture as image num of the mosaic. The latest frame of the camera if image is None
+        '''
+        if image is None:
+            image = self.rgb_image_
         mosaic_directory = os.path.join(self.config_directory_, 'mosaic')
         filename = f"{mosaic_directory}/image_{num}.png"
         os.makedirs(mosaic_directory, exist_ok=True)
-        cv2.imwrite(filename, self.rgb_image_)
+        cv2.imwrite(filename, image)
         self.node_.get_logger().info(f'saved mosaic image {num:03}')
         
-    def stitch_image_onto_map(self, x: float, y: float):
+    def stitch_image_onto_map(self, x: float, y: float, image = None):
         '''
         Takes a picture from the Luxonis camera and stitches it to the 
-        panorama map at the specified x and y coordinates
+        panorama map at the specified x and y coordinates. The picture is
+        the latest frame of the camera if image is None
         '''
+        if image is None:
+            image = self.rgb_image_
         # Loading the camera calibration information
-        self.config_data = self.load_from_yaml(self.config_directory_, self.calib_file_)
-        
-        # If the map dimensions were not set at the start of the run, load them from the active map
-        if self.map_x == -1.0 or self.map_y == -1.0:
-            # Load map instance
-            map_directory_ = os.path.join(get_package_share_directory('map_handler'), 'config')
-            map_file = 'active_map.yaml'
-            map_instance = self.load_from_yaml(map_directory_, map_file)
-            if map_instance:
-                # Get map dimensions
-                self.map_x = map_instance['map_reference']['x_len']
-                self.map_y = map_instance['map_reference']['y_len']
-
-                self.node_.get_logger().info('Loading map dimensions from active map file')
+        config_data = self.load_from_yaml(self.config_directory_, self.calib_file_)
         
+        map_x, map_y = self.map_dimensions()
+
         # Set the map size relative to pixels
-        self.map_size_x_px = int(self.map_x / self.config_data['coord_scale'])
-        self.map_size_y_px = int(self.map_y / self.config_data['coord_scale'])
+        self.map_size_x_px = int(map_x / config_data['coord_scale'])
+        self.map_size_y_px = int(map_y / config_data['coord_scale'])
         
-        x_px = int(x / self.config_data['coord_scale'])
-        y_px = int(y / self.config_data['coord_scale'])
+        x_px = int(x / config_data['coord_scale'])
+        y_px = int(y / config_data['coord_scale'])
         
-        if self.rgb_image_ is None:
+        if image is None:
             self.node_.get_logger().warn('RGB image is not available.')
             return
 
         # Rotate and add a transparent mask to the RGB image
-        rotation_angle = self.config_data['total_rotation_angle']
-        processed_image = self.rotate_and_mask_image(self.rgb_image_, rotation_angle)
+        rotation_angle = config_data['total_rotation_angle']
+        processed_image = self.rotate_and_mask_image(image, rotation_angle)
         
         # Ensure processed_image has 4 channels
         if processed_image.shape[2] != 4:
@@ -214,18 +245,7 @@ class Panorama:
         the amount of images needed to stitch the whole map into a panorama
         '''
         self.config_data_ = self.load_from_yaml(self.config_directory_, self.calib_file_)
-        
-        if self.map_x == -1.0 or self.map_y == -1.0:
-            # Load map instance
-            map_directory_ = os.path.join(get_package_share_directory('map_handler'), 'config')
-            map_file = 'active_map.yaml'
-            map_instance = self.load_from_yaml(map_directory_, map_file)
-            if map_instance:
-                # Get map dimensions
-                self.map_x = map_instance['map_reference']['x_len']
-                self.map_y = map_instance['map_reference']['y_len']
-
-                self.node_.get_logger().info('Loading map dimensions from active map file')
+        self.map_dimensions()
         
         if self.rgb_image_ is None:
             self.node_.get_logger().warn('RGB image is not available.')
@@ -184,10 +184,13 @@ class PlantDetection:
             with open(path, 'w') as file:
                 yaml.dump(existing_data + data, file)
     
-    def detect_weeds(self, x: float, y: float):
+    def detect_weeds(self, x: float, y: float, image = None):
         '''
-        Processes the images to detect weeds and known plants and updates the map with detected circles
+        Processes the images to detect weeds and known plants and updates the map with detected circles.
+        The picture is the latest frame of the camera if image is None
         '''
+        if image is None:
+            image = self.rgb_image
         self.calib_data = self.load_yaml(self.config_directory, self.calib_file)
         self.camera_config_data = self.load_yaml(self.config_directory, self.camera_config_file)
         active_map = self.load_yaml(self.map_directory, self.map_file)
@@ -200,11 +203,11 @@ class PlantDetection:
                            for plant_data in active_map['plant_details']['plants'].values() if plant_data]
         plant_positions = np.array(plant_positions)
 
-        if self.rgb_image is None:
+        if image is None:
             self.node.get_logger().warn("RGB image is not available.")
             return
         
-        rgb_image_raw = self.rgb_image
+        rgb_image_raw = image
         rotation_angle = self.calib_data['total_rotation_angle']
         rgb_image_rotated = self.rotate_image(rgb_image_raw, rotation_angle)
 
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from rclpy.node import Node
+
+
+class ProcessingQueue:
+    '''
+    Background queue of the picture processing jobs (stitching, mosaic images, weed
+    detection) of the camera controller. The service only grabs the frame at the pose
+    of the gantry and queues the job, so the sequencer moves on to the next pose while
+    the previous pictures are processed. The jobs run one at a time, in order, as they
+    all update the same map files.
+
+    When max_queued jobs are already waiting, a job is only queued once the worker took
+    the oldest one (the service answers then), so a slow processing holds the gantry
+    back rather than piling up frames.
+
+    A panorama (see expect) is timed from the moment its sequence is formed to the
+    moment its last picture is processed.
+    '''
+    def __init__(self, node: Node, max_queued: int = 10):
+        '''
+        Module constructor
+
+        Args:
+            node {Node}: the node the module extends
+            max_queued {int}: the number of jobs that can wait in the queue
+        '''
+        self.node_ = node
+        self.queue_ = queue.Queue(maxsize = max(max_queued, 1))
+        self.lock_ = threading.Lock()
+
+        # Panorama in progress: pictures left to process, start time, time spent
+        # processing, longest wait of a picture in the queue and deepest queue
+        self.panorama_left_ = 0
+        self.panorama_count_ = 0
+        self.panorama_started_ = 0.0
+        self.panorama_processing_ = 0.0
+        self.panorama_max_wait_ = 0.0
+        self.panorama_max_queued_ = 0
+
+        self.worker_ = threading.Thread(target = self.run, daemon = True)
+        self.worker_.start()
+
+    def expect(self, count: int):
+        '''
+        Starts timing a panorama of the given number of pictures
+        '''
+        with self.lock_:
+            self.panorama_left_ = count
+            self.panorama_count_ = count
+            self.panorama_started_ = time.monotonic()
+            self.panorama_processing_ = 0.0
+            self.panorama_max_wait_ = 0.0
+            self.panorama_max_queued_ = 0
+
+    def submit(self, name: str, job, *args, panorama: bool = False):
+        '''
+        Queues a job
+
+        Args:
+            name {str}: the name of the job in the logs
+            job {callable}: the processing, called with args
+            panorama {bool}: the job processes a picture of the panorama in progress
+        '''
+        queued = time.monotonic()
+        if self.queue_.full():
+            self.node_.get_logger().warn(f'{self.queue_.qsize()} pictures waiting for processing, '
+                                         f'the {name} waits for room in the queue')
+        self.queue_.put((name, job, args, panorama, queued))
+        with self.lock_:
+            if panorama:
+                self.panorama_max_queued_ = max(self.panorama_max_queued_, self.queue_.qsize())
+
+    def run(self):
+        while True:
+            item = self.queue_.get()
+            if item is None:
+                break
+            self.process(*item)
+
+    def process(self, name: str, job, args: tuple, panorama: bool, queued: float):
+        started = time.monotonic()
+        try:
+            job(*args)
+        except Exception as e:
+            self.node_.get_logger().error(f'{name} failed: {e}')
+        done = time.monotonic()
+
+        if not panorama:
+            return
+        with self.lock_:
+            if self.panorama_left_ <= 0:
+                return
+            self.panorama_left_ -= 1
+            self.panorama_processing_ += done - started
+            self.panorama_max_wait_ = max(self.panorama_max_wait_, started - queued)
+            if self.panorama_left_ == 0:
+                self.node_.get_logger().info(
+                    f'Panorama of {self.panorama_count_} pictures done in {done - self.panorama_started_:.1f}s end-to-end '
+                    f'(processing {self.panorama_processing_:.1f}s, longest wait in the queue '
+                    f'{self.panorama_max_wait_:.1f}s, up to {self.panorama_max_queued_} pictures queued)')
+
+    def stop(self):
+        '''
+        Processes the jobs left in the queue and stops the worker
+        '''
+        self.queue_.put(None)
+        self.worker_.join()
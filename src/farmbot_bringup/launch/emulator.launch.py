@@ -0,0 +1,72 @@
+import launch
+from launch import LaunchDescription, LaunchService
+from launch_ros.actions import Node
+from launch.actions import ExecuteProcess, TimerAction
+
+# Pseudo-terminal link created by the Farmduino emulator
+EMULATOR_PORT = '/tmp/ttyFarmduino'
+
+def generate_launch_description():
+    return LaunchDescription([
+        # Hardware-free Farmduino (see farmbot_command_handler/farmduino_emulator.py for the options)
+        ExecuteProcess(
+            cmd=['ros2', 'run', 'farmbot_command_handler', 'farmduino_emulator',
+                 '--link', EMULATOR_PORT, '--startup-delay', '2.0'],
+            output='screen'
+        ),
+        Node(
+            package='farmbot_controllers',
+            executable='param_conf_server',
+            name='param_conf_server',
+            output='screen'
+        ),
+        Node(
+            package='farmbot_controllers',
+            executable='farmbot_controller',
+            name='controller',
+            output='screen'
+        ),
+        Node(
+            package='farmbot_command_handler',
+            executable='motor_command_handler',
+            name='motor_command_handler',
+            output='screen'
+        ),
+        Node(
+            package='farmbot_command_handler',
+            executable='state_command_handler',
+            name='state_command_handler',
+            output='screen'
+        ),
+        Node(
+            package='farmbot_command_handler',
+            executable='device_command_handler',
+            name='device_command_handler',
+            output='screen'
+        ),
+        Node(
+            package='map_handler',
+            executable='map_controller',
+            name='map_controller',
+            output='screen'
+        ),
+
+        # Delay for the emulator to create the pty link
+        TimerAction(
+            period=1.0,
+            actions=[
+                Node(
+                    package='farmbot_command_handler',
+                    executable='uart_controller',
+                    name='uart_controller',
+                    output='screen',
+                    parameters=[{'serial_port': EMULATOR_PORT}]
+                )
+            ]
+        )
+    ])
+
+if __name__ == '__main__':
+    ls = LaunchService()
+    ls.include_launch_description(generate_launch_description())
+    ls.run()
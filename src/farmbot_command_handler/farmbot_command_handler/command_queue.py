@@ -0,0 +1,169 @@
+import time
+from collections import deque
+
+from farmbot_command_handler.jog_commands import coalesce
+from farmbot_command_handler.uart_stats import RunningStat
+
+
+# Command classes, in order of priority (lower value is served first)
+EMERGENCY = 0       # E, F09, @. Bypass the queue entirely
+INTERACTIVE = 1     # Operator jog/teleop commands
+JOB = 2             # Sequences and standard commands
+BACKGROUND = 3      # Telemetry and housekeeping requests
+CLASS_NAMES = ('emergency', 'interactive', 'job', 'background')
+
+
+class QueuedCommand:
+    '''
+    Command waiting in the transmit queue
+    '''
+    __slots__ = ('line', 'priority', 'queued', 'retries')
+
+    def __init__(self, line: str, priority: int, queued: float = 0.0):
+        self.line = line
+        self.priority = priority
+        self.queued = queued or time.monotonic()
+        # Times the command was sent again after missing its deadline
+        self.retries = 0
+
+
+class CommandScheduler:
+    '''
+    Multi-level transmit queue for the UART layer.
+
+    Every command class has its own FIFO (deque) and the commands are always
+    served from the highest priority class that has commands waiting. Lower
+    classes are only ever delayed, never dropped, by the higher ones. A
+    command that was preempted can be put back at the head of its class so
+    it is the next one of its class to be executed.
+
+    In the coalesced classes (e.g. the interactive one), a move is merged with
+    the move queued right before it (see jog_commands.coalesce), so a burst of
+    jog presses sends the gantry straight to its final target. The merged
+    command keeps the place and the queue time of the first one.
+
+    Per-class depth, throughput, queue wait-time and elided move counters are
+    kept for the UART statistics.
+    '''
+    def __init__(self, coalesced: tuple = ()):
+        '''
+        Args:
+            coalesced {tuple}: the classes whose queued moves are coalesced
+        '''
+        self.coalesced_ = coalesced
+        self.queues_ = [deque() for _ in CLASS_NAMES]
+        self.enqueued_ = [0] * len(CLASS_NAMES)
+        self.dispatched_ = [0] * len(CLASS_NAMES)
+        self.preempted_ = [0] * len(CLASS_NAMES)
+        self.elided_ = [0] * len(CLASS_NAMES)
+        self.max_depth_ = [0] * len(CLASS_NAMES)
+        self.wait_ = [RunningStat() for _ in CLASS_NAMES]
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues_)
+
+    def __bool__(self):
+        return any(self.queues_)
+
+    def depth(self, priority: int) -> int:
+        '''
+        Returns the amount of commands waiting in a class
+        '''
+        return len(self.queues_[priority])
+
+    def push(self, line: str, priority: int = JOB):
+        '''
+        Adds a command at the end of its class
+
+        Args:
+            line {str}: the command line
+            priority {int}: the command class (EMERGENCY, INTERACTIVE, JOB or BACKGROUND)
+        '''
+        queue = self.queues_[priority]
+        self.enqueued_[priority] += 1
+        if priority in self.coalesced_ and queue:
+            merged = coalesce(queue[-1].line, line)
+            if merged is not None:
+                queue[-1].line = merged
+                self.elided_[priority] += 1
+                return
+        queue.append(QueuedCommand(line, priority))
+        self.max_depth_[priority] = max(self.max_depth_[priority], len(queue))
+
+    def push_front(self, cmd: QueuedCommand):
+        '''
+        Puts a preempted command back at the head of its class. The original
+        queue time is kept so its wait time covers the preemption.
+
+        Args:
+            cmd {QueuedCommand}: the preempted command
+        '''
+        self.queues_[cmd.priority].appendleft(cmd)
+        self.preempted_[cmd.priority] += 1
+
+    def bypass(self, priority: int = EMERGENCY):
+        '''
+        Counts a command that was sent without going through the queue
+
+        Args:
+            priority {int}: the command class
+        '''
+        self.enqueued_[priority] += 1
+        self.dispatched_[priority] += 1
+        self.wait_[priority].add(0.0)
+
+    def peek(self) -> QueuedCommand:
+        '''
+        Returns the next command that would be dispatched (or None)
+        '''
+        for queue in self.queues_:
+            if queue:
+                return queue[0]
+        return None
+
+    def pop(self) -> QueuedCommand:
+        '''
+        Removes and returns the next command to be dispatched, recording its wait time
+        '''
+        for queue in self.queues_:
+            if queue:
+                cmd = queue.popleft()
+                self.dispatched_[cmd.priority] += 1
+                self.wait_[cmd.priority].add(time.monotonic() - cmd.queued)
+                return cmd
+        return None
+
+    def has_higher(self, priority: int) -> bool:
+        '''
+        Checks if any command of a higher priority than 'priority' is waiting
+        '''
+        return any(self.queues_[:priority])
+
+    def clear_class(self, priority: int) -> int:
+        '''
+        Drops the queued commands of a class (e.g. the jogs when the operator stops jogging)
+
+        Returns:
+            the amount of dropped commands
+        '''
+        queue = self.queues_[priority]
+        dropped = len(queue)
+        queue.clear()
+        return dropped
+
+    def clear(self):
+        '''
+        Drops every queued command (e.g. on an electronic stop)
+        '''
+        for queue in self.queues_:
+            queue.clear()
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the per-class counters
+        '''
+        return ' '.join(
+            f'{name}[depth={len(self.queues_[i])} max_depth={self.max_depth_[i]} '
+            f'in={self.enqueued_[i]} out={self.dispatched_[i]} preempted={self.preempted_[i]} elided={self.elided_[i]} '
+            f'wait_ms({self.wait_[i].summary()})]'
+            for i, name in enumerate(CLASS_NAMES))
@@ -0,0 +1,284 @@
+import math
+import time
+
+from farmbot_command_handler.command_window import (command_code, BLOCKING_CMDS, PREEMPTIBLE_CMDS, REPLAYABLE_CMDS,
+                                                    PROBE_QUEUE_NR)
+from farmbot_command_handler.firmware_params import ParamTracker, command_args, ACC_DEC, MIN_SPEED, STEP_PER_MM
+from farmbot_command_handler.node_params import parameter
+
+
+# What happens to a command that missed its deadline while the Farmduino still answers
+RETRY = 'retry'     # sent again (at the head of its class), skipped once out of retries
+SKIP = 'skip'       # dropped, the next queued command is executed
+
+HOMING_CMDS = {'F11': 0, 'F12': 1, 'F13': 2}
+CALIBRATION_CMDS = {'F14': 0, 'F15': 1, 'F16': 2}
+# Distance (mm) from the target under which a move is considered done
+TARGET_TOLERANCE = 1.0
+
+
+class CommandDeadlines:
+    '''
+    Estimates how long the Farmduino may take to finish a command. Moves are
+    estimated from their distance and the axis speed and acceleration parameters,
+    with a safety factor and margin on top.
+    '''
+    def __init__(self, params: ParamTracker, request_timeout: float = 3.0,
+                 move_factor: float = 2.0, margin: float = 5.0):
+        '''
+        Args:
+            params {ParamTracker}: the mirror of the Farmduino parameters
+            request_timeout {float}: time (s) allowed to the non blocking commands
+            move_factor {float}: multiplier of the estimated duration of the blocking commands
+            margin {float}: time (s) added to the estimated duration of the blocking commands
+        '''
+        self.params_ = params
+        self.request_timeout_ = request_timeout
+        self.move_factor_ = move_factor
+        self.margin_ = margin
+
+    def axis_time(self, axis: int, distance: float, speed: float) -> float:
+        '''
+        Returns the time (s) an axis needs to travel a distance, including the
+        slower acceleration and deceleration ramps
+
+        Args:
+            axis {int}: 0 for X, 1 for Y and 2 for Z
+            distance {float}: the distance in mm
+            speed {float}: the cruise speed in mm/s
+        '''
+        if distance <= 0.0 or speed <= 0.0:
+            return 0.0
+        steps_per_mm = max(self.params_.get(STEP_PER_MM[axis], 1), 1)
+        ramp = self.params_.get(ACC_DEC[axis], 0) / steps_per_mm
+        min_speed = min(self.params_.get(MIN_SPEED[axis], 0) / steps_per_mm, speed)
+        # Both ramps are run at the mean of the minimum and cruise speeds
+        ramp_loss = 2.0 * (ramp / ((min_speed + speed) / 2.0) - ramp / speed) if min_speed + speed > 0.0 else 0.0
+        return distance / speed + max(0.0, ramp_loss)
+
+    def estimate(self, line: str, position: tuple = None) -> float:
+        '''
+        Returns the estimated execution time (s) of a blocking command, or 0 for the others
+
+        Args:
+            line {str}: the command line
+            position {tuple}: the last known (x, y, z) position, None if unknown
+        '''
+        code = command_code(line)
+        args = command_args(line)
+        if position is None:
+            # Assume the worst case: the whole length of every axis
+            position = tuple(-self.params_.axis_length(axis) for axis in range(3))
+
+        if code in ('G00', 'G01'):
+            target = [args.get(axis, position[i]) for i, axis in enumerate('XYZ')]
+            if code == 'G00':
+                speeds = [self.params_.axis_speed(i, args.get(speed)) for i, speed in enumerate('ABC')]
+            else:
+                speeds = [min(self.params_.axis_speed(i) for i in range(3))] * 3
+            return max(self.axis_time(i, abs(target[i] - position[i]), speeds[i]) for i in range(3))
+        if code == 'G28':
+            return max(self.axis_time(i, abs(position[i]), self.params_.axis_speed(i)) for i in range(3))
+        if code in HOMING_CMDS:
+            axis = HOMING_CMDS[code]
+            return self.axis_time(axis, abs(position[axis]), self.params_.axis_speed(axis, homing=True))
+        if code in CALIBRATION_CMDS:
+            axis = CALIBRATION_CMDS[code]
+            length = self.params_.axis_length(axis)
+            return 2.0 * self.axis_time(axis, length, self.params_.axis_speed(axis, homing=True))
+        if code == 'F44':
+            return args.get('T', 0.0) / 1000.0
+        return 0.0
+
+    def allowed(self, line: str, position: tuple = None) -> float:
+        '''
+        Returns the time (s) a command is allowed to take before it is considered lost
+        '''
+        if command_code(line) not in BLOCKING_CMDS:
+            return self.request_timeout_
+        return self.estimate(line, position) * self.move_factor_ + self.margin_
+
+
+class CommandWatchdog:
+    '''
+    Recovers the UART controller from commands whose completion never arrives
+    (e.g. a lost or garbled R02), which would otherwise keep the Farmduino busy
+    and stall every queued command.
+
+    Every dispatched command gets a deadline (CommandDeadlines). Reports of the
+    command showing it is still running (busy R04, position R82) extend it, up to
+    three times the allowed duration. Once a deadline expires the Farmduino is
+    probed with F83 (version) and F82 (position), tagged with a queue number of
+    their own. If the probe is answered:
+        - a move that reached its target is considered done,
+        - otherwise a move or read is retried (at the head of its class, after an
+          abort for moves) up to 'max_retries' times, or skipped,
+        - the other commands (e.g. pin writes, watering pulses) may have run, they
+          are reported as failed (R03) rather than run twice.
+    If the probe is not answered (the link is down, or the Farmduino is still running
+    the command and does not read the probe yet), the commands are kept and probed
+    again later.
+    '''
+    def __init__(self, channel, params: ParamTracker):
+        '''
+        Watchdog constructor. Declares the watchdog parameters on the node of the channel
+
+        Args:
+            channel {FarmduinoChannel}: the Farmduino channel of the UART controller
+            params {ParamTracker}: the mirror of the Farmduino parameters
+        '''
+        self.channel_ = channel
+        node = channel.node_
+
+        period = parameter(node, 'watchdog_period', 0.5)
+        self.policy_ = parameter(node, 'watchdog_policy', RETRY)
+        self.max_retries_ = parameter(node, 'watchdog_max_retries', 1)
+        self.probe_timeout_ = parameter(node, 'watchdog_probe_timeout', 2.0)
+        if self.policy_ not in (RETRY, SKIP):
+            channel.logger_.warning(f'Unknown watchdog policy {self.policy_}, using {RETRY}')
+            self.policy_ = RETRY
+
+        self.deadlines_ = CommandDeadlines(
+            params,
+            request_timeout=parameter(node, 'watchdog_request_timeout', 3.0),
+            move_factor=parameter(node, 'watchdog_move_factor', 2.0),
+            margin=parameter(node, 'watchdog_margin', 5.0))
+
+        # Commands waiting on the probe, the time the probe was sent and its answers
+        self.probing_ = []
+        self.probe_sent_ = 0.0
+        self.probe_alive_ = False
+        self.probe_position_ = None
+
+        self.expired_ = 0
+        self.completed_ = 0
+        self.retried_ = 0
+        self.skipped_ = 0
+        self.failed_ = 0
+        self.unanswered_ = 0
+
+        self.timer_ = node.create_timer(period, self.check)
+
+    def arm(self, cmd, position: tuple = None):
+        '''
+        Sets the deadline of a command that was just dispatched
+
+        Args:
+            cmd {InFlightCommand}: the dispatched command
+            position {tuple}: the last known (x, y, z) position, None if unknown
+        '''
+        allowed = self.deadlines_.allowed(cmd.line, position)
+        cmd.deadline = cmd.sent + allowed
+        cmd.limit = cmd.sent + 3.0 * allowed
+
+    def heartbeat(self, cmd):
+        '''
+        Extends the deadline of a command that reported it is still running
+        '''
+        if cmd.deadline:
+            cmd.deadline = min(cmd.limit, max(cmd.deadline, time.monotonic() + self.deadlines_.margin_))
+
+    def reset(self):
+        '''
+        Drops the probe in progress (e.g. after an electronic stop)
+        '''
+        self.probing_ = []
+        self.probe_sent_ = 0.0
+
+    def check(self):
+        '''
+        Timer callback looking for expired commands and unanswered probes
+        '''
+        now = time.monotonic()
+        if self.probe_sent_:
+            if now - self.probe_sent_ > self.probe_timeout_:
+                # The Farmduino is unresponsive (or still running a command, the firmware only reads
+                # the next commands once it is done). The commands are kept and probed again later
+                self.unanswered_ += 1
+                self.channel_.logger_.error(
+                    f'Farmduino did not answer the watchdog probe, keeping {len(self.probing_)} command(s) in flight')
+                for cmd in self.probing_:
+                    cmd.deadline = now + self.deadlines_.margin_
+                self.probe_sent_ = 0.0
+                self.probing_ = []
+            return
+
+        expired = [cmd for cmd in self.channel_.window_.commands() if cmd.deadline and now > cmd.deadline]
+        if not expired:
+            return
+        self.expired_ += len(expired)
+        self.channel_.logger_.warning(
+            f'Command(s) {[cmd.line for cmd in expired]} missed their deadline, probing the Farmduino')
+        self.probing_ = expired
+        self.probe_sent_ = now
+        self.probe_alive_ = False
+        self.probe_position_ = None
+        self.channel_.write(f'F83 Q{PROBE_QUEUE_NR}\nF82 Q{PROBE_QUEUE_NR}\n', 2)
+
+    def probe_report(self, report):
+        '''
+        Handles a report answering the probe (tagged with the probe queue number)
+
+        Args:
+            report {Report}: the decoded report
+        '''
+        if not self.probe_sent_:
+            return
+        if report.code == 'R83':
+            self.probe_alive_ = True
+        elif report.code == 'R82' and report.has('X', 'Y', 'Z'):
+            self.probe_alive_ = True
+            self.probe_position_ = (report.value('X'), report.value('Y'), report.value('Z'))
+            self.recover()
+
+    def recover(self):
+        '''
+        Applies the recovery policy to the commands that missed their deadline,
+        now that the Farmduino answered the probe
+        '''
+        commands, self.probing_ = self.probing_, []
+        self.probe_sent_ = 0.0
+        window = self.channel_.window_
+        for cmd in commands:
+            if not window.is_open(cmd):
+                # Finished while being probed
+                continue
+
+            window.close(cmd)
+            if self.reached_target(cmd):
+                self.completed_ += 1
+                self.channel_.logger_.warning(f'Completion of {cmd.line} was lost, the target was reached')
+            elif cmd.code not in REPLAYABLE_CMDS:
+                self.failed_ += 1
+                self.channel_.report_failed(cmd)
+                self.channel_.logger_.error(f'Failed {cmd.line}, it did not finish in time and may have run')
+            elif self.policy_ == RETRY and cmd.source is not None and cmd.source.retries < self.max_retries_:
+                self.retried_ += 1
+                cmd.source.retries += 1
+                if cmd.code in PREEMPTIBLE_CMDS or cmd.blocking:
+                    # Make sure the Farmduino is not still running it before it is sent again
+                    self.channel_.write('@\n')
+                self.channel_.tx_queue_.push_front(cmd.source)
+                self.channel_.logger_.warning(f'Retrying {cmd.line} (retry {cmd.source.retries})')
+            else:
+                self.skipped_ += 1
+                self.channel_.logger_.error(f'Skipping {cmd.line}, it did not finish in time')
+
+        self.channel_.dispatch_next()
+
+    def reached_target(self, cmd) -> bool:
+        '''
+        Checks if a move is at its target according to the probed position
+        '''
+        if self.probe_position_ is None or cmd.code not in PREEMPTIBLE_CMDS:
+            return False
+        args = command_args(cmd.line)
+        target = [args.get(axis, self.probe_position_[i]) for i, axis in enumerate('XYZ')]
+        return math.dist(target, self.probe_position_) <= TARGET_TOLERANCE
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the watchdog counters
+        '''
+        return (f'watchdog[expired={self.expired_} completed={self.completed_} retried={self.retried_} '
+                f'skipped={self.skipped_} failed={self.failed_} unanswered_probes={self.unanswered_}]')
@@ -0,0 +1,279 @@
+import time
+from collections import OrderedDict
+
+
+# Commands that keep the Farmduino busy until they are finished (R02/R03).
+# These are never overlapped with any other command.
+BLOCKING_CMDS = ('G00', 'G01', 'G28', 'F11', 'F12', 'F13',
+                 'F14', 'F15', 'F16', 'F20', 'F44')
+BLOCKING_RESPONSES = ('R02', 'R03')
+# Motion commands that can be aborted (@) and safely executed again later
+PREEMPTIBLE_CMDS = ('G00', 'G01')
+# Commands that can be sent again when it is unknown whether the Farmduino ran them
+# (absolute moves and reads). The others (e.g. pin writes, watering pulses) are not
+# repeated, as running them twice has an effect of its own
+REPLAYABLE_CMDS = ('G00', 'G01', 'F21', 'F42', 'F82', 'F83')
+# Commands that are finished when their reply is received
+REQUEST_CMDS = {'F42': ('R41', ), 'F21': ('R21', )}
+# Report code signalling that a (non blocking) command was received and processed
+ECHO_RESPONSE = 'R08'
+# Report code signalling that a command was acknowledged (started)
+ACK_RESPONSE = 'R01'
+# Report code signalling an error in the execution of any command
+ERROR_RESPONSE = 'R03'
+# Report code sent periodically while the Farmduino is busy executing a command
+BUSY_RESPONSE = 'R04'
+
+# Range of the queue numbers (Q) used to tag the commands
+MIN_QUEUE_NR = 1
+MAX_QUEUE_NR = 98
+# Queue number reserved for the watchdog probes, never used by the window
+PROBE_QUEUE_NR = 99
+
+
+def command_code(line: str) -> str:
+    '''
+    Returns the command/report code of a serial line (e.g. 'G00' for 'G00 X1 Y2 Z3')
+    '''
+    return line.split(' ', 1)[0].strip()
+
+
+def queue_number(line: str) -> int:
+    '''
+    Returns the queue number (Q) a report was tagged with by the Farmduino,
+    or 0 if the report is not tagged.
+    '''
+    tag = line.rsplit(' ', 1)[-1]
+    if len(tag) > 1 and tag[0] == 'Q' and tag[1:].isdigit():
+        return int(tag[1:])
+    return 0
+
+
+def untagged(line: str) -> str:
+    '''
+    Returns a command line without its queue number (Q) tag
+    '''
+    if queue_number(line):
+        return line.rsplit(' ', 1)[0]
+    return line
+
+
+class InFlightCommand:
+    '''
+    Command that was sent to the Farmduino and is waiting to be finished
+    '''
+    __slots__ = ('line', 'code', 'queue', 'size', 'sent', 'acked', 'source', 'preempted',
+                 'acked_at', 'finished', 'deadline', 'limit')
+
+    def __init__(self, line: str, code: str, queue: int, source=None):
+        self.line = line
+        self.code = code
+        self.queue = queue
+        self.size = len(line) + 1
+        self.sent = time.monotonic()
+        self.acked = False
+        # The queue entry the command was dispatched from (used for requeueing preempted commands)
+        self.source = source
+        self.preempted = False
+        # Timestamps of the reports (used for the latency statistics)
+        self.acked_at = 0.0
+        self.finished = False
+        # Time the command is considered lost at (set by the watchdog, 0 if not armed)
+        self.deadline = 0.0
+        self.limit = 0.0
+
+    @property
+    def blocking(self) -> bool:
+        return self.code in BLOCKING_CMDS
+
+    def finished_by(self, rep_code: str) -> bool:
+        '''
+        Checks if the report code finishes this command
+
+        Args:
+            rep_code {str}: the report code received from the Farmduino
+        '''
+        if rep_code == ERROR_RESPONSE:
+            return True
+        if self.code in BLOCKING_CMDS:
+            return rep_code in BLOCKING_RESPONSES
+        if self.code in REQUEST_CMDS:
+            return rep_code in REQUEST_CMDS[self.code]
+        return rep_code == ECHO_RESPONSE
+
+
+class CommandWindow:
+    '''
+    Tracks the commands that are in flight on the Farmduino.
+
+    Every command is tagged with a Farmduino queue number (Q) which the firmware
+    repeats at the end of the reports for that command, so the acks and replies
+    can be matched back to the command they belong to. Up to 'size' commands
+    that do not conflict can be in flight at the same time, while blocking
+    (motion) commands are always executed on their own.
+
+    The amount of bytes sent but not yet acknowledged (R01) is also limited, so
+    the Farmduino's serial receive buffer (64 bytes) is never overrun.
+    '''
+    def __init__(self, size: int = 4, max_pending_bytes: int = 60):
+        '''
+        Window constructor
+
+        Args:
+            size {int}: the maximum amount of commands in flight
+            max_pending_bytes {int}: the maximum amount of bytes that are sent but not acknowledged
+        '''
+        self.size_ = max(1, size)
+        self.max_pending_bytes_ = max_pending_bytes
+        self.in_flight_ = OrderedDict()
+        self.next_queue_ = MIN_QUEUE_NR
+        # Last command closed on every queue number (late reports, e.g. R02 after R08)
+        self.closed_ = {}
+
+    def __len__(self):
+        return len(self.in_flight_)
+
+    def __bool__(self):
+        return bool(self.in_flight_)
+
+    def commands(self) -> list:
+        '''
+        Returns the commands in flight, oldest first
+        '''
+        return list(self.in_flight_.values())
+
+    def is_open(self, cmd: InFlightCommand) -> bool:
+        '''
+        Checks if a command is still in flight
+        '''
+        return self.in_flight_.get(cmd.queue) is cmd
+
+    def pending_bytes(self) -> int:
+        '''
+        Returns the amount of bytes that were sent but not yet acknowledged
+        '''
+        return sum(cmd.size for cmd in self.in_flight_.values() if not cmd.acked)
+
+    def can_dispatch(self, code: str, size: int = 0) -> bool:
+        '''
+        Checks if a command can be sent without conflicting with the commands in flight
+
+        Args:
+            code {str}: the code of the command (e.g. 'F22')
+            size {int}: the length of the command line in bytes
+        '''
+        if not self.in_flight_:
+            return True
+        if code in BLOCKING_CMDS or any(cmd.blocking for cmd in self.in_flight_.values()):
+            return False
+        if len(self.in_flight_) >= self.size_:
+            return False
+        return self.pending_bytes() + size <= self.max_pending_bytes_
+
+    def open(self, line: str, source=None) -> InFlightCommand:
+        '''
+        Tags a command with a free queue number and records it as in flight
+
+        Args:
+            line {str}: the command line without the endline character
+            source {QueuedCommand}: the queue entry the command was dispatched from
+        Returns:
+            the in flight record. record.line holds the tagged command
+        '''
+        # Strip any queue number the sender might have set
+        line = untagged(line)
+
+        queue = self.next_queue_
+        while queue in self.in_flight_:
+            queue = MIN_QUEUE_NR if queue >= MAX_QUEUE_NR else queue + 1
+        self.next_queue_ = MIN_QUEUE_NR if queue >= MAX_QUEUE_NR else queue + 1
+
+        cmd = InFlightCommand(f'{line} Q{queue}', command_code(line), queue, source)
+        self.in_flight_[queue] = cmd
+        return cmd
+
+    def track(self, line: str) -> InFlightCommand:
+        '''
+        Records a command that was already tagged as in flight (e.g. a command
+        read from a recorded session)
+
+        Args:
+            line {str}: the tagged command line without the endline character
+        Returns:
+            the in flight record, or None if the line is not tagged
+        '''
+        queue = queue_number(line)
+        if not queue:
+            return None
+        cmd = InFlightCommand(line, command_code(line), queue)
+        self.in_flight_[queue] = cmd
+        return cmd
+
+    def match(self, rep_code: str, queue: int) -> InFlightCommand:
+        '''
+        Finds the in flight command the report belongs to. Untagged reports
+        are matched to the oldest command they can belong to.
+
+        Args:
+            rep_code {str}: the report code (e.g. 'R02')
+            queue {int}: the queue number of the report (0 if untagged)
+        Returns:
+            the matched command or None
+        '''
+        if queue:
+            return self.in_flight_.get(queue)
+        for cmd in self.in_flight_.values():
+            if rep_code == ACK_RESPONSE and not cmd.acked:
+                return cmd
+            if rep_code != ACK_RESPONSE and cmd.finished_by(rep_code):
+                return cmd
+        return None
+
+    def code_of(self, queue: int) -> str:
+        '''
+        Returns the code of the command in flight (or last closed) on a queue number
+
+        Args:
+            queue {int}: the queue number of a report (0 if untagged)
+        Returns:
+            the command code or an empty string if unknown
+        '''
+        cmd = self.in_flight_.get(queue) or self.closed_.get(queue)
+        return cmd.code if cmd is not None else ''
+
+    def recent(self, queue: int) -> InFlightCommand:
+        '''
+        Returns the last command closed on a queue number (or None). Non blocking
+        commands are closed by their echo, their R01/R02 reports still follow it.
+
+        Args:
+            queue {int}: the queue number of a report (0 if untagged)
+        '''
+        return self.closed_.get(queue)
+
+    def preemptible(self, priority: int) -> InFlightCommand:
+        '''
+        Returns the in flight motion command of a lower priority class than
+        'priority' that can be aborted in favour of a more urgent one (or None)
+
+        Args:
+            priority {int}: the class of the command that wants to run
+        '''
+        for cmd in self.in_flight_.values():
+            if (cmd.code in PREEMPTIBLE_CMDS and not cmd.preempted and cmd.source is not None
+                    and cmd.source.priority > priority):
+                return cmd
+        return None
+
+    def close(self, cmd: InFlightCommand):
+        '''
+        Removes a finished command from the window
+        '''
+        self.in_flight_.pop(cmd.queue, None)
+        self.closed_[cmd.queue] = cmd
+
+    def clear(self):
+        '''
+        Drops all the commands in flight (e.g. after an electronic stop)
+        '''
+        self.in_flight_.clear()
@@ -4,6 +4,8 @@ from rclpy.node import Node
 from std_msgs.msg import String, Int64MultiArray
 from farmbot_interfaces.msg import I2CCommand, PinCommand
 
+from farmbot_command_handler import fcode
+
 
 class DeviceCmdHandler(Node):
     '''
@@ -35,19 +37,14 @@ class DeviceCmdHandler(Node):
         Watering style command. Used to set the watering to be either time based (1) or
         measured using a flow meter (2)
         '''
-        # Valid watering commands
-        valid_commands = (1, 2)
-
-        if cmd.data[0] in valid_commands:
-            if cmd.data[1] <= 0:
-                self.get_logger().warning('The time constraint/volume constraint was not set!')
-            else:
-                self.uart_cmd_.data = 'F0' + str(cmd.data[0]) + (' T' if cmd.data[0] == 1 else ' N') + str(cmd.data[1])
-                
-                self.uart_tx_pub_.publish(self.uart_cmd_)
-                self.get_logger().info(self.uart_cmd_.data)
-        else:
-            self.get_logger().error('Wrong watering command type! First element should be 1 (timed pulses msec) or 2 (volume pulses)!')
+        try:
+            self.uart_cmd_.data = fcode.water(cmd.data[0], cmd.data[1])
+        except fcode.FCodeError as e:
+            self.get_logger().error(str(e))
+            return
+
+        self.uart_tx_pub_.publish(self.uart_cmd_)
+        self.get_logger().info(self.uart_cmd_.data)
 
     def i2c_cmd_callback(self, cmd: I2CCommand):
         '''
@@ -58,9 +55,9 @@ class DeviceCmdHandler(Node):
             cmd{I2CCommand}: contains the read or write command information
         '''
         if cmd.mode:    # I2C SET
-            self.uart_cmd_.data = 'F51 E' + str(cmd.e) + ' P' + str(cmd.p) + ' V' + str(cmd.v)
+            self.uart_cmd_.data = fcode.i2c_set(cmd.e, cmd.p, cmd.v)
         else:           # I2C READ
-            self.uart_cmd_.data = 'F52 E' + str(cmd.e) + ' P' + str(cmd.p)
+            self.uart_cmd_.data = fcode.i2c_read(cmd.e, cmd.p)
         
         self.uart_tx_pub_.publish(self.uart_cmd_)
         self.get_logger().info(self.uart_cmd_.data)
@@ -78,17 +75,21 @@ class DeviceCmdHandler(Node):
             self.get_logger().error('Pin is in SET mode, but no SET CASE was selected. Use set_io, set_value or set_value2 to indicate\
                                         what set mode you want!')
         else:
-            # SET mode for the pin
-            if cmd.mode:
-                if cmd.set_io:      # NOTE: pin_mode should be 0 for input and 1 for output
-                    self.uart_cmd_.data = 'F43 P' + str(cmd.pin) + ' M' + str(int(cmd.pin_mode))
-                elif cmd.set_value: # NOTE: pin_mode should be 0 for digital and 1 for analog
-                    self.uart_cmd_.data = 'F41 P' + str(cmd.pin) + ' V' + str(cmd.value) + ' M' + str(int(cmd.pin_mode))
-                elif cmd.set_value2:# NOTE: pin_mode should be 0 for digital and 1 for analog
-                    self.uart_cmd_.data = 'F44 P' + str(cmd.pin) + ' V' + str(cmd.value) + ' W' + str(cmd.value2) + ' T' + str(cmd.delay) + ' M' + str(int(cmd.pin_mode))
-            # READ mode for the pin
-            else:
-                self.uart_cmd_.data = 'F42 P' + str(cmd.pin) + ' M' + str(int(cmd.pin_mode))
+            try:
+                # SET mode for the pin
+                if cmd.mode:
+                    if cmd.set_io:      # NOTE: pin_mode should be 0 for input and 1 for output
+                        self.uart_cmd_.data = fcode.pin_io(cmd.pin, cmd.pin_mode)
+                    elif cmd.set_value: # NOTE: pin_mode should be 0 for digital and 1 for analog
+                        self.uart_cmd_.data = fcode.pin_write(cmd.pin, cmd.value, cmd.pin_mode)
+                    elif cmd.set_value2:# NOTE: pin_mode should be 0 for digital and 1 for analog
+                        self.uart_cmd_.data = fcode.pin_write2(cmd.pin, cmd.value, cmd.value2, cmd.delay, cmd.pin_mode)
+                # READ mode for the pin
+                else:
+                    self.uart_cmd_.data = fcode.pin_read(cmd.pin, cmd.pin_mode)
+            except fcode.FCodeError as e:
+                self.get_logger().error(str(e))
+                return
 
             self.uart_tx_pub_.publish(self.uart_cmd_)
             self.get_logger().info(self.uart_cmd_.data)
@@ -0,0 +1,734 @@
+import os
+import serial
+import time
+import yaml
+from collections import deque
+from rclpy.node import Node
+from std_msgs.msg import String, Bool
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from farmbot_interfaces.srv import StringRepReq
+
+from farmbot_command_handler import fcode
+from farmbot_command_handler.command_queue import CommandScheduler, CLASS_NAMES, EMERGENCY, INTERACTIVE, JOB, BACKGROUND
+from farmbot_command_handler.command_window import (CommandWindow, command_code, ACK_RESPONSE, BUSY_RESPONSE, ERROR_RESPONSE,
+                                                    BLOCKING_RESPONSES, PREEMPTIBLE_CMDS, REPLAYABLE_CMDS, PROBE_QUEUE_NR)
+from farmbot_command_handler.command_watchdog import CommandWatchdog
+from farmbot_command_handler.firmware_params import ParamTracker
+from farmbot_command_handler.jog_commands import JOG_CMD, resolve_jog
+from farmbot_command_handler.node_params import parameter
+from farmbot_command_handler.report_parser import (parse_report, POSITION_REPORT, PARAM_REPORTS, DEBUG_REPORT,
+                                                   STARTUP_MESSAGE)
+from farmbot_command_handler.report_publisher import ReportPublisher
+from farmbot_command_handler.serial_reader import SerialLineReader
+from farmbot_command_handler.traffic_recorder import TrafficRecorder, RX, TX
+from farmbot_command_handler.uart_stats import RunningStat, CommandTimings
+
+# State of the serial link of a channel
+LINK_UP = 'up'            # commands are dispatched
+LINK_DOWN = 'down'        # the port failed, reopened with a backoff
+LINK_RESYNC = 'resync'    # the port was reopened, waiting for the Farmduino startup
+
+
+def namespaced(namespace: str, name: str) -> str:
+    '''
+    Returns a topic or service name in a channel namespace ('bed1', 'uart_receive' -> 'bed1/uart_receive')
+    '''
+    return f'{namespace}/{name}' if namespace else name
+
+
+def namespaced_path(path: str, namespace: str) -> str:
+    '''
+    Returns a file path made unique for a channel namespace ('log.bin', 'bed1' -> 'log_bed1.bin')
+    '''
+    if not path or not namespace:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}_{namespace.replace("/", "_")}{ext}'
+
+
+class FarmduinoChannel:
+    '''
+    Everything the UART controller runs for one Farmduino: the serial port and its
+    reader thread, the multi-level transmit queue (CommandScheduler), the command
+    window, the watchdog, the report publishers, the busy state, the traffic recorder
+    and the statistics. The channel topics and services are created in its namespace
+    (e.g. /bed1/uart_transmit), or at the node level if the namespace is empty.
+
+    The channels of a node share its executor and its parameters, so one gateway
+    process serves several Farmduinos.
+
+    If the port fails (e.g. a USB glitch) or cannot be opened, the channel keeps its
+    queue and reopens the port with an exponential backoff ('reconnect_min_delay' up to
+    'reconnect_max_delay'). The moves and reads that were in flight are requeued at the
+    head of their class, the other commands in flight are reported as failed (R03).
+    Once reopened, the channel waits for the Farmduino startup report (R99, or
+    'resync_timeout' if the Farmduino was not reset), then requests the position and
+    applies the parameters written during the session again before the queued commands
+    are resumed. The busy state stays raised while the link is down.
+    '''
+    def __init__(self, node: Node, serial_port: str, serial_speed: int, namespace: str = ''):
+        '''
+        Channel Constructor
+
+        Args:
+            node {Node}: the node hosting the channel
+            serial_port {str}: the serial port of the Farmduino
+            serial_speed {int}: the baud rate of the serial port
+            namespace {str}: the namespace of the channel topics (empty for none)
+        '''
+        self.node_ = node
+        self.namespace_ = namespace
+        self.label_ = f'{namespace} ' if namespace else ''
+        self.logger_ = node.get_logger().get_child(namespace.replace('/', '.')) if namespace else node.get_logger()
+        self.uart_cmd_ = String()
+
+        serial_read_timeout = 0.1
+        tx_recovery_freq = 1
+        stats_period = 5.0
+
+        # Maximum amount of commands in flight on the Farmduino (1 disables pipelining)
+        tx_window = parameter(node, 'tx_window', 4)
+        # Dispatch the next command from the report that finished the previous one (False
+        # leaves the dispatching to the transmit timer, used to compare the idle gaps)
+        self.dispatch_on_ack_ = parameter(node, 'dispatch_on_ack', True)
+        # Abort (@) and requeue a lower class move in flight when an interactive command arrives
+        self.preempt_motion_ = parameter(node, 'preempt_motion', True)
+        # Merge the interactive moves waiting in the queue (a burst of jogs goes to its final target)
+        jog_coalescing = parameter(node, 'jog_coalescing', True)
+        # Time (s) an interactive command may take from being queued to being acknowledged (R01)
+        self.interactive_budget_ = parameter(node, 'interactive_latency_budget', 0.1)
+
+        # UART receive publisher
+        self.uart_rx_pub_ = node.create_publisher(String, self.topic('uart_receive'), 10)
+        # Typed report publishers
+        self.reports_ = ReportPublisher(node, namespace)
+
+        # Farmbot state publisher
+        self.farmbot_busy_ = Bool()
+        self.farmbot_busy_.data = False
+        self.farmbot_state_pub_ = node.create_publisher(Bool, self.topic('busy_state'), 10)
+
+        # Node subscripters and publishers
+        self.tx_queue_ = CommandScheduler(coalesced=(INTERACTIVE, ) if jog_coalescing else ())
+        self.window_ = CommandWindow(size=tx_window)
+        # Mirror of the Farmduino parameters, the travel the jogs are clamped to
+        # and watchdog of the commands in flight
+        self.params_ = ParamTracker(limits=fcode.Limits())
+        self.watchdog_ = CommandWatchdog(self, self.params_)
+        self.uart_tx_sub_ = node.create_subscription(String, self.topic('uart_transmit'),
+                                                     self.uart_transmit_callback, 200)
+        self.uart_tx_interactive_sub_ = node.create_subscription(String, self.topic('uart_transmit_interactive'),
+                                                                 self.uart_transmit_interactive_callback, 10)
+        self.uart_tx_background_sub_ = node.create_subscription(String, self.topic('uart_transmit_background'),
+                                                                self.uart_transmit_background_callback, 10)
+
+        # Serial traffic recorder (disabled if no path is set), rotated by size
+        record_path = namespaced_path(parameter(node, 'record_path', ''), namespace)
+        record_max_bytes = parameter(node, 'record_max_bytes', 10 * 1024 * 1024)
+        record_backups = parameter(node, 'record_backups', 3)
+        self.recorder_ = None
+        if record_path:
+            self.recorder_ = TrafficRecorder(record_path, max_bytes=record_max_bytes, backups=record_backups)
+            self.logger_.info(f'Recording the serial traffic to {record_path}')
+
+        # Lines framed by the reader thread waiting to be handled on the executor
+        self.rx_lines_ = deque()
+        self.rx_guard_ = node.create_guard_condition(self.uart_receive)
+        # Time between a line being read from serial and it being published
+        self.rx_latency_ = RunningStat()
+
+        # Initialize Serial Communication
+        self.serial_port_ = serial_port
+        self.serial_speed_ = serial_speed
+        self.serial_read_timeout_ = serial_read_timeout
+        self.ser_ = None
+        self.reader_ = SerialLineReader(None, self.queue_received_line, self.queue_link_error)
+        # Link supervision: failures reported by the reader thread are handled on the executor
+        self.link_state_ = LINK_DOWN
+        self.link_errors_ = deque()
+        self.link_guard_ = node.create_guard_condition(self.link_lost)
+        self.reconnect_min_delay_ = parameter(node, 'reconnect_min_delay', 0.5)
+        self.reconnect_max_delay_ = parameter(node, 'reconnect_max_delay', 10.0)
+        self.resync_timeout_ = parameter(node, 'resync_timeout', 5.0)
+        self.reconnect_delay_ = self.reconnect_min_delay_
+        self.next_attempt_ = 0.0
+        self.resync_deadline_ = 0.0
+        self.reconnects_ = 0
+        self.link_timer_ = node.create_timer(self.reconnect_min_delay_, self.check_link)
+        # Open the port and start the reader thread handling the incoming serial messages
+        if self.connect():
+            self.link_state_ = LINK_UP
+            self.link_timer_.cancel()
+        else:
+            self.logger_.warning(f'Could not open {serial_port}, retrying in the background')
+        # Recovery timer, dispatching is normally triggered by the reports and the queued commands
+        self.tx_timer_ = node.create_timer(1.0 / (tx_recovery_freq if self.dispatch_on_ack_ else 10),
+                                           self.uart_transmit)
+
+        # UART statistics publisher
+        self.stats_pub_ = node.create_publisher(String, self.topic('uart_stats'), 10)
+        self.stats_timer_ = node.create_timer(stats_period, self.publish_stats)
+
+        # Per command code latency histograms (queue wait, sent -> R01, R01 -> R02/R03)
+        self.timings_ = CommandTimings(parameter(node, 'timing_window', 500))
+        self.timing_dump_path_ = namespaced_path(
+            parameter(node, 'timing_dump_path', os.path.join(os.path.expanduser('~'), '.ros', 'uart_timings.yaml')),
+            namespace)
+        self.diagnostics_pub_ = node.create_publisher(DiagnosticArray, 'diagnostics', 10)
+        self.timing_dump_server_ = node.create_service(StringRepReq, self.topic('dump_uart_timings'),
+                                                       self.dump_timings_server)
+
+        # Burst throughput (e.g. parameter uploads). A burst lasts until the queue and window drain
+        self.burst_start_ = 0.0
+        self.burst_count_ = 0
+        self.burst_rate_ = RunningStat()
+        # Interactive command latency (queued -> R01, i.e. the key to motion time on the UART side)
+        self.interactive_latency_ = RunningStat()
+        self.over_budget_ = 0
+        # End of the last interactive command (a jog queued behind another one waits for it by design)
+        self.interactive_done_ = 0.0
+        # Idle gap between a command freeing the window and the next queued command being sent
+        self.idle_since_ = 0.0
+        self.idle_gap_ = RunningStat()
+        # Transmit counters and the snapshot of the counters at the last statistics report
+        self.tx_bytes_ = 0
+        self.tx_lines_ = 0
+        self.tx_writes_ = 0
+        self.last_stats_ = (time.monotonic(), 0, 0)
+
+        self.logger_.info(f'Farmduino channel on {serial_port} initialized..')
+
+    def topic(self, name: str) -> str:
+        return namespaced(self.namespace_, name)
+
+    def uart_transmit(self):
+        '''
+        Takes commands from the queue (tx_queue_) and sends them
+        to the farmbot through UART.
+        Commands are popped from the most urgent class for as long as
+        the command window allows them (i.e. they do not conflict
+        with the commands in flight and the window is not full).
+        The dispatched commands are coalesced into a single write.
+        '''
+        if self.link_state_ != LINK_UP:
+            # Kept queued until the link is up and resynchronized
+            return
+
+        lines = []
+        while self.tx_queue_:
+            queued = self.tx_queue_.peek()
+            message = queued.line.rstrip('\n')
+            if command_code(message) == JOG_CMD:
+                # Relative moves are resolved from the position the previous moves ended at
+                position = self.last_position()
+                if position is None:
+                    self.tx_queue_.pop()
+                    self.logger_.warning(f'Dropped {message}, the position is unknown (request it with F82)')
+                    continue
+                # Clamped to the travel of the axis (params 141-143 over 55-57)
+                resolved, clamped = resolve_jog(message, position, self.params_.limits_)
+                if clamped:
+                    self.logger_.warning(f'{message} from {position} clamped to the reach of the gantry: {resolved}')
+                message = resolved
+            if not self.window_.can_dispatch(command_code(message), len(message) + 5):
+                break
+            # Clear the command from the queue
+            self.tx_queue_.pop()
+            # A retried or preempted jog is sent again to the same target
+            queued.line = message
+
+            # Tag the command and record it as in flight
+            cmd = self.window_.open(message, source=queued)
+            self.timings_.add(cmd.code, 'wait', cmd.sent - queued.queued)
+            self.params_.observe_command(cmd.line)
+            self.watchdog_.arm(cmd, self.last_position())
+            if self.idle_since_:
+                self.idle_gap_.add(cmd.sent - self.idle_since_)
+                self.idle_since_ = 0.0
+            if not self.burst_count_:
+                self.burst_start_ = cmd.sent
+            self.burst_count_ += 1
+
+            lines.append(cmd.line)
+
+        # Send through UART the commands, every one with an endline character at the end
+        if lines:
+            self.logger_.debug(f'Sent messages: {lines}')
+            lines.append('')
+            self.write('\n'.join(lines), len(lines) - 1)
+
+        # Set the blocker flag
+        self.set_busy(bool(self.window_))
+
+    def write(self, data: str, lines: int = 1):
+        '''
+        Writes to the serial port, updating the transmit counters
+
+        Args:
+            data {str}: the command line(s), endline characters included
+            lines {int}: the amount of command lines in data
+        '''
+        if self.ser_ is None:
+            self.logger_.warning(f'{self.serial_port_} is not connected, dropped {data.splitlines()}')
+            return
+        encoded = data.encode('utf-8')
+        try:
+            self.ser_.write(encoded)
+        except OSError as e:
+            # serial.SerialException is an OSError. The commands in flight are requeued
+            self.queue_link_error(e)
+            return
+        if self.recorder_ is not None:
+            stamp = time.monotonic()
+            for line in data.splitlines():
+                self.recorder_.record(TX, stamp, line)
+        self.tx_bytes_ += len(encoded)
+        self.tx_lines_ += lines
+        self.tx_writes_ += 1
+
+    def set_busy(self, busy: bool):
+        '''
+        Publishes the busy state if it changed
+
+        Args:
+            busy {bool}: True if the Farmduino has commands in flight
+        '''
+        if self.farmbot_busy_.data != busy:
+            if not busy:
+                self.reports_.position_.flush()
+            self.farmbot_busy_.data = busy
+            self.farmbot_state_pub_.publish(self.farmbot_busy_)
+
+    def uart_transmit_callback(self, message: String):
+        '''
+        Callback handling the (job) commands that are queued to be sent
+        to the farmbot through UART.
+        '''
+        self.queue_command(message.data, JOB)
+
+    def uart_transmit_interactive_callback(self, message: String):
+        '''
+        Callback handling the interactive (operator) commands
+        '''
+        self.queue_command(message.data, INTERACTIVE)
+
+    def uart_transmit_background_callback(self, message: String):
+        '''
+        Callback handling the background (telemetry) commands
+        '''
+        self.queue_command(message.data, BACKGROUND)
+
+    def queue_command(self, message: str, priority: int):
+        '''
+        Queues a command to be sent to the farmbot through UART.
+        Two cases:
+            a) the command has priority (e.g. electronic-stop):
+                The command bypasses the queue and the queue is reset
+            b) standard command:
+                The command is added at the end of its class. If a lower
+                class move is in flight, it is aborted and requeued
+
+        Args:
+            message {str}: the command line
+            priority {int}: the class of the command (INTERACTIVE, JOB or BACKGROUND)
+        '''
+        # An interactive abort (e.g. the end of a continuous jog) only stops the interactive moves
+        if message == '@' and priority == INTERACTIVE:
+            self.abort_interactive()
+            return
+
+        # Priority commands
+        if message in ['E', 'F09', '@']:
+            self.logger_.info(f'Sent message: {message}')
+            self.tx_queue_.bypass(EMERGENCY)
+
+            # Send command and reset everything
+            self.write(message + '\n')
+            self.tx_queue_.clear()
+            self.window_.clear()
+            self.watchdog_.reset()
+            self.burst_count_ = 0
+            self.idle_since_ = 0.0
+            self.farmbot_busy_.data = False
+            self.farmbot_state_pub_.publish(self.farmbot_busy_)
+            return
+
+        # Standard commands
+        self.tx_queue_.push(message, priority)
+
+        # Abort a less urgent move, it is requeued once the Farmduino reports it stopped
+        preempted = self.window_.preemptible(priority) if self.preempt_motion_ else None
+        if preempted is not None:
+            preempted.preempted = True
+            self.logger_.info(f'Preempting {CLASS_NAMES[preempted.source.priority]} command '
+                              f'{preempted.line} for {CLASS_NAMES[priority]} command {message}')
+            self.write('@\n')
+
+        # Send it right away if the window allows it
+        if self.dispatch_on_ack_:
+            self.uart_transmit()
+
+    def abort_interactive(self):
+        '''
+        Drops the queued interactive commands and aborts the interactive move in flight.
+        The jobs are kept: a job move preempted by the jogs is already requeued, and the
+        aborted move is closed by its R02/R03 so the next command is dispatched from there
+        '''
+        dropped = self.tx_queue_.clear_class(INTERACTIVE)
+        aborted = [cmd for cmd in self.window_.commands() if cmd.code in PREEMPTIBLE_CMDS
+                   and cmd.source is not None and cmd.source.priority == INTERACTIVE]
+        if aborted:
+            self.write('@\n')
+        self.logger_.info(f'Interactive abort: {len(aborted)} move(s) stopped, {dropped} queued command(s) dropped')
+
+    def queue_received_line(self, line: str, stamp: float):
+        '''
+        Called from the reader thread for every complete line. The line is
+        queued and the executor is woken up to handle it.
+
+        Args:
+            line {str}: the line received from the Farmduino
+            stamp {float}: monotonic time the line was received at
+        '''
+        self.rx_lines_.append((line, stamp))
+        self.rx_guard_.trigger()
+
+    def uart_receive(self):
+        '''
+        Guard condition callback that handles the lines queued by the
+        reader thread (response codes and commands). The next commands
+        are dispatched once the whole batch is handled, so the slots freed
+        by several reports are filled with a single write.
+        '''
+        while self.rx_lines_:
+            line, stamp = self.rx_lines_.popleft()
+            self.logger_.debug(f'Received message: {line}')
+            if self.recorder_ is not None:
+                self.recorder_.record(RX, stamp, line)
+
+            # Call the callback function
+            self.handle_message(line, dispatch=False, stamp=stamp)
+            self.rx_latency_.add(time.monotonic() - stamp)
+
+        self.dispatch_next()
+
+    def dispatch_next(self):
+        '''
+        Sends the next command(s) right away. The busy flag is only lowered if nothing
+        else is in flight, so it does not flicker between two queued commands
+        '''
+        if self.link_state_ != LINK_UP:
+            return
+        if self.dispatch_on_ack_ and self.tx_queue_:
+            self.uart_transmit()
+        else:
+            self.set_busy(bool(self.window_))
+
+    def report_failed(self, cmd):
+        '''
+        Reports a command that was dropped without its completion as failed (R03)
+        on /report/cmd_state, so its sender does not wait for it
+
+        Args:
+            cmd {InFlightCommand}: the dropped command
+        '''
+        self.reports_.publish(parse_report(f'{ERROR_RESPONSE} Q{cmd.queue}'), cmd.code)
+
+    def handle_message(self, message: str, dispatch: bool = True, stamp: float = 0.0):
+        '''
+        Handles the command lines that are received through serial
+        
+        Args:
+            message {str}: the command string
+            dispatch {bool}: dispatch the next command(s) if the report freed the window
+            stamp {float}: monotonic time the line was received at (now if not set)
+        '''
+        # Record the message
+        self.uart_cmd_.data = message
+
+        # Decode the report code, the queue number it was tagged with and its values
+        report = parse_report(message)
+        rep_code = report.code
+        if report.queue == PROBE_QUEUE_NR:
+            # Answer to a watchdog probe, not part of any command in the window
+            self.watchdog_.probe_report(report)
+            cmd = None
+        else:
+            cmd = self.window_.match(rep_code, report.queue)
+        if self.link_state_ == LINK_RESYNC and rep_code == DEBUG_REPORT and report.text == STARTUP_MESSAGE:
+            self.resync()
+        if rep_code in PARAM_REPORTS and report.has('P', 'V'):
+            self.params_.observe_value(int(report.value('P')), int(report.value('V')))
+        # Reports following the echo of a non blocking command still belong to it
+        timed = cmd if cmd is not None else self.window_.recent(report.queue)
+        if timed is not None:
+            self.record_timing(timed, rep_code, stamp or time.monotonic())
+
+        if cmd is not None:
+            if rep_code == ACK_RESPONSE:
+                # The Farmduino read the command from its serial buffer
+                cmd.acked = True
+            elif rep_code in (BUSY_RESPONSE, POSITION_REPORT):
+                # The command is still running
+                self.watchdog_.heartbeat(cmd)
+            elif cmd.finished_by(rep_code):
+                # A running command has finished OR the response for a request was retrieved
+                # OR the sent command was acknowledged by the farmbot
+                self.window_.close(cmd)
+                if cmd.source is not None and cmd.source.priority == INTERACTIVE:
+                    self.interactive_done_ = stamp or time.monotonic()
+                # An aborted (preempted) move goes back at the head of its class
+                if cmd.preempted:
+                    self.tx_queue_.push_front(cmd.source)
+                if self.tx_queue_:
+                    self.idle_since_ = time.monotonic()
+                elif not self.window_:
+                    self.record_burst()
+
+            if dispatch:
+                self.dispatch_next()
+
+        # Send the reporting message for further processing by other nodes
+        self.reports_.publish(report, cmd.code if cmd is not None else self.window_.code_of(report.queue))
+        self.uart_rx_pub_.publish(self.uart_cmd_)
+
+    def last_position(self) -> tuple:
+        '''
+        Returns the last reported (x, y, z) position, or None if none was reported yet
+        '''
+        position = self.reports_.position_.latest_
+        return (position.x, position.y, position.z) if position is not None else None
+
+    def record_timing(self, cmd, rep_code: str, stamp: float):
+        '''
+        Records the ack latency (sent -> R01) and the execution time
+        (R01 -> R02/R03) of a command
+
+        Args:
+            cmd {InFlightCommand}: the command the report belongs to
+            rep_code {str}: the report code
+            stamp {float}: monotonic time the report was received at
+        '''
+        if rep_code == ACK_RESPONSE:
+            if not cmd.acked_at:
+                cmd.acked_at = stamp
+                self.timings_.add(cmd.code, 'ack', stamp - cmd.sent)
+                if cmd.source is not None and cmd.source.priority == INTERACTIVE:
+                    self.record_interactive(cmd.code, stamp - max(cmd.source.queued, self.interactive_done_))
+        elif rep_code in BLOCKING_RESPONSES and not cmd.finished:
+            cmd.finished = True
+            self.timings_.add(cmd.code, 'exec', stamp - (cmd.acked_at or cmd.sent))
+
+    def record_interactive(self, code: str, latency: float):
+        '''
+        Records the time an interactive command took from being queued to being
+        acknowledged, warning when it is over the latency budget
+
+        Args:
+            code {str}: the command code
+            latency {float}: the latency (s)
+        '''
+        self.interactive_latency_.add(latency)
+        if latency > self.interactive_budget_:
+            self.over_budget_ += 1
+            self.logger_.warning(f'Interactive {code} took {latency * 1000.0:.0f}ms to start '
+                                 f'(budget {self.interactive_budget_ * 1000.0:.0f}ms)')
+
+    def record_burst(self):
+        '''
+        Records the throughput of a burst of commands once the queue and the
+        command window drained (e.g. at the end of a parameter upload)
+        '''
+        count, self.burst_count_ = self.burst_count_, 0
+        duration = time.monotonic() - self.burst_start_
+        # Single commands are not bursts, their time is dominated by the execution
+        if count < 5 or duration <= 0.0:
+            return
+
+        self.burst_rate_.add(count / duration)
+        self.logger_.info(f'Drained {count} commands in {duration:.2f}s ({count / duration:.1f} cmd/s)')
+
+    def publish_stats(self):
+        '''
+        Publishes a summary of the UART statistics
+        '''
+        # Throughput since the last report
+        now = time.monotonic()
+        last_time, last_tx_bytes, last_rx_bytes = self.last_stats_
+        period = max(now - last_time, 1e-6)
+        self.last_stats_ = (now, self.tx_bytes_, self.reader_.rx_bytes_)
+
+        stats = String()
+        stats.data = (f'tx_lines={self.tx_lines_} tx_bytes={self.tx_bytes_} tx_writes={self.tx_writes_} '
+                      f'tx_bytes_per_s={(self.tx_bytes_ - last_tx_bytes) / period:.1f} '
+                      f'rx_lines={self.reader_.rx_lines_} rx_bytes={self.reader_.rx_bytes_} '
+                      f'rx_bytes_per_s={(self.reader_.rx_bytes_ - last_rx_bytes) / period:.1f} '
+                      f'rx_to_publish_ms[{self.rx_latency_.summary()}] '
+                      f'in_flight={len(self.window_)} queued={len(self.tx_queue_)} {self.tx_queue_.summary()} '
+                      f'burst_cmd_per_s[{self.burst_rate_.summary(scale=1.0)}] '
+                      f'idle_gap_ms[{self.idle_gap_.summary()}] {self.reports_.position_.summary()} '
+                      f'interactive_ms[{self.interactive_latency_.summary()}] over_budget={self.over_budget_} '
+                      f'{self.watchdog_.summary()} link={self.link_state_} reconnects={self.reconnects_}')
+        self.stats_pub_.publish(stats)
+        self.publish_diagnostics()
+        if self.recorder_ is not None:
+            self.recorder_.flush()
+
+    def publish_diagnostics(self):
+        '''
+        Publishes the per command code latency histograms on /diagnostics
+        '''
+        diagnostics = DiagnosticArray()
+        diagnostics.header.stamp = self.node_.get_clock().now().to_msg()
+        for code, phases in self.timings_.as_dict().items():
+            status = DiagnosticStatus()
+            status.level = DiagnosticStatus.OK
+            status.name = f'{self.node_.get_name()}: {self.label_}{code}'
+            status.hardware_id = self.serial_port_
+            status.message = ' '.join(
+                f"{phase}_p50={stats.get('p50', 0.0)}ms" for phase, stats in phases.items())
+            for phase, stats in phases.items():
+                for key, value in stats.items():
+                    if key != 'buckets':
+                        status.values.append(KeyValue(key=f'{phase}_{key}', value=str(value)))
+            diagnostics.status.append(status)
+        self.diagnostics_pub_.publish(diagnostics)
+
+    def dump_timings_server(self, request, response):
+        '''
+        Service Server that writes the per command code latency histograms
+        (in milliseconds) to a YAML file
+        '''
+        path = request.data or self.timing_dump_path_
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as yaml_file:
+                yaml.dump(self.timings_.as_dict(), yaml_file, default_flow_style = False)
+        except OSError as e:
+            self.logger_.warning(f'Could not dump the UART timings to {path}: {e}')
+            response.data = 'FAILED'
+            return response
+
+        self.logger_.info(f'UART timings dumped to {path}')
+        response.data = path
+        return response
+    
+    def connect(self) -> bool:
+        '''
+        Opens the serial port and starts the reader thread on it
+
+        Returns:
+            True if the port was opened
+        '''
+        try:
+            self.ser_ = serial.Serial(self.serial_port_, self.serial_speed_, timeout=self.serial_read_timeout_)
+            self.ser_.reset_input_buffer()
+        except OSError as e:
+            self.logger_.debug(f'Could not open {self.serial_port_}: {e}')
+            self.ser_ = None
+            return False
+        self.reader_.start(self.ser_)
+        return True
+
+    def queue_link_error(self, error: OSError):
+        '''
+        Called (from the reader thread or the executor) when the port fails.
+        The failure is handled on the executor
+        '''
+        self.link_errors_.append(error)
+        self.link_guard_.trigger()
+
+    def link_lost(self):
+        '''
+        Guard condition callback closing the failed port. The queue is kept. It is
+        unknown whether the Farmduino ran the commands in flight: the moves and reads
+        are put back at the head of their class, the others (e.g. pin writes, watering
+        pulses) are reported as failed on /report/cmd_state rather than run twice
+        '''
+        if not self.link_errors_:
+            return
+        error = self.link_errors_.popleft()
+        self.link_errors_.clear()
+        if self.link_state_ == LINK_DOWN:
+            return
+        self.logger_.error(f'Lost the connection to {self.serial_port_} ({error}), reconnecting')
+
+        self.reader_.stop()
+        try:
+            self.ser_.close()
+        except OSError:
+            pass
+        self.ser_ = None
+        self.link_state_ = LINK_DOWN
+
+        in_flight = [cmd for cmd in self.window_.commands() if cmd.source is not None]
+        requeued = [cmd.source for cmd in in_flight if cmd.code in REPLAYABLE_CMDS]
+        failed = [cmd for cmd in in_flight if cmd.code not in REPLAYABLE_CMDS]
+        for queued in reversed(requeued):
+            self.tx_queue_.push_front(queued)
+        for cmd in failed:
+            self.report_failed(cmd)
+        self.window_.clear()
+        self.watchdog_.reset()
+        self.burst_count_ = 0
+        self.idle_since_ = 0.0
+        if requeued:
+            self.logger_.warning(f'Requeued {len(requeued)} command(s) that were in flight')
+        if failed:
+            self.logger_.error(f'Failed {[cmd.line for cmd in failed]}, they may have run before the link was lost')
+        # The Farmduino is not available until the link is resynchronized
+        self.set_busy(True)
+
+        self.reconnect_delay_ = self.reconnect_min_delay_
+        self.next_attempt_ = time.monotonic() + self.reconnect_delay_
+        self.link_timer_.reset()
+
+    def check_link(self):
+        '''
+        Timer callback reopening the port with an exponential backoff, and ending
+        the resync if the Farmduino does not report a startup (i.e. it was not reset)
+        '''
+        now = time.monotonic()
+        if self.link_state_ == LINK_RESYNC:
+            if now > self.resync_deadline_:
+                self.logger_.warning(f'No startup report within {self.resync_timeout_}s, resuming anyway')
+                self.resync()
+            return
+        if self.link_state_ != LINK_DOWN or now < self.next_attempt_:
+            return
+
+        if not self.connect():
+            self.reconnect_delay_ = min(self.reconnect_delay_ * 2.0, self.reconnect_max_delay_)
+            self.next_attempt_ = now + self.reconnect_delay_
+            self.logger_.debug(f'Reconnecting to {self.serial_port_} in {self.reconnect_delay_:.1f}s')
+            return
+
+        self.reconnects_ += 1
+        self.link_state_ = LINK_RESYNC
+        self.resync_deadline_ = now + self.resync_timeout_
+        self.logger_.info(f'Reconnected to {self.serial_port_}, waiting for the Farmduino startup')
+
+    def resync(self):
+        '''
+        Brings the Farmduino back to the state of the session and resumes the queue:
+        the position is requested and the parameters written during the session are
+        applied again, ahead of every queued command
+        '''
+        self.link_timer_.cancel()
+        self.link_state_ = LINK_UP
+        writes = self.params_.session_writes()
+        for line in ['F82'] + writes:
+            self.tx_queue_.push(line, EMERGENCY)
+        self.logger_.info(f'Resynchronized {self.serial_port_} ({len(writes)} parameter(s) applied again), '
+                          f'resuming {len(self.tx_queue_) - len(writes) - 1} queued command(s)')
+        self.uart_transmit()
+
+    def close(self):
+        '''
+        Stops the reader and closes the UART (and the traffic log)
+        '''
+        self.reader_.stop()
+        if self.ser_ is not None:
+            self.ser_.close()
+        if self.recorder_ is not None:
+            self.recorder_.close()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import queue
+import random
+import threading
+import time
+import tty
+
+import yaml
+
+# Parameters used by the emulator if no parameter table can be loaded (firmware defaults)
+# and the parameter indexes used by the motion model
+from farmbot_command_handler.firmware_params import (DEFAULT_PARAMS, STEP_PER_MM, MAX_SPEED, HOME_SPEED,
+                                                     AXIS_NR_STEPS, DEFAULT_AXIS_LENGTH)
+
+
+SOFTWARE_VERSION = '6.6.21.EMULATOR'
+
+
+def load_param_table(path: str) -> dict:
+    '''
+    Loads the parameter table the emulator starts with. The firmware default
+    table of farmbot_controllers is used if no path is given and the package
+    can be found, otherwise the built-in defaults are used.
+
+    Args:
+        path {str}: path to a yaml parameter table (e.g. firmwareDefault.yaml)
+    '''
+    if not path:
+        try:
+            from ament_index_python.packages import get_package_share_directory
+            path = os.path.join(get_package_share_directory('farmbot_controllers'),
+                                'config', 'firmwareDefault.yaml')
+        except (ImportError, LookupError):
+            return dict(DEFAULT_PARAMS)
+
+    with open(path, 'r') as yaml_file:
+        loaded = yaml.safe_load(yaml_file)
+    params = dict(DEFAULT_PARAMS)
+    if isinstance(loaded, dict):
+        params.update({int(key): int(value) for key, value in loaded.items()})
+    return params
+
+
+class FarmduinoEmulator:
+    '''
+    Hardware-free emulation of the Farmduino firmware.
+
+    The emulator opens a pseudo-terminal and speaks the F-Code/R-Code protocol
+    used by the farmbot_command_handler package, so the UART controller (and the
+    whole stack) can be run against it by pointing its 'serial_port' parameter
+    at the printed (or linked) pty path.
+
+    Covered commands: G00/G01/G28 (with simulated axis speed), F09, F11-F16,
+    F20-F23 (over a real parameter table), F41-F44, F61, F81-F84, E and @.
+    Reports are tagged with the queue number (Q) of their command.
+
+    Timing can be scaled, and faults (dropped or garbled reports, commands that
+    never finish and extra report latency) can be injected for load testing.
+    '''
+    def __init__(self, params: dict, time_scale: float = 1.0, report_interval: float = 0.5,
+                 latency: float = 0.0, drop_rate: float = 0.0, garble_rate: float = 0.0,
+                 stall_rate: float = 0.0, seed: int = None, verbose: bool = False):
+        '''
+        Emulator constructor
+
+        Args:
+            params {dict}: the parameter table (index -> value)
+            time_scale {float}: multiplier applied to all the simulated durations (0 makes moves instant)
+            report_interval {float}: period (s) of the R82 reports during a move
+            latency {float}: extra delay (s) before each report is written
+            drop_rate {float}: probability of a report line being dropped
+            garble_rate {float}: probability of a report line being corrupted
+            stall_rate {float}: probability of a command never being finished
+            seed {int}: seed of the fault injection random generator
+            verbose {bool}: prints the serial traffic
+        '''
+        self.params_ = params
+        self.time_scale_ = time_scale
+        self.report_interval_ = report_interval
+        self.latency_ = latency
+        self.drop_rate_ = drop_rate
+        self.garble_rate_ = garble_rate
+        self.stall_rate_ = stall_rate
+        self.random_ = random.Random(seed)
+        self.verbose_ = verbose
+
+        # Machine state
+        self.position_ = [0.0, 0.0, 0.0]
+        self.pins_ = {}
+        self.pin_modes_ = {}
+        self.estop_ = False
+        self.abort_ = threading.Event()
+
+        # Pseudo-terminal. The slave end is the "serial port" the stack opens
+        self.master_fd_, self.slave_fd_ = os.openpty()
+        tty.setraw(self.slave_fd_)
+        self.port_name_ = os.ttyname(self.slave_fd_)
+
+        self.commands_ = queue.Queue()
+        self.write_lock_ = threading.Lock()
+        self.should_continue = True
+
+    @property
+    def port_name(self) -> str:
+        return self.port_name_
+
+    ## Serial handling
+
+    def write_line(self, line: str, faults: bool = True):
+        '''
+        Writes a report line to the serial port, applying the injected faults
+
+        Args:
+            line {str}: the report line without the endline characters
+            faults {bool}: False to bypass the fault injection (e.g. startup report)
+        '''
+        if faults:
+            if self.latency_:
+                time.sleep(self.latency_)
+            if self.drop_rate_ and self.random_.random() < self.drop_rate_:
+                self.log(f'-> (dropped) {line}')
+                return
+            if self.garble_rate_ and self.random_.random() < self.garble_rate_:
+                index = self.random_.randrange(len(line))
+                line = line[:index] + '#' + line[index + 1:]
+
+        self.log(f'-> {line}')
+        with self.write_lock_:
+            os.write(self.master_fd_, (line + '\r\n').encode('utf-8'))
+
+    def read_loop(self):
+        '''
+        Reads and frames the incoming commands. E (electronic stop) and @ (abort)
+        are handled right away, like the firmware does during a movement.
+        '''
+        buffer = bytearray()
+        while self.should_continue:
+            try:
+                chunk = os.read(self.master_fd_, 256)
+            except OSError:
+                break
+            buffer += chunk
+            while b'\n' in buffer:
+                raw, _, rest = bytes(buffer).partition(b'\n')
+                buffer = bytearray(rest)
+                line = raw.decode('utf-8', errors='replace').strip()
+                if not line:
+                    continue
+                self.log(f'<- {line}')
+                if line == 'E':
+                    self.estop_ = True
+                    self.abort_.set()
+                elif line == '@':
+                    self.abort_.set()
+                else:
+                    self.commands_.put(line)
+
+    def log(self, text: str):
+        if self.verbose_:
+            print(f'[{time.monotonic():.3f}] {text}', flush=True)
+
+    ## Command execution
+
+    def run(self, startup_delay: float = 0.0):
+        '''
+        Starts the emulator and executes the received commands until stopped
+
+        Args:
+            startup_delay {float}: time (s) before the startup report is sent
+        '''
+        reader = threading.Thread(target=self.read_loop)
+        reader.daemon = True
+        reader.start()
+
+        time.sleep(startup_delay)
+        self.write_line('R99 ARDUINO STARTUP COMPLETE', faults=False)
+
+        while self.should_continue:
+            try:
+                line = self.commands_.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.execute(line)
+
+    def stop(self):
+        '''
+        Stops the emulator and closes the pseudo-terminal
+        '''
+        self.should_continue = False
+        os.close(self.slave_fd_)
+        os.close(self.master_fd_)
+
+    def execute(self, line: str):
+        '''
+        Executes a single command line, reporting R08/R01 and R02/R03 around it
+
+        Args:
+            line {str}: the command line (e.g. 'G00 X10 Y20 Z0 Q5')
+        '''
+        tokens = line.split(' ')
+        code = tokens[0]
+        args = {}
+        for token in tokens[1:]:
+            if len(token) > 1:
+                try:
+                    args[token[0]] = float(token[1:])
+                except ValueError:
+                    pass
+        q = f' Q{int(args["Q"])}' if 'Q' in args else ''
+
+        self.write_line(f'R08 *{line}*{q}')
+
+        # The firmware only accepts the electronic stop reset while it is stopped
+        if self.estop_ and code != 'F09':
+            self.write_line(f'R87{q}')
+            self.write_line(f'R03{q}')
+            return
+
+        self.write_line(f'R01{q}')
+        self.abort_.clear()
+
+        handler = getattr(self, 'cmd_' + code, None)
+        if handler is None:
+            self.write_line(f'R03{q}')
+            return
+
+        success = handler(args, q)
+
+        if self.stall_rate_ and self.random_.random() < self.stall_rate_:
+            self.log(f'(stalled) {line}')
+            return
+        self.write_line(f'R02{q}' if success else f'R03{q}')
+
+    def report_position(self, q: str = ''):
+        x, y, z = self.position_
+        self.write_line(f'R82 X{x:.2f} Y{y:.2f} Z{z:.2f}{q}')
+
+    def move_to(self, target: list, speeds: list, q: str) -> bool:
+        '''
+        Moves the simulated gantry towards a target at the per axis speeds,
+        reporting the position periodically. Each axis moves independently.
+
+        Args:
+            target {list}: target position (mm) for X, Y and Z
+            speeds {list}: speed (mm/s) of each axis
+            q {str}: the queue number tag of the command
+        Returns:
+            False if the move was aborted
+        '''
+        start = list(self.position_)
+        durations = [abs(target[i] - start[i]) / speeds[i] if speeds[i] > 0 else 0.0 for i in range(3)]
+        duration = max(durations) * self.time_scale_
+        began = time.monotonic()
+        next_report = began + self.report_interval_
+
+        while True:
+            elapsed = time.monotonic() - began
+            done = elapsed >= duration
+            for i in range(3):
+                axis_time = durations[i] * self.time_scale_
+                ratio = 1.0 if done or axis_time <= elapsed else elapsed / axis_time
+                self.position_[i] = start[i] + (target[i] - start[i]) * ratio
+            if done:
+                break
+            if self.abort_.wait(min(0.02, max(0.0, duration - elapsed))):
+                self.report_position(q)
+                return False
+            if time.monotonic() >= next_report:
+                next_report += self.report_interval_
+                self.report_position(q)
+
+        self.report_position(q)
+        return True
+
+    def axis_speed(self, axis: int, speed_override: float = None, homing: bool = False) -> float:
+        '''
+        Returns the speed (mm/s) of an axis from the parameter table
+
+        Args:
+            axis {int}: 0 for X, 1 for Y and 2 for Z
+            speed_override {float}: optional speed limit in steps/s (A, B, C arguments)
+            homing {bool}: uses the homing speed instead of the maximum speed
+        '''
+        steps_per_mm = max(self.params_.get(STEP_PER_MM[axis], 1), 1)
+        speed = self.params_.get(HOME_SPEED[axis] if homing else MAX_SPEED[axis], 400)
+        if speed_override:
+            speed = min(speed, speed_override)
+        return max(speed, 1) / steps_per_mm
+
+    def axis_length(self, axis: int) -> float:
+        steps = self.params_.get(AXIS_NR_STEPS[axis], 0)
+        if steps:
+            return steps / max(self.params_.get(STEP_PER_MM[axis], 1), 1)
+        return DEFAULT_AXIS_LENGTH[axis]
+
+    # Movement commands
+
+    def cmd_G00(self, args: dict, q: str) -> bool:
+        target = [args.get(axis, self.position_[i]) for i, axis in enumerate('XYZ')]
+        speeds = [self.axis_speed(i, args.get(speed)) for i, speed in enumerate('ABC')]
+        return self.move_to(target, speeds, q)
+
+    def cmd_G01(self, args: dict, q: str) -> bool:
+        target = [args.get(axis, self.position_[i]) for i, axis in enumerate('XYZ')]
+        speed = min(self.axis_speed(i) for i in range(3))
+        return self.move_to(target, [speed, speed, speed], q)
+
+    def cmd_G28(self, args: dict, q: str) -> bool:
+        return self.move_to([0.0, 0.0, 0.0], [self.axis_speed(i) for i in range(3)], q)
+
+    def find_home(self, axis: int, q: str) -> bool:
+        target = list(self.position_)
+        target[axis] = 0.0
+        speeds = [self.axis_speed(i, homing=True) for i in range(3)]
+        return self.move_to(target, speeds, q)
+
+    def calibrate(self, axis: int, q: str) -> bool:
+        '''
+        Calibration runs to the end of the axis and back home, then stores the axis length
+        '''
+        speeds = [self.axis_speed(i, homing=True) for i in range(3)]
+        target = list(self.position_)
+        target[axis] = self.axis_length(axis)
+        if not self.move_to(target, speeds, q) or not self.find_home(axis, q):
+            return False
+        steps = int(self.axis_length(axis) * max(self.params_.get(STEP_PER_MM[axis], 1), 1))
+        self.params_[AXIS_NR_STEPS[axis]] = steps
+        self.write_line(f'R23 P{AXIS_NR_STEPS[axis]} V{steps}{q}')
+        return True
+
+    def cmd_F11(self, args: dict, q: str) -> bool:
+        return self.find_home(0, q)
+
+    def cmd_F12(self, args: dict, q: str) -> bool:
+        return self.find_home(1, q)
+
+    def cmd_F13(self, args: dict, q: str) -> bool:
+        return self.find_home(2, q)
+
+    def cmd_F14(self, args: dict, q: str) -> bool:
+        return self.calibrate(0, q)
+
+    def cmd_F15(self, args: dict, q: str) -> bool:
+        return self.calibrate(1, q)
+
+    def cmd_F16(self, args: dict, q: str) -> bool:
+        return self.calibrate(2, q)
+
+    # State and parameter commands
+
+    def cmd_F09(self, args: dict, q: str) -> bool:
+        self.estop_ = False
+        return True
+
+    def cmd_F20(self, args: dict, q: str) -> bool:
+        for param, value in sorted(self.params_.items()):
+            self.write_line(f'R21 P{param} V{value}{q}')
+        return True
+
+    def cmd_F21(self, args: dict, q: str) -> bool:
+        param = int(args.get('P', -1))
+        if param not in self.params_:
+            return False
+        self.write_line(f'R21 P{param} V{self.params_[param]}{q}')
+        return True
+
+    def cmd_F22(self, args: dict, q: str) -> bool:
+        if 'P' not in args or 'V' not in args:
+            return False
+        self.params_[int(args['P'])] = int(args['V'])
+        return True
+
+    def cmd_F23(self, args: dict, q: str) -> bool:
+        if 'P' not in args or 'V' not in args:
+            return False
+        self.params_[int(args['P'])] = int(args['V'])
+        self.write_line(f'R23 P{int(args["P"])} V{int(args["V"])}{q}')
+        return True
+
+    # Pin commands
+
+    def cmd_F41(self, args: dict, q: str) -> bool:
+        if 'P' not in args or 'V' not in args:
+            return False
+        self.pins_[int(args['P'])] = int(args['V'])
+        return True
+
+    def cmd_F42(self, args: dict, q: str) -> bool:
+        if 'P' not in args:
+            return False
+        pin = int(args['P'])
+        self.write_line(f'R41 P{pin} V{self.pins_.get(pin, 0)}{q}')
+        return True
+
+    def cmd_F43(self, args: dict, q: str) -> bool:
+        if 'P' not in args:
+            return False
+        self.pin_modes_[int(args['P'])] = int(args.get('M', 0))
+        return True
+
+    def cmd_F44(self, args: dict, q: str) -> bool:
+        if 'P' not in args or 'V' not in args:
+            return False
+        pin = int(args['P'])
+        self.pins_[pin] = int(args['V'])
+        # The pulse (T in ms) can be interrupted by an abort like a move
+        if self.abort_.wait(args.get('T', 0.0) / 1000.0 * self.time_scale_):
+            return False
+        self.pins_[pin] = int(args.get('W', 0))
+        return True
+
+    def cmd_F61(self, args: dict, q: str) -> bool:
+        return int(args.get('P', -1)) in (4, 5, 6, 11)
+
+    # Reporting commands
+
+    def cmd_F81(self, args: dict, q: str) -> bool:
+        self.write_line(f'R81 XA0 XB0 YA0 YB0 ZA0 ZB0{q}')
+        return True
+
+    def cmd_F82(self, args: dict, q: str) -> bool:
+        self.report_position(q)
+        return True
+
+    def cmd_F83(self, args: dict, q: str) -> bool:
+        self.write_line(f'R83 {SOFTWARE_VERSION}{q}')
+        return True
+
+    def cmd_F84(self, args: dict, q: str) -> bool:
+        for i, axis in enumerate('XYZ'):
+            if args.get(axis):
+                self.position_[i] = 0.0
+        self.report_position(q)
+        return True
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(description='Farmduino firmware emulator on a pseudo-terminal')
+    parser.add_argument('--params', default='', help='yaml parameter table to start from')
+    parser.add_argument('--link', default='', help='symlink created to the pty (e.g. /tmp/ttyFarmduino)')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='multiplier of the simulated durations')
+    parser.add_argument('--report-interval', type=float, default=0.5, help='period (s) of the R82 reports while moving')
+    parser.add_argument('--startup-delay', type=float, default=1.0, help='delay (s) before R99 is reported')
+    parser.add_argument('--latency', type=float, default=0.0, help='extra delay (s) before each report')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='probability of dropping a report')
+    parser.add_argument('--garble-rate', type=float, default=0.0, help='probability of garbling a report')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='probability of a command never finishing')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the fault injection')
+    parser.add_argument('--verbose', action='store_true', help='print the serial traffic')
+    options = parser.parse_args(args)
+
+    emulator = FarmduinoEmulator(load_param_table(options.params), time_scale=options.time_scale,
+                                 report_interval=options.report_interval, latency=options.latency,
+                                 drop_rate=options.drop_rate, garble_rate=options.garble_rate,
+                                 stall_rate=options.stall_rate, seed=options.seed, verbose=options.verbose)
+
+    port = emulator.port_name
+    if options.link:
+        if os.path.lexists(options.link):
+            os.remove(options.link)
+        os.symlink(port, options.link)
+        port = options.link
+    print(f'Farmduino emulator listening on {port} '
+          f'(ros2 run farmbot_command_handler uart_controller --ros-args -p serial_port:={port})', flush=True)
+
+    try:
+        emulator.run(startup_delay=options.startup_delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+        if options.link and os.path.islink(options.link):
+            os.remove(options.link)
+
+
+if __name__ == '__main__':
+    main()
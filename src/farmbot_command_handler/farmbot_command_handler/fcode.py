@@ -0,0 +1,388 @@
+# F-Code encoder (the Farmduino's version of GCode). Builds the command lines in the
+# format the command handler nodes always used, so the controllers can encode their
+# commands in-process and publish them straight to the UART controller. Invalid
+# commands raise an FCodeError instead of reaching the serial port.
+#
+# The lines are filled from the precompiled templates below with the %-operator, the
+# cheapest formatting for these short lines (see fcode_benchmark for the budgets).
+# Values are checked against the fixed ranges of the Farmduino (pins, servos, parameters)
+# and the moves against a Limits object: the axis speeds and travel once the firmware
+# parameters are known, and the work envelope of the active map.
+
+import math
+
+from farmbot_command_handler.firmware_params import AXIS_NR_STEPS, MAX_SPEED, STEP_PER_MM
+
+# State commands
+ESTOP = 'E'                 # Electronic stop
+ABORT = '@'                 # Abort the current movement
+RESET_ESTOP = 'F09'         # Reset the electronic stop
+REPORT_END_STOPS = 'F81'
+REPORT_POSITION = 'F82'
+REPORT_VERSION = 'F83'
+LIST_PARAMS = 'F20'
+GO_HOME = 'G28'
+
+# Pin commands (see pin_ops)
+PIN_WRITE = 'F41'
+PIN_READ = 'F42'
+PIN_IO = 'F43'
+PIN_WRITE2 = 'F44'
+
+# Command templates
+MOVE_TEMPLATE = 'G00 X%s Y%s Z%s A%s B%s C%s'
+JOG_TEMPLATE = 'J00 X%s Y%s Z%s A%s B%s C%s'
+STRAIGHT_MOVE_TEMPLATE = 'G01 X%s Y%s Z%s'
+SET_HOME_TEMPLATE = 'F84 X%d Y%d Z%d'
+SERVO_TEMPLATE = 'F61 P%s V%s'
+WATER_TEMPLATES = {1: 'F01 T%s', 2: 'F02 N%s'}
+I2C_SET_TEMPLATE = 'F51 E%s P%s V%s'
+I2C_READ_TEMPLATE = 'F52 E%s P%s'
+PIN_WRITE_TEMPLATE = 'F41 P%s V%s M%d'
+PIN_READ_TEMPLATE = 'F42 P%s M%d'
+PIN_IO_TEMPLATE = 'F43 P%s M%d'
+PIN_WRITE2_TEMPLATE = 'F44 P%s V%s W%s T%s M%d'
+PARAM_READ_TEMPLATE = 'F21 P%s'
+PARAM_WRITE_TEMPLATE = 'F22 P%s V%s'
+PARAM_UPDATE_TEMPLATE = 'F23 P%s V%s'
+STATUS_READ_TEMPLATE = 'F31 P%s'
+STATUS_WRITE_TEMPLATE = 'F32 P%s V%s'
+
+# Pins a servo can be attached to on the Farmduino
+SERVO_PINS = (4, 5, 6, 11)
+# Watering modes: timed pulses (ms) or volume pulses (flow meter)
+WATER_MODES = (1, 2)
+# Fixed ranges of the Farmduino (inclusive)
+PIN_RANGE = (0, 69)         # Pins of the ATmega2560
+DIGITAL_RANGE = (0, 1)
+ANALOG_RANGE = (0, 255)     # PWM duty cycle
+IO_MODES = (0, 1, 2)        # Input, output, input with pull-up
+SERVO_RANGE = (0, 180)      # Degrees
+PARAM_RANGE = (0, 255)      # Parameter ids
+VALUE_RANGE = (-2 ** 31, 2 ** 31 - 1)  # The parameters are stored as 32 bit integers
+
+
+class FCodeError(ValueError):
+    '''
+    Raised for a command that cannot be encoded (e.g. an invalid servo pin)
+    '''
+    def __init__(self, message: str, index: int = None):
+        '''
+        Args:
+            message {str}: what is wrong with the command
+            index {int}: the position of the command in the batch, for the batch encoders
+        '''
+        super().__init__(message)
+        self.index = index
+
+
+class Limits:
+    '''
+    Axis limits the moves are checked against:
+        - the maximum speed (steps/s, firmware parameters 71-73) the speeds are clamped
+          to, as the firmware does,
+        - the travel (mm, the amount of steps of the axis over its steps per mm,
+          parameters 141-143 and 55-57), checked on the coordinate's magnitude as
+          the axis may be inverted,
+        - the work envelope of the active map (x in [0, x_len], y in [0, y_len],
+          z in [-z_len, 0], see MapBounds).
+    A limit is only checked once known: its parameters observed, the axis calibrated
+    or the map lengths set.
+    '''
+    __slots__ = ('values_', 'envelope_', 'max_speed_', 'travel_', 'bounds_')
+
+    def __init__(self, params: dict = None, envelope: tuple = None):
+        '''
+        Args:
+            params {dict}: the known parameter values (id -> value), e.g. a loaded configuration
+            envelope {tuple}: the (x_len, y_len, z_len) of the active map
+        '''
+        self.values_ = {}
+        self.envelope_ = (0.0, 0.0, 0.0)
+        # Unknown limits are infinite, so the checks stay single comparisons
+        self.max_speed_ = (math.inf, math.inf, math.inf)
+        self.travel_ = (math.inf, math.inf, math.inf)
+        self.bounds_ = ((-math.inf, math.inf), (-math.inf, math.inf), (-math.inf, math.inf))
+        for param, value in (params or {}).items():
+            self.observe(int(param), value)
+        if envelope is not None:
+            self.set_envelope(*envelope)
+
+    @property
+    def known(self) -> bool:
+        '''
+        True if the moves are checked against a travel or an envelope
+        '''
+        return any(math.isfinite(low) or math.isfinite(high) for low, high in self.bounds_)
+
+    def observe(self, param: int, value: float):
+        '''
+        Records the value of a parameter (e.g. from /report/param), updating the limits it sets
+
+        Args:
+            param {int}: the parameter id
+            value {float}: its value
+        '''
+        if param not in MAX_SPEED and param not in STEP_PER_MM and param not in AXIS_NR_STEPS:
+            return
+        self.values_[param] = value
+        max_speed, travel = [], []
+        for axis in range(3):
+            speed = self.values_.get(MAX_SPEED[axis], 0)
+            max_speed.append(float(speed) if speed > 0 else math.inf)
+            steps, steps_per_mm = self.values_.get(AXIS_NR_STEPS[axis], 0), self.values_.get(STEP_PER_MM[axis], 0)
+            travel.append(steps / steps_per_mm if steps > 0 and steps_per_mm > 0 else math.inf)
+        self.max_speed_, self.travel_ = tuple(max_speed), tuple(travel)
+        self.update_bounds()
+
+    def set_envelope(self, x_len: float, y_len: float, z_len: float):
+        '''
+        Sets the work envelope from the lengths of the active map (0 for an unknown length)
+        '''
+        self.envelope_ = (x_len, y_len, z_len)
+        self.update_bounds()
+
+    def update_bounds(self):
+        bounds = []
+        for axis in range(3):
+            low, high = -self.travel_[axis], self.travel_[axis]
+            length = self.envelope_[axis]
+            if length > 0:
+                # X and Y go from 0 to their length, Z goes down from 0
+                low, high = (max(low, -length), min(high, 0.0)) if axis == 2 else (max(low, 0.0), min(high, length))
+            bounds.append((low, high))
+        self.bounds_ = tuple(bounds)
+
+    def check_move(self, x: float, y: float, z: float, a: float, b: float, c: float, relative: bool = False) -> tuple:
+        '''
+        Raises an FCodeError if a move goes beyond the bounds of the axis or has a negative
+        speed. A speed of 0 is the maximum speed of the axis
+
+        Returns:
+            The (a, b, c) speeds clamped to the maximum speeds of the axis
+        '''
+        if a < 0 or b < 0 or c < 0:
+            axis = 0 if a < 0 else (1 if b < 0 else 2)
+            raise FCodeError(f'Negative {"XYZ"[axis]} speed {(a, b, c)[axis]}!')
+        max_x, max_y, max_z = self.max_speed_
+        speeds = (a if a <= max_x else max_x, b if b <= max_y else max_y, c if c <= max_z else max_z)
+        if relative:
+            return speeds
+        (low_x, high_x), (low_y, high_y), (low_z, high_z) = self.bounds_
+        if not (low_x <= x <= high_x and low_y <= y <= high_y and low_z <= z <= high_z):
+            axis = 0 if not low_x <= x <= high_x else (1 if not low_y <= y <= high_y else 2)
+            low, high = self.bounds_[axis]
+            raise FCodeError(f'{"XYZ"[axis]}{(x, y, z)[axis]} is out of the reach of the axis ({low:.1f} to {high:.1f}mm)!')
+        return speeds
+
+    def clamp(self, x: float, y: float, z: float) -> tuple:
+        '''
+        Returns the closest coordinates within the bounds of the axis
+        '''
+        return tuple(min(max(coord, low), high) for coord, (low, high) in zip((x, y, z), self.bounds_))
+
+
+# Default limits: the fixed ranges only
+NO_LIMITS = Limits()
+
+
+def check_range(name: str, value: float, bounds: tuple):
+    if not bounds[0] <= value <= bounds[1]:
+        raise FCodeError(f'{name} {value} is out of range ({bounds[0]}-{bounds[1]})!')
+
+
+def move(x: float, y: float, z: float, a: float = 0.0, b: float = 0.0, c: float = 0.0,
+         straight: bool = False, relative: bool = False, limits: Limits = NO_LIMITS) -> str:
+    '''
+    Encodes a move of the gantry
+
+    Args:
+        x, y, z {float}: the target coordinates (increments if relative)
+        a, b, c {float}: the travel speed of each axis, clamped to its maximum (not used by straight moves)
+        straight {bool}: straight line move (G01, constant feed rate) instead of G00
+        relative {bool}: relative move (J00), resolved into a G00 by the UART controller
+        limits {Limits}: the limits the move is checked against
+    '''
+    a, b, c = limits.check_move(x, y, z, a, b, c, relative)
+    if straight:
+        return STRAIGHT_MOVE_TEMPLATE % (x, y, z)
+    return (JOG_TEMPLATE if relative else MOVE_TEMPLATE) % (x, y, z, a, b, c)
+
+
+def moves(waypoints, speeds: tuple = (0.0, 0.0, 0.0), straight: bool = False, relative: bool = False,
+          limits: Limits = NO_LIMITS) -> list:
+    '''
+    Encodes a path in one call. The whole path is checked before any line is returned
+
+    Args:
+        waypoints {iterable}: the (x, y, z) targets, or (x, y, z, a, b, c) to give every move its speeds
+        speeds {tuple}: the (a, b, c) speeds of the waypoints without their own
+        straight, relative {bool}: see move
+        limits {Limits}: the limits the moves are checked against
+
+    Raises:
+        FCodeError naming the first invalid waypoint
+    '''
+    template = STRAIGHT_MOVE_TEMPLATE if straight else (JOG_TEMPLATE if relative else MOVE_TEMPLATE)
+    check = limits.check_move
+    lines = []
+    for index, waypoint in enumerate(waypoints):
+        values = tuple(waypoint) if len(waypoint) == 6 else tuple(waypoint) + tuple(speeds)
+        try:
+            clamped = check(*values, relative)
+        except (FCodeError, TypeError) as e:
+            raise FCodeError(f'Waypoint {index}: {e}', index) from None
+        lines.append(template % (values[:3] if straight else values[:3] + clamped))
+    return lines
+
+
+def home(go_home: bool = False, current_pos_home: bool = False, calib: bool = False,
+         x: bool = False, y: bool = False, z: bool = False) -> str:
+    '''
+    Encodes a homing or calibration command (see HomeCommand)
+
+    Args:
+        go_home {bool}: go to the home position of every axis (G28)
+        current_pos_home {bool}: set the current position as home for the selected axis (F84)
+        calib {bool}: calibrate the selected axis instead of finding its home
+        x, y, z {bool}: the selected axis (one axis to find home or calibrate)
+    '''
+    if go_home:
+        return GO_HOME
+    if current_pos_home:
+        return SET_HOME_TEMPLATE % (bool(x), bool(y), bool(z))
+    if z:
+        return 'F16' if calib else 'F13'
+    if y:
+        return 'F15' if calib else 'F12'
+    if x:
+        return 'F14' if calib else 'F11'
+    raise FCodeError('No axis selected for homing/calibration!')
+
+
+def servo(pin: int, angle: float) -> str:
+    '''
+    Encodes a servo move. Servos can only be attached on pins 4, 5, 6 and 11
+    '''
+    if pin not in SERVO_PINS:
+        raise FCodeError(f'{pin} is not within the valid servo pins{SERVO_PINS}!')
+    check_range('Servo angle', angle, SERVO_RANGE)
+    return SERVO_TEMPLATE % (pin, angle)
+
+
+def water(mode: int, amount: int) -> str:
+    '''
+    Encodes a watering command
+
+    Args:
+        mode {int}: 1 for timed pulses (ms), 2 for volume pulses (flow meter)
+        amount {int}: the time or the pulse count
+    '''
+    if mode not in WATER_MODES:
+        raise FCodeError('Wrong watering command type! It should be 1 (timed pulses msec) or 2 (volume pulses)!')
+    if amount <= 0:
+        raise FCodeError('The time constraint/volume constraint was not set!')
+    return WATER_TEMPLATES[mode] % amount
+
+
+def i2c_set(element: int, pin: int, value: int) -> str:
+    return I2C_SET_TEMPLATE % (element, pin, value)
+
+
+def i2c_read(element: int, pin: int) -> str:
+    return I2C_READ_TEMPLATE % (element, pin)
+
+
+def pin_write(pin: int, value: int, pin_mode: bool) -> str:
+    '''
+    Encodes a pin write (pin_mode: 0 for digital, 1 for analog)
+    '''
+    check_range('Pin', pin, PIN_RANGE)
+    check_range('Pin value', value, ANALOG_RANGE if pin_mode else DIGITAL_RANGE)
+    return PIN_WRITE_TEMPLATE % (pin, value, pin_mode)
+
+
+def pin_write2(pin: int, value: int, value2: int, delay: int, pin_mode: bool) -> str:
+    '''
+    Encodes a pin write followed by a second value after a delay (ms)
+    '''
+    check_range('Pin', pin, PIN_RANGE)
+    bounds = ANALOG_RANGE if pin_mode else DIGITAL_RANGE
+    check_range('Pin value', value, bounds)
+    check_range('Pin value', value2, bounds)
+    if delay < 0:
+        raise FCodeError(f'Negative pin write delay {delay}!')
+    return PIN_WRITE2_TEMPLATE % (pin, value, value2, delay, pin_mode)
+
+
+def pin_read(pin: int, pin_mode: bool) -> str:
+    check_range('Pin', pin, PIN_RANGE)
+    return PIN_READ_TEMPLATE % (pin, pin_mode)
+
+
+def pin_io(pin: int, io_mode: int) -> str:
+    '''
+    Encodes a pin IO mode setting (io_mode: 0 for input, 1 for output, 2 for input with pull-up)
+    '''
+    check_range('Pin', pin, PIN_RANGE)
+    if io_mode not in IO_MODES:
+        raise FCodeError(f'Wrong pin IO mode {io_mode}! It should be 0 (input), 1 (output) or 2 (input pull-up)')
+    return PIN_IO_TEMPLATE % (pin, io_mode)
+
+
+# Pin operation encoders, by command
+PIN_ENCODERS = {
+    PIN_WRITE: pin_write,
+    PIN_READ: pin_read,
+    PIN_IO: pin_io,
+    PIN_WRITE2: pin_write2,
+}
+
+
+def pin_ops(ops) -> list:
+    '''
+    Encodes several pin operations in one call. Every operation is checked before
+    any line is returned
+
+    Args:
+        ops {iterable}: (command, *args) tuples, e.g. (PIN_WRITE, 9, 1, 0) or (PIN_READ, 63, 0),
+                        with the arguments of pin_write, pin_read, pin_io or pin_write2
+
+    Raises:
+        FCodeError naming the first invalid operation
+    '''
+    lines = []
+    for index, op in enumerate(ops):
+        encoder = PIN_ENCODERS.get(op[0])
+        try:
+            if encoder is None:
+                raise FCodeError(f'{op[0]} is not a pin command!')
+            lines.append(encoder(*op[1:]))
+        except (FCodeError, TypeError) as e:
+            raise FCodeError(f'Pin operation {index}: {e}', index) from None
+    return lines
+
+
+def param_read(param: int) -> str:
+    check_range('Parameter', param, PARAM_RANGE)
+    return PARAM_READ_TEMPLATE % param
+
+
+def param_write(param: int, value: int) -> str:
+    check_range('Parameter', param, PARAM_RANGE)
+    check_range('Parameter value', value, VALUE_RANGE)
+    return PARAM_WRITE_TEMPLATE % (param, value)
+
+
+def param_update(param: int, value: int) -> str:
+    check_range('Parameter', param, PARAM_RANGE)
+    check_range('Parameter value', value, VALUE_RANGE)
+    return PARAM_UPDATE_TEMPLATE % (param, value)
+
+
+def status_read(param: int) -> str:
+    return STATUS_READ_TEMPLATE % param
+
+
+def status_write(param: int, value: int) -> str:
+    return STATUS_WRITE_TEMPLATE % (param, value)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+# ROS2 Imports
+import argparse
+import sys
+import time
+import timeit
+import rclpy
+from rclpy.executors import SingleThreadedExecutor
+from rclpy.node import Node
+from rclpy.utilities import remove_ros_args
+from std_msgs.msg import String
+from farmbot_interfaces.msg import GantryCommand
+
+from farmbot_command_handler import fcode
+from farmbot_command_handler.motor_cmd_handler import MotorCmdHandler
+from farmbot_command_handler.uart_transmitter import UARTTransmitter
+
+# Every node of the benchmark runs in its own namespace, so the commands never reach
+# a UART controller that runs on the same ROS domain
+NAMESPACE = '/fcode_benchmark'
+
+# Budgets (mean per encoded line) of the hot encoding path, with a large margin for
+# a loaded Raspberry Pi 4. A regression (e.g. a lookup or a check added per value)
+# shows as a multiple of these figures. Kept out of the test suite, as wall-clock
+# budgets are not reliable on shared runners
+MOVE_BUDGET = 20e-6
+BATCH_BUDGET = 20e-6
+PIN_BUDGET = 10e-6
+BUDGET_COUNT = 20000
+
+
+class FCodeBenchmark(Node):
+    '''
+    Measures the per step overhead of the two ways a controller sends a move to the
+    UART controller: the typed GantryCommand through the MotorCmdHandler node (two
+    topic hops) and the in-process encoder (fcode) published straight to /uart_transmit.
+
+    Every step is sent once the previous one was received on /uart_transmit, so the
+    figures are latencies and not throughput.
+    '''
+    def __init__(self):
+        super().__init__('fcode_benchmark')
+
+        self.gantry_cmd_ = GantryCommand()
+        self.gantry_mvm_pub_ = self.create_publisher(GantryCommand, 'move_gantry', 10)
+        self.uart_ = UARTTransmitter(self)
+        self.uart_rx_sub_ = self.create_subscription(String, 'uart_transmit', self.received, 200)
+
+        self.received_ = None
+
+    def received(self, msg: String):
+        self.received_ = msg.data
+
+    def send_typed(self, x: float, y: float, z: float):
+        self.gantry_cmd_.x, self.gantry_cmd_.y, self.gantry_cmd_.z = x, y, z
+        self.gantry_cmd_.a, self.gantry_cmd_.b, self.gantry_cmd_.c = 400.0, 400.0, 400.0
+        self.gantry_mvm_pub_.publish(self.gantry_cmd_)
+
+    def send_direct(self, x: float, y: float, z: float):
+        self.uart_.send(fcode.move(x, y, z, 400.0, 400.0, 400.0))
+
+
+def percentiles(samples: list) -> str:
+    '''
+    Returns the mean, p50 and p99 of the samples (s) in microseconds
+    '''
+    samples = sorted(samples)
+    if not samples:
+        return 'n=0'
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return (f'n={len(samples)} mean={sum(samples) / len(samples) * 1e6:.1f}us '
+            f'p50={p(0.5):.1f}us p99={p(0.99):.1f}us')
+
+
+def run_path(executor, bench: FCodeBenchmark, send, count: int, timeout: float) -> list:
+    '''
+    Sends count moves one after the other and returns the send to receive latencies
+    '''
+    latencies = []
+    for i in range(count):
+        expected = fcode.move(float(i), 0.0, 0.0, 400.0, 400.0, 400.0)
+        bench.received_ = None
+        started = time.perf_counter()
+        send(float(i), 0.0, 0.0)
+        while bench.received_ != expected:
+            executor.spin_once(timeout_sec = timeout)
+            if time.perf_counter() - started > timeout:
+                bench.get_logger().error(f'Step {i} not received after {timeout}s')
+                return latencies
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def encode_only(count: int) -> tuple:
+    '''
+    Returns the CPU time of encoding a move with the typed message and with the encoder
+    '''
+    msg = GantryCommand()
+    typed = []
+    for i in range(count):
+        started = time.perf_counter()
+        msg.mode, msg.relative = False, False
+        msg.x, msg.y, msg.z = float(i), 0.0, 0.0
+        msg.a, msg.b, msg.c = 400.0, 400.0, 400.0
+        fcode.move(msg.x, msg.y, msg.z, msg.a, msg.b, msg.c, straight = msg.mode, relative = msg.relative)
+        typed.append(time.perf_counter() - started)
+    direct = []
+    for i in range(count):
+        started = time.perf_counter()
+        fcode.move(float(i), 0.0, 0.0, 400.0, 400.0, 400.0)
+        direct.append(time.perf_counter() - started)
+    return typed, direct
+
+
+def mean_time(statement, count: int = BUDGET_COUNT) -> float:
+    '''
+    Returns the mean time (s) of the statement, best of 3 runs to leave out the scheduler noise
+    '''
+    return min(timeit.repeat(statement, number=count, repeat=3)) / count
+
+
+def check_budgets() -> bool:
+    '''
+    Prints the mean encoding time per line of the hot encoding path against its budget
+
+    Returns:
+        True if every figure is within its budget
+    '''
+    limits = fcode.Limits({71: 400, 72: 400, 73: 400, 55: 5, 56: 5, 57: 25, 141: 15000, 142: 7500, 143: 12500})
+    waypoints = [(float(i), float(i % 100), -10.0) for i in range(1000)]
+    results = [
+        ('move', mean_time(lambda: fcode.move(1200.5, 300.0, -250.0, 400.0, 400.0, 400.0, limits=limits)),
+         MOVE_BUDGET),
+        ('moves', mean_time(lambda: fcode.moves(waypoints, (400.0, 400.0, 400.0)), count=BUDGET_COUNT // 1000) / 1000,
+         BATCH_BUDGET),
+        ('pin_write', mean_time(lambda: fcode.pin_write(9, 1, False)), PIN_BUDGET),
+    ]
+
+    within = True
+    for name, elapsed, budget in results:
+        over = elapsed >= budget
+        within &= not over
+        print(f'budget {name:<10}: {elapsed * 1e6:6.2f}us per line (budget {budget * 1e6:.0f}us){" OVER BUDGET" if over else ""}')
+    return within
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(description='Compares the per step overhead of the command handler path '
+                                                 'and of the direct F-Code path to /uart_transmit')
+    parser.add_argument('--count', type=int, default=1000, help='number of steps sent on each path')
+    parser.add_argument('--timeout', type=float, default=1.0, help='time (s) waited for a step before giving up')
+    parser.add_argument('--budgets-only', action='store_true',
+                        help='only check the encoding budgets, without starting any node (run it after touching fcode)')
+    options = parser.parse_args(remove_ros_args(args if args is not None else sys.argv)[1:])
+
+    # The exit status is non-zero if the encoder is over one of its budgets
+    if options.budgets_only:
+        return 0 if check_budgets() else 1
+
+    rclpy.init(args = (args if args is not None else sys.argv) + ['--ros-args', '-r', f'__ns:={NAMESPACE}'])
+
+    handler = MotorCmdHandler()
+    bench = FCodeBenchmark()
+    executor = SingleThreadedExecutor()
+    executor.add_node(handler)
+    executor.add_node(bench)
+
+    # Let the discovery settle before measuring
+    warm_up = time.monotonic() + 1.0
+    while time.monotonic() < warm_up:
+        executor.spin_once(timeout_sec = 0.05)
+
+    try:
+        typed = run_path(executor, bench, bench.send_typed, options.count, options.timeout)
+        direct = run_path(executor, bench, bench.send_direct, options.count, options.timeout)
+        typed_cpu, direct_cpu = encode_only(options.count)
+
+        print(f'handler path  : {percentiles(typed)}')
+        print(f'direct path   : {percentiles(direct)}')
+        print(f'encode (typed): {percentiles(typed_cpu)}')
+        print(f'encode (fcode): {percentiles(direct_cpu)}')
+        status = 0 if check_budgets() else 1
+    except KeyboardInterrupt:
+        status = 0
+
+    executor.shutdown()
+    handler.destroy_node()
+    bench.destroy_node()
+    rclpy.shutdown()
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
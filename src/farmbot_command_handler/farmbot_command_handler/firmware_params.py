@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+from farmbot_command_handler.command_window import command_code
+
+
+# Firmware defaults of the parameters used by the motion model
+# (same values as farmbot_controllers/config/firmwareDefault.yaml)
+DEFAULT_PARAMS = {
+    2: 0, 11: 120, 12: 120, 13: 120,
+    41: 300, 42: 300, 43: 300,
+    55: 5, 56: 5, 57: 25,
+    61: 50, 62: 50, 63: 50,
+    65: 50, 66: 50, 67: 50,
+    71: 400, 72: 400, 73: 400,
+    141: 0, 142: 0, 143: 0,
+}
+# Parameter indexes used by the motion model, per axis (X, Y, Z)
+ACC_DEC = (41, 42, 43)
+STEP_PER_MM = (55, 56, 57)
+MIN_SPEED = (61, 62, 63)
+HOME_SPEED = (65, 66, 67)
+MAX_SPEED = (71, 72, 73)
+AXIS_NR_STEPS = (141, 142, 143)
+# Axis length used for calibrations when the parameter table does not hold one (mm)
+DEFAULT_AXIS_LENGTH = (3000.0, 1500.0, 500.0)
+
+
+def command_args(line: str) -> dict:
+    '''
+    Returns the letter/number arguments of a command line
+    (e.g. {'X': 10.0, 'Y': 20.0, 'Z': 0.0} for 'G00 X10 Y20 Z0')
+    '''
+    args = {}
+    for token in line.split(' ')[1:]:
+        if len(token) < 2:
+            continue
+        try:
+            args[token[0]] = float(token[1:])
+        except ValueError:
+            continue
+    return args
+
+
+class ParamTracker:
+    '''
+    Mirror of the Farmduino parameter table, built from the serial traffic:
+    the parameter writes sent (F22) and the values reported (R21/R23).
+    The writes of the session are kept in order, so they can be applied again.
+    Move limits (fcode.Limits) can be kept up to date with the mirror.
+    '''
+    def __init__(self, defaults: dict = None, limits = None):
+        '''
+        Args:
+            defaults {dict}: the values assumed until a parameter is seen
+            limits {fcode.Limits}: the move limits fed with the parameter values, if any
+        '''
+        self.values_ = dict(DEFAULT_PARAMS if defaults is None else defaults)
+        self.writes_ = OrderedDict()
+        self.limits_ = limits
+        if limits is not None:
+            for param, value in self.values_.items():
+                limits.observe(param, value)
+
+    def get(self, param: int, default: float = 0) -> float:
+        return self.values_.get(param, default)
+
+    def observe_command(self, line: str):
+        '''
+        Records a parameter write (F22 P.. V..) sent to the Farmduino
+
+        Args:
+            line {str}: the command line
+        '''
+        if command_code(line) != 'F22':
+            return
+        args = command_args(line)
+        if 'P' in args and 'V' in args:
+            param, value = int(args['P']), int(args['V'])
+            self.values_[param] = value
+            if self.limits_ is not None:
+                self.limits_.observe(param, value)
+            # Keep the order of the last write of every parameter
+            self.writes_.pop(param, None)
+            self.writes_[param] = value
+
+    def observe_value(self, param: int, value: int):
+        '''
+        Records a parameter value reported by the Farmduino (R21/R23)
+        '''
+        self.values_[param] = value
+        if self.limits_ is not None:
+            self.limits_.observe(param, value)
+
+    def session_writes(self) -> list:
+        '''
+        Returns the parameter writes of the session as F22 command lines
+        '''
+        return [f'F22 P{param} V{value}' for param, value in self.writes_.items()]
+
+    def axis_speed(self, axis: int, speed_override: float = None, homing: bool = False) -> float:
+        '''
+        Returns the speed (mm/s) of an axis
+
+        Args:
+            axis {int}: 0 for X, 1 for Y and 2 for Z
+            speed_override {float}: optional speed limit in steps/s (A, B, C arguments)
+            homing {bool}: uses the homing speed instead of the maximum speed
+        '''
+        steps_per_mm = max(self.get(STEP_PER_MM[axis], 1), 1)
+        speed = self.get(HOME_SPEED[axis] if homing else MAX_SPEED[axis], 400)
+        if speed_override:
+            speed = min(speed, speed_override)
+        return max(speed, 1) / steps_per_mm
+
+    def axis_length(self, axis: int) -> float:
+        '''
+        Returns the length (mm) of an axis, from its amount of steps if calibrated
+        '''
+        steps = self.get(AXIS_NR_STEPS[axis], 0)
+        if steps:
+            return steps / max(self.get(STEP_PER_MM[axis], 1), 1)
+        return DEFAULT_AXIS_LENGTH[axis]
@@ -0,0 +1,80 @@
+from farmbot_command_handler import fcode
+from farmbot_command_handler.command_window import command_code
+from farmbot_command_handler.firmware_params import command_args
+
+
+# Absolute move (Farmduino F-Code) and relative move (pseudo-command of the UART
+# controller: the X/Y/Z increments are turned into a G00 when it is dispatched)
+MOVE_CMD = 'G00'
+JOG_CMD = 'J00'
+
+
+def move_line(code: str, target: tuple, speeds: dict) -> str:
+    '''
+    Formats a move command line (in the format of the MotorCmdHandler)
+
+    Args:
+        code {str}: MOVE_CMD or JOG_CMD
+        target {tuple}: the (x, y, z) target or increments
+        speeds {dict}: the A/B/C speed arguments (may be empty)
+    '''
+    line = f'{code} X{float(target[0])} Y{float(target[1])} Z{float(target[2])}'
+    for axis in 'ABC':
+        if axis in speeds:
+            line += f' {axis}{float(speeds[axis])}'
+    return line
+
+
+def speed_args(args: dict) -> dict:
+    return {axis: args[axis] for axis in 'ABC' if axis in args}
+
+
+def coalesce(previous: str, line: str) -> str:
+    '''
+    Merges a move with the move queued right before it, if that one was not
+    dispatched yet. The gantry then goes straight to the final target instead of
+    visiting every intermediate one:
+        - an absolute move (G00) replaces the previous move,
+        - a relative move (J00) is added to the previous one (its increments to
+          another J00, or to the target of a G00).
+    The speeds of the latest move are kept.
+
+    Args:
+        previous {str}: the queued command line
+        line {str}: the new command line
+
+    Returns:
+        the merged command line, or None if the commands cannot be merged
+    '''
+    previous_code, code = command_code(previous), command_code(line)
+    if previous_code not in (MOVE_CMD, JOG_CMD) or code not in (MOVE_CMD, JOG_CMD):
+        return None
+    if code == MOVE_CMD:
+        return line
+
+    args = command_args(line)
+    previous_args = command_args(previous)
+    if any(axis not in previous_args for axis in 'XYZ'):
+        return None
+    merged = tuple(previous_args[axis] + args.get(axis, 0.0) for axis in 'XYZ')
+    return move_line(previous_code, merged, speed_args(args))
+
+
+def resolve_jog(line: str, position: tuple, limits: fcode.Limits = fcode.NO_LIMITS) -> tuple:
+    '''
+    Turns a relative move (J00) into an absolute one (G00) from the current position.
+    The increments are not checked when the J00 is encoded, so the target is clamped
+    to the reach of the axis here
+
+    Args:
+        line {str}: the J00 command line
+        position {tuple}: the current (x, y, z) position
+        limits {fcode.Limits}: the limits the target is clamped to
+
+    Returns:
+        the G00 command line, and True if its target was clamped
+    '''
+    args = command_args(line)
+    target = tuple(position[i] + args.get(axis, 0.0) for i, axis in enumerate('XYZ'))
+    clamped = limits.clamp(*target)
+    return move_line(MOVE_CMD, clamped, speed_args(args)), clamped != target
@@ -1,31 +1,54 @@
 #!/usr/bin/env python3
 import rclpy
 from rclpy.node import Node
-from farmbot_interfaces.msg import GantryCommand, ServoCommand, HomeCommand
+from rclpy.qos import QoSProfile, DurabilityPolicy
+from farmbot_interfaces.msg import GantryCommand, ServoCommand, HomeCommand, ParamReport, MapBounds
 from std_msgs.msg import String
 
+from farmbot_command_handler import fcode
+
 class MotorCmdHandler(Node):
     '''
-    Node handling motor and actuator commands.
+    Node handling motor and actuator commands. The commands are encoded with the
+    shared F-Code encoder (fcode), which the controllers also use to send their
+    commands straight to the UART controller; this node is kept for the nodes
+    and tools that publish the typed commands.
     
     Input Topics:
         - /move_gantry -> for moving the gantry
         - /home_handler -> for homing or calibrating the axis for the farmbot
         - /move_servo -> for moving a servo attached to the farmbduino
+        - /report/param -> the parameter values setting the speed and travel limits of the moves
+        - /map_bounds -> the reach of the gantry from the active map
     Output Topics:
         - /uart_transmit -> Transmits the commands in F-Code (Farmduino's version of GCode)
+        - /uart_transmit_interactive -> Transmits the interactive (operator) gantry moves
+
+    Moves out of the reach of the gantry are rejected, or brought back within it
+    if the 'clamp_moves' parameter is set.
     '''
     # Node contructor
     def __init__(self):
         super().__init__('MotorCmdHandler')
 
+        self.declare_parameter('clamp_moves', False)
+        self.clamp_moves_ = self.get_parameter('clamp_moves').get_parameter_value().bool_value
+
         self.uart_cmd_ = String()
+        # Speed and travel limits of the moves, from the reported firmware parameters and the active map
+        self.limits_ = fcode.Limits()
 
         # Node subscripters and publishers
         self.gantry_sub_ = self.create_subscription(GantryCommand, 'move_gantry', self.gantry_cmd_callback, 10)
         self.home_sub_ = self.create_subscription(HomeCommand, 'home_handler', self.home_cmd_callback, 10)
         self.servo_sub_ = self.create_subscription(ServoCommand, 'move_servo', self.servo_cmd_callback, 10)
         self.uart_tx_pub_ = self.create_publisher(String, 'uart_transmit', 10)
+        self.uart_tx_interactive_pub_ = self.create_publisher(String, 'uart_transmit_interactive', 10)
+        self.param_report_sub_ = self.create_subscription(ParamReport, 'report/param',
+                                                          lambda msg: self.limits_.observe(msg.param, msg.value), 200)
+        self.map_bounds_sub_ = self.create_subscription(MapBounds, 'map_bounds',
+                                                        lambda msg: self.limits_.set_envelope(msg.x_len, msg.y_len, msg.z_len),
+                                                        QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL))
         
         # Log the initialization
         self.get_logger().info('Motor Command Handler Initialized..')
@@ -33,19 +56,26 @@ class MotorCmdHandler(Node):
     def gantry_cmd_callback(self, cmd: GantryCommand):
         '''
         Handling gantry commands. Note that homing and calibration must be done through the
-        home_handler topic
+        home_handler topic. Interactive moves are sent through the interactive UART class
         '''
-        # Getting the movement mode
-        mode = cmd.mode
-        # Getting the target location and the speed
+        # Form the GCode command for the "move at location" action. Relative moves use the J00
+        # pseudo-command, turned into a G00 by the UART controller when it is dispatched
         x, y, z = cmd.x, cmd.y, cmd.z
-        max_x, max_y, max_z = cmd.a, cmd.b, cmd.c
-
-        # Form the GCode command for the "move at location" action
-        self.uart_cmd_.data = ('G01 ' if mode else 'G00 ') + 'X' + str(x) + ' Y' + str(y) + ' Z' + str(z) \
-                            + ('' if mode else (' A' + str(max_x) + ' B' + str(max_y) + ' C' + str(max_z)))
-
-        self.uart_tx_pub_.publish(self.uart_cmd_)
+        if self.clamp_moves_ and not cmd.relative:
+            x, y, z = self.limits_.clamp(x, y, z)
+            if (x, y, z) != (cmd.x, cmd.y, cmd.z):
+                self.get_logger().warning(f'Move to ({cmd.x}, {cmd.y}, {cmd.z}) clamped to ({x}, {y}, {z})')
+        try:
+            self.uart_cmd_.data = fcode.move(x, y, z, cmd.a, cmd.b, cmd.c,
+                                             straight = cmd.mode, relative = cmd.relative, limits = self.limits_)
+        except fcode.FCodeError as e:
+            self.get_logger().error(str(e))
+            return
+
+        if cmd.interactive:
+            self.uart_tx_interactive_pub_.publish(self.uart_cmd_)
+        else:
+            self.uart_tx_pub_.publish(self.uart_cmd_)
 
         self.get_logger().info(self.uart_cmd_.data)
 
@@ -53,24 +83,13 @@ class MotorCmdHandler(Node):
         '''
         Handling homing and calibration commands
         '''
-        if cmd.go_home:            # Home all axis
-            self.uart_cmd_.data = 'G28'
-        elif cmd.current_pos_home: # Set the current position as home
-            self.uart_cmd_.data = 'F84 ' + 'X' + ("1 " if cmd.x else '0 ')\
-                                         + 'Y' + ("1 " if cmd.y else '0 ')\
-                                         + 'Z' + ("1" if cmd.z else '0')
-        else:
-            if not cmd.x and not cmd.y and not cmd.z:
-                self.get_logger().error('No axis selected for homing/calibration!')
-            else:
-                if cmd.x:              # Find home or calibrate x axis
-                    self.uart_cmd_.data = 'F11' if not cmd.calib else 'F14'
-                if cmd.y:            # Find home or calibrate y axis
-                    self.uart_cmd_.data = 'F12' if not cmd.calib else 'F15'
-                if cmd.z:            # Find home or calibrate z axis
-                    self.uart_cmd_.data = 'F13' if not cmd.calib else 'F16'
+        try:
+            self.uart_cmd_.data = fcode.home(go_home = cmd.go_home, current_pos_home = cmd.current_pos_home,
+                                             calib = cmd.calib, x = cmd.x, y = cmd.y, z = cmd.z)
+        except fcode.FCodeError as e:
+            self.get_logger().error(str(e))
+            return
 
-        
         self.uart_tx_pub_.publish(self.uart_cmd_)
         self.get_logger().info(self.uart_cmd_.data)
 
@@ -79,18 +98,15 @@ class MotorCmdHandler(Node):
         Handles servo command interpretation. Note that servos can be attached only on pins
         4, 5, 6 and 11 on the Farmduino
         '''
-        # The valid servo pins
-        valid_servo_pins = (4, 5, 6, 11)
-        
-        # If the servo pin is within the valid pins:
-        if (cmd.pin in valid_servo_pins):
+        try:
             # Request servo attached to PIN to be rotated to ANGLE
-            self.uart_cmd_.data = 'F61 P' + str(cmd.pin) + ' V' + str(cmd.ang)
+            self.uart_cmd_.data = fcode.servo(cmd.pin, cmd.ang)
+        except fcode.FCodeError as e:
+            self.get_logger().error(str(e))
+            return
 
-            self.uart_tx_pub_.publish(self.uart_cmd_)
-            self.get_logger().info(self.uart_cmd_.data)
-        else:
-            self.get_logger().error(str(cmd.pin) + ' is not within the valid servo pins(4, 5, 6, 11)!')
+        self.uart_tx_pub_.publish(self.uart_cmd_)
+        self.get_logger().info(self.uart_cmd_.data)
 
 # Main Function called on the initialization of the ROS2 Node
 def main(args = None):
@@ -0,0 +1,17 @@
+from rclpy.node import Node
+
+
+def parameter(node: Node, name: str, default):
+    '''
+    Declares a node parameter if it was not declared yet (the modules of the
+    UART controller can be instantiated once per Farmduino channel and share
+    the node parameters) and returns its value
+
+    Args:
+        node {Node}: the node owning the parameter
+        name {str}: the parameter name
+        default: the default value, which also sets the parameter type
+    '''
+    if not node.has_parameter(name):
+        node.declare_parameter(name, default)
+    return node.get_parameter(name).value
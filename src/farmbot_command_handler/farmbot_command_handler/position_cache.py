@@ -0,0 +1,127 @@
+import math
+import time
+from rclpy.node import Node
+from rclpy.qos import QoSProfile, HistoryPolicy, DurabilityPolicy
+from farmbot_interfaces.msg import PositionReport
+from farmbot_interfaces.srv import GetPosition
+
+from farmbot_command_handler.node_params import parameter
+
+
+# Keep only the latest position, and hand it to late joiners (e.g. an rqt plugin opened mid-move)
+POSITION_QOS = QoSProfile(depth=1, history=HistoryPolicy.KEEP_LAST, durability=DurabilityPolicy.TRANSIENT_LOCAL)
+
+
+class PositionCache:
+    '''
+    Keeps the latest position reported by the Farmduino and republishes it decimated.
+
+    During a move the Farmduino streams position reports (R82). Instead of every
+    consumer handling every report, the position is published on a keep-last-1
+    topic at most 'position_max_rate' times per second and only if it moved by
+    at least 'position_min_change' mm. A report held back by the rate limit is
+    published once the rate allows it, and a smaller change once the reports stop
+    (i.e. at the end of the move), so the final position of a move is never lost.
+    The latest position is also served by the get_position service straight from
+    the cache, without an F82 round trip to the Farmduino.
+
+    Output Topics:
+        - /position {PositionReport} -> the decimated position (keep last 1, transient local).
+    Services:
+        - /get_position {GetPosition} -> the latest position and the time it was received at.
+    '''
+    def __init__(self, node: Node, namespace: str = ''):
+        '''
+        Creates the publisher, the service and the parameters of the cache on the node
+
+        Args:
+            node {Node}: the node handling the position reports
+            namespace {str}: the namespace of the topic and the service (empty for none)
+        '''
+        self.node_ = node
+        max_rate = parameter(node, 'position_max_rate', 5.0)
+        self.min_period_ = 1.0 / max_rate if max_rate > 0.0 else 0.0
+        self.min_change_ = parameter(node, 'position_min_change', 1.0)
+        prefix = f'{namespace}/' if namespace else ''
+
+        self.latest_ = None
+        self.published_ = None
+        self.published_at_ = 0.0
+        self.received_at_ = 0.0
+        self.received_ = 0
+        self.sent_ = 0
+
+        self.position_pub_ = node.create_publisher(PositionReport, f'{prefix}position', POSITION_QOS)
+        self.position_server_ = node.create_service(GetPosition, f'{prefix}get_position', self.get_position_server)
+        # Publishes the report held back by the rate limit (only runs while one is pending)
+        self.trailing_timer_ = node.create_timer(max(self.min_period_, 0.01), self.publish_trailing)
+        self.trailing_timer_.cancel()
+
+    def update(self, position: PositionReport):
+        '''
+        Records a position report and publishes it if the rate limit and the
+        change threshold allow it
+
+        Args:
+            position {PositionReport}: the reported position
+        '''
+        self.latest_ = position
+        self.received_at_ = time.monotonic()
+        self.received_ += 1
+
+        if (self.published_ is None or self.distance(position, self.published_) >= self.min_change_) and \
+                self.received_at_ - self.published_at_ >= self.min_period_:
+            self.publish(position)
+        elif self.trailing_timer_.is_canceled():
+            self.trailing_timer_.reset()
+
+    def publish_trailing(self):
+        '''
+        Timer callback publishing the latest position if it was held back
+        '''
+        now = time.monotonic()
+        if now - self.published_at_ < self.min_period_:
+            return
+        moved = self.distance(self.latest_, self.published_) if self.published_ is not None else math.inf
+        if moved == 0.0:
+            self.trailing_timer_.cancel()
+        elif moved >= self.min_change_ or now - self.received_at_ >= self.min_period_:
+            self.trailing_timer_.cancel()
+            self.publish(self.latest_)
+
+    def flush(self):
+        '''
+        Publishes the held back position right away (e.g. when the Farmduino becomes
+        idle, so the nodes stepping on the busy state see the final position)
+        '''
+        if self.latest_ is not None and (self.published_ is None or self.distance(self.latest_, self.published_) > 0.0):
+            self.publish(self.latest_)
+        self.trailing_timer_.cancel()
+
+    def publish(self, position: PositionReport):
+        self.position_pub_.publish(position)
+        self.published_ = position
+        self.published_at_ = time.monotonic()
+        self.sent_ += 1
+
+    @staticmethod
+    def distance(a: PositionReport, b: PositionReport) -> float:
+        return math.sqrt((a.x - b.x) ** 2 + (a.y - b.y) ** 2 + (a.z - b.z) ** 2)
+
+    def get_position_server(self, request, response):
+        '''
+        Service Server answering with the latest position from the cache
+        '''
+        response.valid = self.latest_ is not None
+        if response.valid:
+            response.x = self.latest_.x
+            response.y = self.latest_.y
+            response.z = self.latest_.z
+            response.stamp = self.latest_.stamp
+        return response
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the decimation
+        '''
+        return f'position[in={self.received_} out={self.sent_}]'
@@ -0,0 +1,83 @@
+from farmbot_command_handler.command_window import queue_number, ECHO_RESPONSE
+
+
+# Report codes decoded into typed messages by the UART controller
+POSITION_REPORT = 'R82'
+PIN_REPORT = 'R41'
+PARAM_REPORTS = ('R21', 'R23')
+STATE_REPORTS = ('R00', 'R01', 'R02', 'R03', 'R04', 'R05', 'R06', 'R07', 'R08', 'R09')
+DEBUG_REPORT = 'R99'
+STARTUP_MESSAGE = 'ARDUINO STARTUP COMPLETE'
+# Reports made of letter/number pairs (e.g. 'R82 X10.00 Y20.00 Z0.00 Q0').
+# The echo (R08) repeats the command line as free text
+VALUE_REPORTS = (frozenset((POSITION_REPORT, PIN_REPORT) + PARAM_REPORTS + STATE_REPORTS)
+                 - {ECHO_RESPONSE})
+
+
+class Report:
+    '''
+    Farmduino report decoded from a serial line
+    '''
+    __slots__ = ('line', 'code', 'queue', 'values')
+
+    def __init__(self, line: str, code: str, queue: int, values: dict):
+        self.line = line
+        self.code = code
+        self.queue = queue
+        self.values = values
+
+    def value(self, key: str, default: float = None) -> float:
+        '''
+        Returns the value of a report argument (e.g. 'X' for 'R82 X10.00 ...')
+
+        Args:
+            key {str}: the letter of the argument
+            default {float}: returned if the argument is missing
+        '''
+        return self.values.get(key, default)
+
+    def has(self, *keys) -> bool:
+        '''
+        Checks if the report carries all of the given arguments
+        '''
+        return all(key in self.values for key in keys)
+
+    @property
+    def text(self) -> str:
+        '''
+        The free text following the report code (e.g. of the R99 debug messages)
+        '''
+        return self.line[len(self.code) + 1:]
+
+
+def parse_report(line: str) -> Report:
+    '''
+    Decodes a report line from the Farmduino. The line is split only once and
+    the letter/number arguments of the known reports are converted to floats,
+    so the consumers never have to parse the raw line again.
+
+    Args:
+        line {str}: the report line without the endline character
+    Returns:
+        the decoded report
+    '''
+    tokens = line.split(' ')
+    code = tokens[0]
+    if code not in VALUE_REPORTS:
+        # Echoes and debug messages carry free text
+        return Report(line, code, queue_number(line), {})
+
+    queue = 0
+    values = {}
+    for token in tokens[1:]:
+        if len(token) < 2:
+            continue
+        try:
+            number = float(token[1:])
+        except ValueError:
+            continue
+        if token[0] == 'Q':
+            queue = int(number)
+        else:
+            values[token[0]] = number
+    return Report(line, code, queue, values)
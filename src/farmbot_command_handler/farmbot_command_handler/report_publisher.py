@@ -0,0 +1,78 @@
+from rclpy.node import Node
+from std_msgs.msg import Empty
+from farmbot_interfaces.msg import PositionReport, PinReport, ParamReport, CommandState
+
+from farmbot_command_handler.position_cache import PositionCache
+from farmbot_command_handler.report_parser import (Report, POSITION_REPORT, PIN_REPORT, PARAM_REPORTS,
+                                                   STATE_REPORTS, DEBUG_REPORT, STARTUP_MESSAGE)
+
+
+class ReportPublisher:
+    '''
+    Publishes the decoded Farmduino reports on a typed topic per report kind
+
+    Output Topics:
+        - /report/position {PositionReport} -> the position of the gantry (R82).
+        - /report/pin {PinReport} -> the value of a pin that was read (R41).
+        - /report/param {ParamReport} -> the value of a parameter that was read or written (R21/R23).
+        - /report/cmd_state {CommandState} -> the state of the executed commands (R00-R09).
+        - /report/startup {Empty} -> the Farmduino finished its startup (R99 ARDUINO STARTUP COMPLETE).
+        - /position {PositionReport} -> the decimated latest position (see PositionCache).
+    '''
+    def __init__(self, node: Node, namespace: str = ''):
+        '''
+        Creates the report publishers on the node
+
+        Args:
+            node {Node}: the node publishing the reports
+            namespace {str}: the namespace of the report topics (empty for none)
+        '''
+        self.node_ = node
+        prefix = f'{namespace}/' if namespace else ''
+        self.position_pub_ = node.create_publisher(PositionReport, f'{prefix}report/position', 10)
+        self.pin_pub_ = node.create_publisher(PinReport, f'{prefix}report/pin', 10)
+        self.param_pub_ = node.create_publisher(ParamReport, f'{prefix}report/param', 200)
+        self.cmd_state_pub_ = node.create_publisher(CommandState, f'{prefix}report/cmd_state', 50)
+        self.startup_pub_ = node.create_publisher(Empty, f'{prefix}report/startup', 10)
+        # Latest position, decimated and served without a round trip to the Farmduino
+        self.position_ = PositionCache(node, namespace)
+
+    def publish(self, report: Report, command: str = ''):
+        '''
+        Publishes a decoded report on the topic of its kind
+
+        Args:
+            report {Report}: the decoded report
+            command {str}: the code of the command the report belongs to (if known)
+        '''
+        code = report.code
+        if code == POSITION_REPORT:
+            if report.has('X', 'Y', 'Z'):
+                position = PositionReport()
+                position.x = report.value('X')
+                position.y = report.value('Y')
+                position.z = report.value('Z')
+                position.stamp = self.node_.get_clock().now().to_msg()
+                self.position_pub_.publish(position)
+                self.position_.update(position)
+        elif code == PIN_REPORT:
+            if report.has('P', 'V'):
+                pin = PinReport()
+                pin.pin = int(report.value('P'))
+                pin.value = int(report.value('V'))
+                self.pin_pub_.publish(pin)
+        elif code in PARAM_REPORTS:
+            if report.has('P', 'V'):
+                param = ParamReport()
+                param.param = int(report.value('P'))
+                param.value = int(report.value('V'))
+                param.updated = code == 'R23'
+                self.param_pub_.publish(param)
+        elif code in STATE_REPORTS:
+            state = CommandState()
+            state.code = code
+            state.command = command
+            state.queue = report.queue
+            self.cmd_state_pub_.publish(state)
+        elif code == DEBUG_REPORT and report.text == STARTUP_MESSAGE:
+            self.startup_pub_.publish(Empty())
@@ -0,0 +1,121 @@
+import threading
+import time
+
+
+class SerialLineReader:
+    '''
+    Background reader for the Farmduino serial port.
+
+    The reader runs on its own thread so that a quiet serial line never blocks
+    the ROS2 executor. Incoming bytes are accumulated in a reusable buffer and
+    framed into lines. Every complete line is handed to the owner through the
+    on_line callback together with the monotonic time it was received at.
+
+    If the port fails (e.g. the USB cable is unplugged), the thread stops and
+    the owner is told through the on_error callback. The reader can then be
+    started again on the reopened port, keeping its statistics.
+
+    NOTE: on_line and on_error are called from the reader thread. The owner is
+    responsible for moving them back onto the executor (e.g. with a guard condition).
+    '''
+    def __init__(self, ser, on_line, on_error=None, chunk_size: int = 256):
+        '''
+        Reader constructor
+
+        Args:
+            ser {serial.Serial}: the opened serial port (should have a read timeout set)
+            on_line {callable}: called as on_line(line: str, stamp: float) for each framed line
+            on_error {callable}: called as on_error(error: OSError) if reading the port fails
+            chunk_size {int}: the maximum amount of bytes requested in one read
+        '''
+        self.ser_ = ser
+        self.on_line_ = on_line
+        self.on_error_ = on_error
+        self.chunk_size_ = chunk_size
+
+        # Reusable receive buffer holding the bytes of the line(s) still being framed
+        self.buffer_ = bytearray()
+
+        # Statistics
+        self.rx_bytes_ = 0
+        self.rx_lines_ = 0
+
+        self.should_continue = True  # Flag to control the execution of the thread
+        self.reader_thread_ = threading.Thread(target=self.read_loop)
+        self.reader_thread_.daemon = True  # Ensures that the thread will close when the main program exits
+
+    def start(self, ser=None):
+        '''
+        Starts the reader thread
+
+        Args:
+            ser {serial.Serial}: a reopened serial port replacing the previous one (optional)
+        '''
+        if ser is not None:
+            self.ser_ = ser
+            # The partial line of the previous port will never be completed
+            self.buffer_.clear()
+        if self.reader_thread_.ident is not None:
+            # A thread can only be started once, the restarted reader gets a new one
+            self.reader_thread_ = threading.Thread(target=self.read_loop)
+            self.reader_thread_.daemon = True
+        self.should_continue = True
+        self.reader_thread_.start()
+
+    def stop(self, timeout: float = 2.0):
+        '''
+        Stops the reader thread and waits for it to finish the current read
+
+        Args:
+            timeout {float}: the maximum time (s) to wait for the thread to finish
+        '''
+        self.should_continue = False
+        if self.reader_thread_.is_alive() and self.reader_thread_ is not threading.current_thread():
+            self.reader_thread_.join(timeout)
+
+    def read_loop(self):
+        '''
+        Reads from the serial port until stopped. A read returns either the
+        bytes already waiting in the OS buffer or blocks for the serial
+        timeout waiting for at least one byte.
+        '''
+        while self.should_continue:
+            try:
+                chunk = self.ser_.read(min(max(self.ser_.in_waiting, 1), self.chunk_size_))
+            except OSError as e:
+                # serial.SerialException is an OSError (e.g. the device was disconnected)
+                self.should_continue = False
+                if self.on_error_ is not None:
+                    self.on_error_(e)
+                break
+            if not chunk:
+                continue
+
+            self.rx_bytes_ += len(chunk)
+            self.buffer_ += chunk
+            self.frame_lines(time.monotonic())
+
+    def frame_lines(self, stamp: float):
+        '''
+        Extracts the complete lines from the receive buffer and leaves any
+        partial line in it for the next read.
+
+        Args:
+            stamp {float}: monotonic time at which the bytes were received
+        '''
+        start = 0
+        while True:
+            end = self.buffer_.find(b'\n', start)
+            if end < 0:
+                break
+
+            line = self.buffer_[start:end].decode('utf-8', errors='replace').strip()
+            start = end + 1
+
+            if line:
+                self.rx_lines_ += 1
+                self.on_line_(line, stamp)
+
+        # Drop the consumed bytes, keeping the buffer allocation
+        if start:
+            del self.buffer_[:start]
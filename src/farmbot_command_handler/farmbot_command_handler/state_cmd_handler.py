@@ -4,6 +4,8 @@ from rclpy.node import Node
 from std_msgs.msg import String
 from farmbot_interfaces.msg import ParameterCommand, StateCommand, StatusCommand
 
+from farmbot_command_handler import fcode
+
 class StateCmdHandler(Node):
     '''
     Node handling commands for manipulating the farmbot's parameters, state and status
@@ -23,10 +25,11 @@ class StateCmdHandler(Node):
         self.uart_cmd_ = String()
 
         # Node subscripters and publishers
-        self.param_sub_ = self.create_subscription(ParameterCommand, 'parameter_command', self.param_cmd_callback, 10)
+        # Parameter uploads arrive as one burst, hence the deeper queues on the parameter path
+        self.param_sub_ = self.create_subscription(ParameterCommand, 'parameter_command', self.param_cmd_callback, 200)
         self.state_sub_ = self.create_subscription(StateCommand, 'state_command', self.state_cmd_callback, 10)
         self.status_sub_ = self.create_subscription(StatusCommand, 'status_command', self.status_cmd_callback, 10)
-        self.uart_tx_pub_ = self.create_publisher(String, 'uart_transmit', 10)
+        self.uart_tx_pub_ = self.create_publisher(String, 'uart_transmit', 200)
         
         # Log the initialization
         self.get_logger().info('State Command Handler Initialized..')
@@ -41,15 +44,19 @@ class StateCmdHandler(Node):
         Args:
             cmd{ParameterCommand}: Interface containing all the parameter commands
         '''
-        if cmd.list:        # List all parameters 
-            self.uart_cmd_.data = 'F20'
-        else:
-            if cmd.read:    # Read a parameter
-                self.uart_cmd_.data = 'F21 P' + str(cmd.param)
-            elif cmd.write: # Write to a parameter
-                self.uart_cmd_.data = 'F22 P' + str(cmd.param) + ' V' + str(cmd.value)
-            elif cmd.update:# Update a parameter (in the calibration state)
-                self.uart_cmd_.data = 'F23 P' + str(cmd.param) + ' V' + str(cmd.value)
+        try:
+            if cmd.list:        # List all parameters 
+                self.uart_cmd_.data = fcode.LIST_PARAMS
+            else:
+                if cmd.read:    # Read a parameter
+                    self.uart_cmd_.data = fcode.param_read(cmd.param)
+                elif cmd.write: # Write to a parameter
+                    self.uart_cmd_.data = fcode.param_write(cmd.param, cmd.value)
+                elif cmd.update:# Update a parameter (in the calibration state)
+                    self.uart_cmd_.data = fcode.param_update(cmd.param, cmd.value)
+        except fcode.FCodeError as e:
+            self.get_logger().error(str(e))
+            return
 
         self.uart_tx_pub_.publish(self.uart_cmd_)
         self.get_logger().info(self.uart_cmd_.data)
@@ -71,17 +78,17 @@ class StateCmdHandler(Node):
             self.get_logger().error('Make sure to include only 1 state handler command! Your input has ' + str(state_sum) + ' commands')
         else:
             if cmd.estop:               # Electronic stop
-                self.uart_cmd_.data = 'E'
+                self.uart_cmd_.data = fcode.ESTOP
             elif cmd.abort_movement:    # Abort current movement command
-                self.uart_cmd_.data = '@'
+                self.uart_cmd_.data = fcode.ABORT
             elif cmd.reset_estop:       # Reset the Electronic stop
-                self.uart_cmd_.data = 'F09'
+                self.uart_cmd_.data = fcode.RESET_ESTOP
             elif cmd.rep_end_stop:      # Report End Stop
-                self.uart_cmd_.data = 'F81'
+                self.uart_cmd_.data = fcode.REPORT_END_STOPS
             elif cmd.rep_curr_pos:      # Report Current Position
-                self.uart_cmd_.data = 'F82'
+                self.uart_cmd_.data = fcode.REPORT_POSITION
             elif cmd.rep_sw_ver:        # Report Software Version
-                self.uart_cmd_.data = 'F83'
+                self.uart_cmd_.data = fcode.REPORT_VERSION
 
             self.uart_tx_pub_.publish(self.uart_cmd_)
             self.get_logger().info(self.uart_cmd_.data)
@@ -92,9 +99,9 @@ class StateCmdHandler(Node):
         Farmbot. Check documentation for more information on status commands
         '''
         if cmd.mode:    # Write mode
-            self.uart_cmd_.data = 'F32 P' + str(cmd.p) + ' V' + str(cmd.v)
+            self.uart_cmd_.data = fcode.status_write(cmd.p, cmd.v)
         else:           # Read mode
-            self.uart_cmd_.data = 'F31 P' + str(cmd.p)
+            self.uart_cmd_.data = fcode.status_read(cmd.p)
         
         self.uart_tx_pub_.publish(self.uart_cmd_)
         self.get_logger().info(self.uart_cmd_.data)
@@ -0,0 +1,127 @@
+import os
+import struct
+
+
+# Direction of a recorded line
+RX = 0      # Farmduino -> UART controller
+TX = 1      # UART controller -> Farmduino
+DIRECTION_NAMES = ('rx', 'tx')
+
+# File header and record layout: monotonic time (s), direction, payload length, payload
+MAGIC = b'FBUART1\n'
+RECORD = struct.Struct('<dBH')
+
+
+class TrafficRecorder:
+    '''
+    Appends the serial lines sent to and received from the Farmduino to a
+    compact binary log. Every record is a fixed 11 byte header (monotonic
+    timestamp, direction and length) followed by the utf-8 line, so recording
+    costs a struct pack and a buffered write per line.
+
+    The log is rotated once it grows past 'max_bytes': log -> log.1 -> log.2 ...
+    keeping 'backups' old files.
+    '''
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        '''
+        Recorder constructor
+
+        Args:
+            path {str}: the path of the log file
+            max_bytes {int}: the size the log is rotated at
+            backups {int}: the amount of rotated logs kept
+        '''
+        self.path_ = os.path.abspath(os.path.expanduser(path))
+        self.max_bytes_ = max(len(MAGIC) + RECORD.size, max_bytes)
+        self.backups_ = max(0, backups)
+        self.records_ = 0
+        self.file_ = None
+        os.makedirs(os.path.dirname(self.path_), exist_ok=True)
+        self.open()
+
+    def open(self):
+        '''
+        Opens the log for appending, writing the header to new files
+        '''
+        self.file_ = open(self.path_, 'ab')
+        self.size_ = self.file_.tell()
+        if not self.size_:
+            self.file_.write(MAGIC)
+            self.size_ = len(MAGIC)
+
+    def record(self, direction: int, stamp: float, line: str):
+        '''
+        Appends a line to the log
+
+        Args:
+            direction {int}: RX or TX
+            stamp {float}: monotonic time the line was received or sent at
+            line {str}: the line without the endline character
+        '''
+        payload = line.encode('utf-8')[:0xFFFF]
+        self.file_.write(RECORD.pack(stamp, direction, len(payload)))
+        self.file_.write(payload)
+        self.size_ += RECORD.size + len(payload)
+        self.records_ += 1
+        if self.size_ >= self.max_bytes_:
+            self.rotate()
+
+    def rotate(self):
+        '''
+        Closes the current log and shifts the backups by one
+        '''
+        self.file_.close()
+        if self.backups_:
+            for index in range(self.backups_ - 1, 0, -1):
+                older = f'{self.path_}.{index}'
+                if os.path.exists(older):
+                    os.replace(older, f'{self.path_}.{index + 1}')
+            os.replace(self.path_, f'{self.path_}.1')
+        else:
+            os.remove(self.path_)
+        self.open()
+
+    def flush(self):
+        self.file_.flush()
+
+    def close(self):
+        if self.file_ is not None and not self.file_.closed:
+            self.file_.close()
+
+
+def read_records(path: str):
+    '''
+    Reads a traffic log
+
+    Args:
+        path {str}: the path of the log file
+    Returns:
+        a generator of (stamp, direction, line) tuples
+    '''
+    with open(path, 'rb') as log:
+        if log.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a Farmduino traffic log')
+        while True:
+            header = log.read(RECORD.size)
+            if len(header) < RECORD.size:
+                # End of the log (a truncated record is dropped)
+                return
+            stamp, direction, length = RECORD.unpack(header)
+            payload = log.read(length)
+            if len(payload) < length:
+                return
+            yield stamp, direction, payload.decode('utf-8', errors='replace')
+
+
+def rotated_logs(path: str) -> list:
+    '''
+    Returns the existing files of a rotated log, oldest first (log.N ... log.1, log)
+    '''
+    files = []
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        files.insert(0, f'{path}.{index}')
+        index += 1
+    if os.path.exists(path):
+        files.append(path)
+    return files
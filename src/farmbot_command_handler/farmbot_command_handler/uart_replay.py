@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+# ROS2 Imports
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+import rclpy
+from rclpy.node import Node
+from rclpy.utilities import remove_ros_args
+from std_msgs.msg import String, Bool
+
+from farmbot_command_handler.command_window import CommandWindow, untagged, ACK_RESPONSE
+from farmbot_command_handler.report_parser import parse_report
+from farmbot_command_handler.report_publisher import ReportPublisher
+from farmbot_command_handler.traffic_recorder import read_records, rotated_logs, RX, TX
+
+# Commands that are not checked against the recording (the aborts are also sent by the
+# UART controller itself when it preempts a move)
+UNCHECKED_CMDS = ('@', )
+
+
+class UARTReplay(Node):
+    '''
+    Farmbot ROS2 node that plays back a serial session recorded by the UART controller
+    (record_path parameter) in place of the UART controller and the Farmduino.
+
+    The received lines are published on /uart_receive and on the typed report topics
+    and the busy state is rebuilt from the recorded traffic, so the rest of the system
+    (FarmbotControl, the Sequencer, the rqt plugins) runs against real production traffic.
+    The session is replayed at its recorded pace scaled by 'speed' (e.g. 1 or 10), or as
+    fast as possible if 'speed' is 0.
+
+    If 'check' is set, the commands published by the system on the /uart_transmit
+    topics are compared with the commands recorded in the session.
+
+    Input Topics (check only):
+        - /uart_transmit, /uart_transmit_interactive, /uart_transmit_background {String}
+    Output Topics:
+        - /uart_receive {String} -> the recorded lines received from the Farmduino.
+        - /report/... -> the typed reports (see ReportPublisher).
+        - /busy_state {Bool} -> the busy state rebuilt from the recording.
+    '''
+    def __init__(self, records: list, speed: float = 1.0, check: bool = False, settle: float = 1.0):
+        '''
+        Node Constructor
+
+        Args:
+            records {list}: the recorded (stamp, direction, line) tuples
+            speed {float}: the replay speed multiplier (0 for as fast as possible)
+            check {bool}: compare the transmitted commands with the recording
+            settle {float}: time (s) waited after the last record for the system to respond
+        '''
+        super().__init__('UARTReplay')
+
+        self.records_ = records
+        self.speed_ = speed
+        self.settle_ = settle
+        self.done_ = False
+
+        self.uart_rx_pub_ = self.create_publisher(String, 'uart_receive', 10)
+        self.reports_ = ReportPublisher(self)
+        self.farmbot_busy_ = Bool()
+        self.farmbot_busy_.data = False
+        self.farmbot_state_pub_ = self.create_publisher(Bool, 'busy_state', 10)
+        self.window_ = CommandWindow()
+
+        # Transmitted commands checked against the recording
+        self.check_ = check
+        self.expected_ = [untagged(line) for _, direction, line in records
+                          if direction == TX and line not in UNCHECKED_CMDS]
+        self.transmitted_ = []
+        self.lock_ = threading.Lock()
+        if check:
+            self.tx_subs_ = [self.create_subscription(String, topic, self.uart_transmit_callback, 200)
+                             for topic in ('uart_transmit', 'uart_transmit_interactive', 'uart_transmit_background')]
+
+        self.thread_ = threading.Thread(target=self.replay, daemon=True)
+
+        # Log the initialization
+        self.get_logger().info(f'UART Replay Initialized with {len(records)} records..')
+
+    def start(self):
+        self.thread_.start()
+
+    def uart_transmit_callback(self, message: String):
+        '''
+        Records the commands the system sends while the session is replayed
+        '''
+        line = untagged(message.data.rstrip('\n'))
+        if line not in UNCHECKED_CMDS:
+            with self.lock_:
+                self.transmitted_.append(line)
+
+    def replay(self):
+        '''
+        Plays the records back, keeping their recorded pace (scaled by the speed)
+        '''
+        started = time.monotonic()
+        base_stamp = None
+        base_time = started
+        previous = None
+        published = 0
+        for stamp, direction, line in self.records_:
+            if self.speed_ > 0.0:
+                # A new session (e.g. a rotated log of an earlier run) restarts the clock
+                if base_stamp is None or stamp < previous:
+                    base_stamp = stamp
+                    base_time = time.monotonic()
+                delay = base_time + (stamp - base_stamp) / self.speed_ - time.monotonic()
+                if delay > 0.0:
+                    time.sleep(delay)
+            previous = stamp
+
+            if direction == TX:
+                self.replay_tx(line)
+            else:
+                self.replay_rx(line)
+                published += 1
+
+        duration = time.monotonic() - started
+        recorded = (self.records_[-1][0] - self.records_[0][0]) if self.records_ else 0.0
+        self.get_logger().info(f'Replayed {len(self.records_)} records ({published} received lines) in '
+                               f'{duration:.2f}s, recorded over {recorded:.2f}s '
+                               f'({recorded / duration if duration > 0.0 else 0.0:.1f}x)')
+
+        if self.check_:
+            time.sleep(self.settle_)
+            self.report_check()
+        self.done_ = True
+
+    def replay_tx(self, line: str):
+        '''
+        Tracks a recorded command as in flight, like the UART controller did when sending it
+        '''
+        if line in ['E', 'F09', '@']:
+            self.window_.clear()
+        else:
+            self.window_.track(line)
+        self.set_busy(bool(self.window_))
+
+    def replay_rx(self, line: str):
+        '''
+        Publishes a recorded report on the raw and typed topics
+        '''
+        report = parse_report(line)
+        cmd = self.window_.match(report.code, report.queue)
+        if cmd is not None:
+            if report.code == ACK_RESPONSE:
+                cmd.acked = True
+            elif cmd.finished_by(report.code):
+                self.window_.close(cmd)
+
+        self.reports_.publish(report, cmd.code if cmd is not None else self.window_.code_of(report.queue))
+        message = String()
+        message.data = line
+        self.uart_rx_pub_.publish(message)
+        self.set_busy(bool(self.window_))
+
+    def set_busy(self, busy: bool):
+        if self.farmbot_busy_.data != busy:
+            if not busy:
+                self.reports_.position_.flush()
+            self.farmbot_busy_.data = busy
+            self.farmbot_state_pub_.publish(self.farmbot_busy_)
+
+    def report_check(self):
+        '''
+        Logs how the transmitted commands compare with the recorded ones
+        '''
+        with self.lock_:
+            transmitted = list(self.transmitted_)
+        expected = self.expected_
+
+        out_of_order = sum(1 for sent, recorded in zip(transmitted, expected) if sent != recorded)
+        missing = Counter(expected) - Counter(transmitted)
+        unexpected = Counter(transmitted) - Counter(expected)
+        self.get_logger().info(f'Transmit check: {len(expected)} recorded, {len(transmitted)} sent, '
+                               f'{out_of_order} out of order, {sum(missing.values())} missing, '
+                               f'{sum(unexpected.values())} unexpected')
+        for line, count in list(missing.items())[:10]:
+            self.get_logger().warning(f'Recorded but not sent ({count}x): {line}')
+        for line, count in list(unexpected.items())[:10]:
+            self.get_logger().warning(f'Sent but not recorded ({count}x): {line}')
+
+
+# Main Function called on the initialization of the ROS2 Node
+def main(args = None):
+    parser = argparse.ArgumentParser(description='Replays a serial session recorded by the UART controller')
+    parser.add_argument('log', help='traffic log written by the uart_controller (record_path parameter)')
+    parser.add_argument('--all', action='store_true', help='also replay the rotated logs (log.N ... log.1) first')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier, 0 for as fast as possible')
+    parser.add_argument('--check', action='store_true', help='compare the /uart_transmit commands with the recording')
+    parser.add_argument('--settle', type=float, default=1.0, help='time (s) waited for the system before checking')
+    options = parser.parse_args(remove_ros_args(args if args is not None else sys.argv)[1:])
+
+    records = []
+    for path in (rotated_logs(options.log) if options.all else [options.log]):
+        records.extend(read_records(path))
+
+    rclpy.init(args = args)
+
+    replay_node = UARTReplay(records, speed=options.speed, check=options.check, settle=options.settle)
+    replay_node.start()
+
+    try:
+        while rclpy.ok() and not replay_node.done_:
+            rclpy.spin_once(replay_node, timeout_sec=0.1)
+    except KeyboardInterrupt:
+        pass
+
+    replay_node.destroy_node()
+    rclpy.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import math
+from collections import deque
+
+
+class RunningStat:
+    '''
+    Cheap running statistic (count, mean, min, max and last sample) used
+    for the timing figures reported by the UART layer.
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        '''
+        Clears all the recorded samples
+        '''
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, sample: float):
+        '''
+        Records a new sample
+
+        Args:
+            sample {float}: the value to record
+        '''
+        self.count += 1
+        self.total += sample
+        self.last = sample
+        if sample < self.min:
+            self.min = sample
+        if sample > self.max:
+            self.max = sample
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, scale: float = 1000.0) -> str:
+        '''
+        Returns a one line summary of the statistic. Samples are recorded in
+        seconds and reported in milliseconds by default.
+
+        Args:
+            scale {float}: multiplier applied to the reported values
+        '''
+        if not self.count:
+            return 'n=0'
+        return (f'n={self.count} mean={self.mean * scale:.2f} min={self.min * scale:.2f} '
+                f'max={self.max * scale:.2f} last={self.last * scale:.2f}')
+
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+
+class RollingHistogram:
+    '''
+    Histogram of the last 'window' samples. The bucket counts are kept up to
+    date as samples enter and leave the window, so the distribution always
+    reflects the recent behaviour of the Farmduino rather than the whole run.
+    '''
+    def __init__(self, window: int = 500, bounds: tuple = LATENCY_BUCKETS):
+        '''
+        Histogram constructor
+
+        Args:
+            window {int}: the amount of samples kept
+            bounds {tuple}: the ascending upper bounds of the buckets
+        '''
+        self.bounds = bounds
+        self.samples = deque(maxlen=max(1, window))
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def bucket(self, sample: float) -> int:
+        '''
+        Returns the index of the bucket a sample falls in
+        '''
+        for index, bound in enumerate(self.bounds):
+            if sample <= bound:
+                return index
+        return len(self.bounds)
+
+    def add(self, sample: float):
+        '''
+        Records a new sample, dropping the oldest one if the window is full
+
+        Args:
+            sample {float}: the value to record
+        '''
+        if len(self.samples) == self.samples.maxlen:
+            self.counts[self.bucket(self.samples[0])] -= 1
+        self.samples.append(sample)
+        self.counts[self.bucket(sample)] += 1
+        self.total += 1
+
+    def percentile(self, percent: float) -> float:
+        '''
+        Returns a percentile of the samples in the window (0.0 if empty)
+
+        Args:
+            percent {float}: the percentile, between 0 and 100
+        '''
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def as_dict(self, scale: float = 1000.0) -> dict:
+        '''
+        Returns the statistics and the buckets of the window. Samples are recorded
+        in seconds and reported in milliseconds by default.
+
+        Args:
+            scale {float}: multiplier applied to the reported values
+        '''
+        if not self.samples:
+            return {'count': 0, 'total': self.total}
+        buckets = {}
+        for index, count in enumerate(self.counts):
+            if count:
+                label = f'le_{self.bounds[index] * scale:g}' if index < len(self.bounds) else 'inf'
+                buckets[label] = count
+        return {
+            'count': len(self.samples),
+            'total': self.total,
+            'mean': round(sum(self.samples) / len(self.samples) * scale, 3),
+            'p50': round(self.percentile(50) * scale, 3),
+            'p90': round(self.percentile(90) * scale, 3),
+            'p99': round(self.percentile(99) * scale, 3),
+            'max': round(max(self.samples) * scale, 3),
+            'buckets': buckets,
+        }
+
+
+class CommandTimings:
+    '''
+    Rolling histograms of the queue wait, ack latency (sent -> R01) and
+    execution time (R01 -> R02/R03) of the commands, per command code
+    '''
+    PHASES = ('wait', 'ack', 'exec')
+
+    def __init__(self, window: int = 500):
+        '''
+        Args:
+            window {int}: the amount of samples kept per histogram
+        '''
+        self.window_ = window
+        self.codes_ = {}
+
+    def histograms(self, code: str) -> dict:
+        '''
+        Returns the histograms of a command code, creating them on first use
+        '''
+        histograms = self.codes_.get(code)
+        if histograms is None:
+            histograms = {phase: RollingHistogram(self.window_) for phase in self.PHASES}
+            self.codes_[code] = histograms
+        return histograms
+
+    def add(self, code: str, phase: str, sample: float):
+        '''
+        Records a sample
+
+        Args:
+            code {str}: the command code (e.g. 'G00')
+            phase {str}: 'wait', 'ack' or 'exec'
+            sample {float}: the duration in seconds
+        '''
+        self.histograms(code)[phase].add(sample)
+
+    def codes(self) -> list:
+        return sorted(self.codes_)
+
+    def as_dict(self) -> dict:
+        '''
+        Returns the histograms of every command code (in milliseconds)
+        '''
+        return {
+            code: {phase: histogram.as_dict() for phase, histogram in self.codes_[code].items()}
+            for code in self.codes()
+        }
@@ -0,0 +1,66 @@
+import threading
+from rclpy.node import Node
+from rclpy.qos import QoSProfile, DurabilityPolicy
+from std_msgs.msg import String
+from farmbot_interfaces.msg import ParamReport, MapBounds
+
+from farmbot_command_handler.fcode import Limits
+
+
+class UARTTransmitter:
+    '''
+    Publishes encoded F-Code lines (see fcode) straight to the UART controller,
+    without going through the command handler nodes. The limits the moves are
+    encoded against (limits_) follow the reported firmware parameters and the
+    dimensions of the active map. The lines can be sent from any thread of the node.
+
+    Input Topics:
+        - /report/param {ParamReport} -> the parameter values setting the speed and travel limits.
+        - /map_bounds {MapBounds} -> the reach of the gantry from the active map.
+    Output Topics:
+        - /uart_transmit {String} -> the job commands.
+        - /uart_transmit_interactive {String} -> the interactive (operator) commands.
+    '''
+    def __init__(self, node: Node, depth: int = 200):
+        '''
+        Creates the transmit publishers on the node
+
+        Args:
+            node {Node}: the node sending the commands
+            depth {int}: the depth of the job publisher (sequences are sent as bursts)
+        '''
+        self.node_ = node
+        self.uart_cmd_ = String()
+        self.lock_ = threading.Lock()
+        self.uart_tx_pub_ = node.create_publisher(String, 'uart_transmit', depth)
+        self.uart_tx_interactive_pub_ = node.create_publisher(String, 'uart_transmit_interactive', 10)
+
+        self.limits_ = Limits()
+        self.param_report_sub_ = node.create_subscription(ParamReport, 'report/param',
+                                                          lambda msg: self.limits_.observe(msg.param, msg.value), 200)
+        self.map_bounds_sub_ = node.create_subscription(MapBounds, 'map_bounds',
+                                                        lambda msg: self.limits_.set_envelope(msg.x_len, msg.y_len, msg.z_len),
+                                                        QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL))
+
+    def send(self, line: str, interactive: bool = False):
+        '''
+        Sends a command line to the UART controller
+
+        Args:
+            line {str}: the F-Code command line
+            interactive {bool}: True for operator commands, served before the queued jobs
+        '''
+        with self.lock_:
+            self.uart_cmd_.data = line
+            if interactive:
+                self.uart_tx_interactive_pub_.publish(self.uart_cmd_)
+            else:
+                self.uart_tx_pub_.publish(self.uart_cmd_)
+        self.node_.get_logger().debug(line)
+
+    def send_all(self, lines: list, interactive: bool = False):
+        '''
+        Sends a batch of command lines (e.g. from fcode.moves or fcode.pin_ops) in order
+        '''
+        for line in lines:
+            self.send(line, interactive)
@@ -23,7 +23,10 @@ setup(
             "motor_command_handler = farmbot_command_handler.motor_cmd_handler:main",
             "device_command_handler = farmbot_command_handler.device_cmd_handler:main",
             "state_command_handler = farmbot_command_handler.state_cmd_handler:main",
-            "uart_controller = farmbot_command_handler.UART_controller:main"
+            "uart_controller = farmbot_command_handler.UART_controller:main",
+            "farmduino_emulator = farmbot_command_handler.farmduino_emulator:main",
+            "uart_replay = farmbot_command_handler.uart_replay:main",
+            "fcode_benchmark = farmbot_command_handler.fcode_benchmark:main"
         ],
     },
 )
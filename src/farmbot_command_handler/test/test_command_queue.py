@@ -0,0 +1,66 @@
+from farmbot_command_handler.command_queue import CommandScheduler, EMERGENCY, INTERACTIVE, JOB, BACKGROUND
+
+
+def lines(scheduler: CommandScheduler) -> list:
+    popped = []
+    while scheduler:
+        popped.append(scheduler.pop().line)
+    return popped
+
+
+def test_class_ordering():
+    scheduler = CommandScheduler()
+    scheduler.push('F83', BACKGROUND)
+    scheduler.push('G00 X1.0 Y0.0 Z0.0', JOB)
+    scheduler.push('F41 P8 V1 M0', JOB)
+    scheduler.push('J00 X5.0 Y0.0 Z0.0', INTERACTIVE)
+    scheduler.push('E', EMERGENCY)
+
+    assert len(scheduler) == 5
+    assert scheduler.peek().line == 'E'
+    assert scheduler.has_higher(JOB)
+    # Most urgent class first, FIFO within a class
+    assert lines(scheduler) == ['E', 'J00 X5.0 Y0.0 Z0.0', 'G00 X1.0 Y0.0 Z0.0', 'F41 P8 V1 M0', 'F83']
+    assert scheduler.pop() is None
+    assert not scheduler.has_higher(BACKGROUND)
+
+
+def test_preempted_command_goes_first():
+    scheduler = CommandScheduler()
+    scheduler.push('G00 X1.0 Y0.0 Z0.0', JOB)
+    scheduler.push('G00 X2.0 Y0.0 Z0.0', JOB)
+    preempted = scheduler.pop()
+    scheduler.push_front(preempted)
+
+    assert scheduler.peek() is preempted
+    assert lines(scheduler) == ['G00 X1.0 Y0.0 Z0.0', 'G00 X2.0 Y0.0 Z0.0']
+    assert 'preempted=1' in scheduler.summary()
+
+
+def test_coalescing():
+    scheduler = CommandScheduler(coalesced=(INTERACTIVE, ))
+    scheduler.push('J00 X10.0 Y0.0 Z0.0', INTERACTIVE)
+    scheduler.push('J00 X10.0 Y-5.0 Z0.0', INTERACTIVE)
+    scheduler.push('G00 X100.0 Y100.0 Z0.0', INTERACTIVE)
+    scheduler.push('J00 X0.0 Y20.0 Z0.0', INTERACTIVE)
+    # Not a move, ends the run of merged moves
+    scheduler.push('F41 P7 V1 M0', INTERACTIVE)
+    scheduler.push('J00 X1.0 Y0.0 Z0.0', INTERACTIVE)
+    # The other classes are never merged
+    scheduler.push('G00 X1.0 Y0.0 Z0.0', JOB)
+    scheduler.push('G00 X2.0 Y0.0 Z0.0', JOB)
+
+    assert scheduler.depth(INTERACTIVE) == 3
+    assert scheduler.elided_[INTERACTIVE] == 3
+    assert lines(scheduler) == ['G00 X100.0 Y120.0 Z0.0', 'F41 P7 V1 M0', 'J00 X1.0 Y0.0 Z0.0',
+                                'G00 X1.0 Y0.0 Z0.0', 'G00 X2.0 Y0.0 Z0.0']
+
+
+def test_clear_class():
+    scheduler = CommandScheduler()
+    scheduler.push('J00 X1.0 Y0.0 Z0.0', INTERACTIVE)
+    scheduler.push('J00 X2.0 Y0.0 Z0.0', INTERACTIVE)
+    scheduler.push('G00 X1.0 Y0.0 Z0.0', JOB)
+
+    assert scheduler.clear_class(INTERACTIVE) == 2
+    assert lines(scheduler) == ['G00 X1.0 Y0.0 Z0.0']
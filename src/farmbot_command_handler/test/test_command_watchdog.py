@@ -0,0 +1,182 @@
+import time
+
+from farmbot_command_handler.command_queue import CommandScheduler, JOB
+from farmbot_command_handler.command_watchdog import CommandWatchdog, CommandDeadlines, RETRY, SKIP
+from farmbot_command_handler.command_window import CommandWindow, PROBE_QUEUE_NR
+from farmbot_command_handler.firmware_params import ParamTracker
+from farmbot_command_handler.report_parser import parse_report
+
+
+class Logger:
+    def __getattr__(self, level):
+        return lambda message: None
+
+
+class Parameter:
+    def __init__(self, value):
+        self.value = value
+
+
+class Node:
+    '''
+    The parameters and the timer of the watchdog, without a ROS context
+    '''
+    def __init__(self, **params):
+        self.params_ = params
+
+    def has_parameter(self, name: str) -> bool:
+        return name in self.params_
+
+    def declare_parameter(self, name: str, value):
+        self.params_[name] = value
+
+    def get_parameter(self, name: str):
+        return Parameter(self.params_[name])
+
+    def create_timer(self, period: float, callback):
+        return None
+
+
+class Channel:
+    '''
+    The parts of a FarmduinoChannel the watchdog uses
+    '''
+    def __init__(self, **params):
+        self.node_ = Node(**params)
+        self.logger_ = Logger()
+        self.window_ = CommandWindow(size=4)
+        self.tx_queue_ = CommandScheduler()
+        self.written_ = []
+        self.failed_ = []
+        self.dispatched_ = 0
+
+    def write(self, data: str, lines: int = 1):
+        self.written_.append(data)
+
+    def dispatch_next(self):
+        self.dispatched_ += 1
+
+    def report_failed(self, cmd):
+        self.failed_.append(cmd.code)
+
+
+def expire(channel: Channel, line: str):
+    '''
+    Dispatches a command from the queue and lets its deadline pass
+    '''
+    channel.tx_queue_.push(line, JOB)
+    cmd = channel.window_.open(line, channel.tx_queue_.pop())
+    cmd.deadline = time.monotonic() - 1.0
+    return cmd
+
+
+def answer_probe(watchdog: CommandWatchdog, position: tuple):
+    watchdog.probe_report(parse_report(f'R83 6.5.0 Q{PROBE_QUEUE_NR}'))
+    watchdog.probe_report(parse_report(f'R82 X{position[0]} Y{position[1]} Z{position[2]} Q{PROBE_QUEUE_NR}'))
+
+
+def test_deadlines():
+    deadlines = CommandDeadlines(ParamTracker(), request_timeout=3.0, move_factor=2.0, margin=5.0)
+    assert deadlines.allowed('F22 P71 V400') == 3.0
+    short = deadlines.allowed('G00 X100.0 Y0.0 Z0.0', (0.0, 0.0, 0.0))
+    long = deadlines.allowed('G00 X1000.0 Y0.0 Z0.0', (0.0, 0.0, 0.0))
+    assert 5.0 < short < long
+    # An unknown position assumes the whole length of the axes
+    assert deadlines.allowed('G00 X100.0 Y0.0 Z0.0') > short
+    assert deadlines.estimate('F44 P8 V1 W0 T500 M0') == 0.5
+
+
+def test_probe_sent_for_expired_commands():
+    channel = Channel()
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    watchdog.check()
+    assert not channel.written_
+
+    expire(channel, 'G00 X100.0 Y0.0 Z0.0')
+    watchdog.check()
+    assert channel.written_ == [f'F83 Q{PROBE_QUEUE_NR}\nF82 Q{PROBE_QUEUE_NR}\n']
+    assert watchdog.expired_ == 1
+
+
+def test_lost_completion_at_target():
+    channel = Channel()
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    cmd = expire(channel, 'G00 X100.0 Y0.0 Z0.0')
+    watchdog.check()
+    answer_probe(watchdog, (100.0, 0.0, 0.0))
+
+    assert watchdog.completed_ == 1
+    assert not channel.window_.is_open(cmd)
+    assert not channel.tx_queue_
+    assert channel.dispatched_ == 1
+
+
+def test_retry_then_skip():
+    channel = Channel(watchdog_policy=RETRY, watchdog_max_retries=1)
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    cmd = expire(channel, 'G00 X100.0 Y0.0 Z0.0')
+    watchdog.check()
+    answer_probe(watchdog, (20.0, 0.0, 0.0))
+
+    # Aborted and requeued at the head of its class
+    assert watchdog.retried_ == 1
+    assert channel.written_[-1] == '@\n'
+    assert channel.tx_queue_.peek() is cmd.source
+    assert cmd.source.retries == 1
+
+    retried = channel.window_.open(cmd.source.line, channel.tx_queue_.pop())
+    retried.deadline = time.monotonic() - 1.0
+    watchdog.check()
+    answer_probe(watchdog, (20.0, 0.0, 0.0))
+    assert watchdog.skipped_ == 1
+    assert not channel.tx_queue_
+
+
+def test_skip_policy():
+    channel = Channel(watchdog_policy=SKIP)
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    expire(channel, 'F82')
+    watchdog.check()
+    answer_probe(watchdog, (0.0, 0.0, 0.0))
+    assert watchdog.skipped_ == 1
+    assert watchdog.retried_ == 0
+    assert not channel.window_
+
+
+def test_unsafe_commands_are_not_retried():
+    channel = Channel(watchdog_policy=RETRY, watchdog_max_retries=3)
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    expire(channel, 'F44 P8 V1 W0 T500 M0')
+    watchdog.check()
+    answer_probe(watchdog, (0.0, 0.0, 0.0))
+
+    # A late completion would water twice: reported as failed, not sent again
+    assert watchdog.failed_ == 1
+    assert watchdog.retried_ == 0
+    assert channel.failed_ == ['F44']
+    assert not channel.tx_queue_
+    assert not channel.window_
+    assert channel.written_[-1].startswith('F83')
+
+
+def test_finished_while_probing():
+    channel = Channel()
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    cmd = expire(channel, 'G00 X100.0 Y0.0 Z0.0')
+    watchdog.check()
+    channel.window_.close(cmd)
+    answer_probe(watchdog, (20.0, 0.0, 0.0))
+    assert (watchdog.completed_, watchdog.retried_, watchdog.skipped_) == (0, 0, 0)
+
+
+def test_unanswered_probe_keeps_the_commands():
+    channel = Channel(watchdog_probe_timeout=0.0)
+    watchdog = CommandWatchdog(channel, ParamTracker())
+    cmd = expire(channel, 'G00 X100.0 Y0.0 Z0.0')
+    watchdog.check()
+    time.sleep(0.01)
+    watchdog.check()
+
+    assert watchdog.unanswered_ == 1
+    assert channel.window_.is_open(cmd)
+    assert cmd.deadline > time.monotonic()
@@ -0,0 +1,95 @@
+from farmbot_command_handler.command_queue import QueuedCommand, INTERACTIVE, JOB
+from farmbot_command_handler.command_window import (CommandWindow, queue_number, untagged,
+                                                    MIN_QUEUE_NR, MAX_QUEUE_NR)
+
+
+def test_queue_tags():
+    assert queue_number('R02 Q12') == 12
+    assert queue_number('R82 X1.00 Y2.00 Z3.00') == 0
+    assert untagged('F22 P71 V400 Q7') == 'F22 P71 V400'
+    assert untagged('F22 P71 V400') == 'F22 P71 V400'
+
+
+def test_queue_number_wrap():
+    window = CommandWindow(size=4)
+    # The sender's tag is replaced
+    cmd = window.open('F22 P71 V400 Q5')
+    assert cmd.line == f'F22 P71 V400 Q{MIN_QUEUE_NR}'
+
+    # Still in flight, its queue number is skipped after the wrap
+    window.next_queue_ = MAX_QUEUE_NR
+    last = window.open('F41 P8 V1 M0')
+    assert last.queue == MAX_QUEUE_NR
+    assert window.open('F42 P63 M0').queue == MIN_QUEUE_NR + 1
+
+    window.close(cmd)
+    window.close(last)
+    window.next_queue_ = MAX_QUEUE_NR
+    assert window.open('F21 P71').queue == MAX_QUEUE_NR
+    assert window.open('F21 P72').queue == MIN_QUEUE_NR
+
+
+def test_blocking_commands_run_alone():
+    window = CommandWindow(size=4)
+    assert window.can_dispatch('G00')
+    move = window.open('G00 X1.0 Y2.0 Z3.0')
+    assert not window.can_dispatch('F22')
+    assert not window.can_dispatch('G00')
+
+    window.close(move)
+    window.open('F22 P71 V400')
+    assert window.can_dispatch('F41', 13)
+    assert not window.can_dispatch('G00')
+    assert not window.can_dispatch('F44')
+
+
+def test_window_size_and_pending_bytes():
+    window = CommandWindow(size=2, max_pending_bytes=40)
+    first = window.open('F22 P71 V400')
+    assert window.can_dispatch('F22', 16)
+    assert not window.can_dispatch('F22', 30)
+    window.open('F22 P72 V400')
+    assert not window.can_dispatch('F21', 1)
+
+    # Acknowledged commands no longer count against the bytes
+    first.acked = True
+    window.close(first)
+    assert window.can_dispatch('F21', 20)
+
+
+def test_report_matching():
+    window = CommandWindow(size=4)
+    write = window.open('F22 P71 V400')
+    read = window.open('F42 P63 M0')
+
+    assert window.match('R01', read.queue) is read
+    # Untagged reports go to the oldest command they can belong to
+    assert window.match('R01', 0) is write
+    write.acked = True
+    assert window.match('R01', 0) is read
+    assert window.match('R41', 0) is read
+    assert window.match('R08', 0) is write
+    assert window.match('R02', 0) is None
+
+    window.close(write)
+    assert window.code_of(write.queue) == 'F22'
+    assert window.recent(write.queue) is write
+    assert not window.is_open(write)
+
+
+def test_preemptible():
+    window = CommandWindow(size=4)
+    job_move = window.open('G00 X1.0 Y2.0 Z3.0', QueuedCommand('G00 X1.0 Y2.0 Z3.0', JOB))
+    assert window.preemptible(INTERACTIVE) is job_move
+    assert window.preemptible(JOB) is None
+
+    job_move.preempted = True
+    assert window.preemptible(INTERACTIVE) is None
+
+    window.clear()
+    homing = window.open('F11', QueuedCommand('F11', JOB))
+    assert window.preemptible(INTERACTIVE) is None
+    window.close(homing)
+    # Commands not dispatched from the queue (e.g. resync) are never preempted
+    window.open('G00 X1.0 Y2.0 Z3.0')
+    assert window.preemptible(INTERACTIVE) is None
@@ -0,0 +1,93 @@
+import pytest
+
+from farmbot_command_handler import fcode
+
+
+def test_move_format():
+    # Same format as the lines the command handlers always published
+    assert fcode.move(10.0, 20.5, -3.0, 400.0, 400.0, 400.0) == 'G00 X10.0 Y20.5 Z-3.0 A400.0 B400.0 C400.0'
+    assert fcode.move(5.0, 0.0, 0.0, 400.0, 400.0, 400.0, relative=True) == 'J00 X5.0 Y0.0 Z0.0 A400.0 B400.0 C400.0'
+    assert fcode.move(1.0, 2.0, 3.0, straight=True) == 'G01 X1.0 Y2.0 Z3.0'
+
+
+def test_device_formats():
+    assert fcode.home(current_pos_home=True, x=True, z=True) == 'F84 X1 Y0 Z1'
+    assert fcode.home(calib=True, x=True) == 'F14'
+    assert fcode.servo(4, 90.0) == 'F61 P4 V90.0'
+    assert fcode.water(1, 500) == 'F01 T500'
+    assert fcode.water(2, 20) == 'F02 N20'
+    assert fcode.pin_write(9, 1, False) == 'F41 P9 V1 M0'
+    assert fcode.pin_write2(8, 1, 0, 200, False) == 'F44 P8 V1 W0 T200 M0'
+    assert fcode.pin_read(59, True) == 'F42 P59 M1'
+    assert fcode.pin_io(13, 1) == 'F43 P13 M1'
+    assert fcode.i2c_set(1, 2, 3) == 'F51 E1 P2 V3'
+    assert fcode.param_write(71, 800) == 'F22 P71 V800'
+
+
+@pytest.mark.parametrize('encode, args', [
+    (fcode.servo, (7, 90.0)),
+    (fcode.servo, (4, 190.0)),
+    (fcode.water, (3, 100)),
+    (fcode.water, (1, 0)),
+    (fcode.pin_write, (70, 1, False)),
+    (fcode.pin_write, (9, 2, False)),
+    (fcode.pin_write, (9, 256, True)),
+    (fcode.pin_io, (9, 3)),
+    (fcode.param_write, (300, 1)),
+    (fcode.param_write, (71, 2 ** 31)),
+    (fcode.home, ()),
+])
+def test_invalid_commands(encode, args):
+    with pytest.raises(fcode.FCodeError):
+        encode(*args)
+
+
+def test_limits_from_params():
+    limits = fcode.Limits({71: 400, 72: 400, 73: 400, 55: 5, 56: 5, 57: 25, 141: 6000, 142: 0})
+    fcode.move(1200.0, 5000.0, 0.0, 400.0, 400.0, 400.0, limits=limits)    # Y not calibrated
+    with pytest.raises(fcode.FCodeError):
+        fcode.move(1201.0, 0.0, 0.0, limits=limits)
+    # Speeds above the maximum are clamped, as the firmware does
+    assert fcode.move(0.0, 0.0, 0.0, 800.0, 400.0, 300.0, limits=limits) == 'G00 X0.0 Y0.0 Z0.0 A400.0 B400.0 C300.0'
+    assert fcode.moves([(0.0, 0.0, 0.0)], (800.0, 800.0, 800.0), limits=limits) == [
+        'G00 X0.0 Y0.0 Z0.0 A400.0 B400.0 C400.0']
+    with pytest.raises(fcode.FCodeError):
+        fcode.move(0.0, 0.0, 0.0, -1.0, 400.0, 400.0, limits=limits)
+    # Increments are not checked against the travel
+    fcode.move(5000.0, 0.0, 0.0, relative=True, limits=limits)
+
+    limits.observe(71, 800)
+    assert fcode.move(0.0, 0.0, 0.0, 800.0, 0.0, 0.0, limits=limits) == 'G00 X0.0 Y0.0 Z0.0 A800.0 B0.0 C0.0'
+
+
+def test_map_envelope():
+    limits = fcode.Limits({55: 5, 141: 15000}, envelope=(2800.0, 1400.0, 400.0))
+    fcode.move(2800.0, 0.0, -400.0, limits=limits)
+    for x, y, z in ((-1.0, 0.0, 0.0), (0.0, 1401.0, 0.0), (0.0, 0.0, 10.0), (0.0, 0.0, -401.0)):
+        with pytest.raises(fcode.FCodeError):
+            fcode.move(x, y, z, limits=limits)
+    assert limits.clamp(3500.0, -20.0, 50.0) == (2800.0, 0.0, 0.0)
+
+    # The calibrated travel is tighter than the map
+    limits.observe(141, 10000)
+    assert limits.clamp(2800.0, 0.0, 0.0) == (2000.0, 0.0, 0.0)
+    # Unknown map lengths do not limit the moves
+    limits.set_envelope(0.0, 0.0, 0.0)
+    fcode.move(0.0, 5000.0, 100.0, limits=limits)
+
+
+def test_batch_encoding():
+    waypoints = [(0.0, 0.0, 0.0), (100.0, 50.0, -10.0), (200.0, 50.0, -10.0, 100.0, 100.0, 100.0)]
+    assert fcode.moves(waypoints, (400.0, 400.0, 400.0)) == [
+        fcode.move(0.0, 0.0, 0.0, 400.0, 400.0, 400.0),
+        fcode.move(100.0, 50.0, -10.0, 400.0, 400.0, 400.0),
+        fcode.move(200.0, 50.0, -10.0, 100.0, 100.0, 100.0),
+    ]
+    assert fcode.pin_ops([(fcode.PIN_WRITE, 9, 1, False), (fcode.PIN_READ, 63, False)]) == ['F41 P9 V1 M0', 'F42 P63 M0']
+
+    limits = fcode.Limits({55: 5, 141: 1000})
+    with pytest.raises(fcode.FCodeError, match='Waypoint 1') as error:
+        fcode.moves([(0.0, 0.0, 0.0), (300.0, 0.0, 0.0)], limits=limits)
+    assert error.value.index == 1
+    with pytest.raises(fcode.FCodeError, match='Pin operation 1'):
+        fcode.pin_ops([(fcode.PIN_WRITE, 9, 1, False), (fcode.PIN_WRITE, 99, 1, False)])
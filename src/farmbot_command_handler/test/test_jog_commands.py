@@ -0,0 +1,48 @@
+from farmbot_command_handler import fcode
+from farmbot_command_handler.firmware_params import ParamTracker
+from farmbot_command_handler.jog_commands import coalesce, resolve_jog
+
+
+def test_relative_moves_are_summed():
+    assert coalesce('J00 X10.0 Y0.0 Z0.0', 'J00 X10.0 Y-5.0 Z2.0') == 'J00 X20.0 Y-5.0 Z2.0'
+    # Missing increments are 0, the speeds of the latest move are kept
+    assert coalesce('J00 X10.0 Y0.0 Z0.0 A400.0', 'J00 Y5.0 A200.0 B200.0') == 'J00 X10.0 Y5.0 Z0.0 A200.0 B200.0'
+
+
+def test_relative_move_after_absolute_move():
+    assert coalesce('G00 X100.0 Y50.0 Z0.0', 'J00 X-10.0 Y0.0 Z-5.0') == 'G00 X90.0 Y50.0 Z-5.0'
+    # The absolute target is only known with all of its coordinates
+    assert coalesce('G00 X100.0 Y50.0', 'J00 X-10.0 Y0.0 Z0.0') is None
+
+
+def test_absolute_move_replaces_previous_move():
+    assert coalesce('J00 X10.0 Y0.0 Z0.0', 'G00 X1.0 Y2.0 Z3.0') == 'G00 X1.0 Y2.0 Z3.0'
+    assert coalesce('G00 X10.0 Y0.0 Z0.0', 'G00 X1.0 Y2.0 Z3.0') == 'G00 X1.0 Y2.0 Z3.0'
+
+
+def test_other_commands_are_not_merged():
+    assert coalesce('F41 P8 V1 M0', 'J00 X10.0 Y0.0 Z0.0') is None
+    assert coalesce('J00 X10.0 Y0.0 Z0.0', 'F41 P8 V1 M0') is None
+    assert coalesce('G01 X10.0 Y0.0 Z0.0', 'J00 X10.0 Y0.0 Z0.0') is None
+
+
+def test_resolve_jog():
+    assert resolve_jog('J00 X10.0 Y-5.0 Z0.0 A400.0 B400.0 C400.0', (100.0, 50.0, -20.0)) == \
+        ('G00 X110.0 Y45.0 Z-20.0 A400.0 B400.0 C400.0', False)
+    assert resolve_jog('J00 Z-10.0', (1.0, 2.0, 3.0)) == ('G00 X1.0 Y2.0 Z-7.0', False)
+
+
+def test_resolved_jog_stays_within_the_travel():
+    # X calibrated to 1200mm (6000 steps at 5 steps/mm), Y not calibrated
+    limits = fcode.Limits({55: 5, 56: 5, 141: 6000})
+    assert resolve_jog('J00 X500.0 Y5000.0 Z0.0', (1000.0, 0.0, 0.0), limits) == ('G00 X1200.0 Y5000.0 Z0.0', True)
+    assert resolve_jog('J00 X-500.0 Y0.0 Z0.0', (-1000.0, 0.0, 0.0), limits) == ('G00 X-1200.0 Y0.0 Z0.0', True)
+    assert resolve_jog('J00 X100.0 Y0.0 Z0.0', (1000.0, 0.0, 0.0), limits) == ('G00 X1100.0 Y0.0 Z0.0', False)
+
+
+def test_limits_follow_the_parameters():
+    params = ParamTracker(limits=fcode.Limits())
+    params.observe_value(141, 6000)
+    params.observe_command('F22 P55 V10')
+    # 6000 steps at 10 steps/mm
+    assert resolve_jog('J00 X800.0 Y0.0 Z0.0', (0.0, 0.0, 0.0), params.limits_) == ('G00 X600.0 Y0.0 Z0.0', True)
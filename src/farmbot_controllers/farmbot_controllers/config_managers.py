@@ -2,12 +2,11 @@ import rclpy
 from rclpy.node import Node
 from farmbot_interfaces.msg import MapCommand
 from ament_index_python.packages import get_package_share_directory
-from std_msgs.msg import String
-from farmbot_interfaces.msg import ParameterCommand
+from std_msgs.msg import Empty
+from farmbot_interfaces.msg import ParameterCommand, ParamReport
 from farmbot_interfaces.srv import ParameterConfig, StringRepReq
 
 import os
-import time
 import yaml
 from farmbot_controllers.param_info import ParameterList
 
@@ -50,12 +49,14 @@ class ConfigServer(Node):
         self.config_server_ = self.create_service(ParameterConfig, 'manage_param_config', self.config_request_server)
         self.config_loading_server_ = self.create_service(StringRepReq, 'load_param_config', self.param_loading_server)
 
-        # Parameter Command publisher (Used for loading up parameters)
+        # Parameter Command publisher (Used for loading up parameters). The depth covers a full
+        # parameter upload, which is published as one burst and pipelined by the UART controller
         self.param_cmd_ = ParameterCommand()
-        self.param_cmd_pub_ = self.create_publisher(ParameterCommand, 'parameter_command', 10)
+        self.param_cmd_pub_ = self.create_publisher(ParameterCommand, 'parameter_command', 200)
 
-        # UART Rx Subscriber
-        self.uart_rx_sub_ = self.create_subscription(String, 'uart_receive', self.uart_rx_callback, 10)
+        # Farmduino report Subscribers (parameter values and startup)
+        self.param_report_sub_ = self.create_subscription(ParamReport, 'report/param', self.param_report_callback, 200)
+        self.startup_sub_ = self.create_subscription(Empty, 'report/startup', self.startup_callback, 10)
 
         # Map updating publisher
         self.map_cmd_ = MapCommand()
@@ -64,19 +65,21 @@ class ConfigServer(Node):
         # Log the initialization
         self.get_logger().info('Config Server Initialized..')
 
-    def uart_rx_callback(self, msg: String):
+    def startup_callback(self, msg: Empty):
         '''
-        Subscriber to the Serial Response from the Farmduino.
-        Checks for parameter value updates and for when the farmduino startup completes 
+        Subscriber to the startup report of the Farmduino (R99 ARDUINO STARTUP COMPLETE).
+        The active configuration is loaded once the firmware is initialized
         '''
-        msg_split = (msg.data).split(' ')
-        reportCode = msg_split[0]
-        if msg.data == 'R99 ARDUINO STARTUP COMPLETE' and not self.firmware_init_done_:
+        if not self.firmware_init_done_:
             self.firmware_init_done_ = True
             self.retrieve_config()
-        if reportCode == 'R21' or reportCode == 'R23':
-            self.__set_value(int(float(msg_split[1][1:])), int(float(msg_split[2][1:])))
-            self.get_logger().info(f'Updated parameter {msg_split[1]} to {msg_split[2]}')
+
+    def param_report_callback(self, msg: ParamReport):
+        '''
+        Subscriber to the parameter values reported by the Farmduino (R21/R23)
+        '''
+        self.__set_value(msg.param, msg.value)
+        self.get_logger().info(f'Updated parameter P{msg.param} to V{msg.value}')
 
     def retrieve_config(self):
         '''
@@ -133,7 +136,6 @@ class ConfigServer(Node):
                     self.param_cmd_.param = key
                     self.param_cmd_.value = value
                     self.param_cmd_pub_.publish(self.param_cmd_)
-                    time.sleep(0.1)
 
         self.get_logger().info('Parameter loading complete!')
 
@@ -1,25 +1,43 @@
 from rclpy.node import Node
-from farmbot_interfaces.msg import PinCommand, I2CCommand, ServoCommand
-from std_msgs.msg import Int64MultiArray
+from farmbot_command_handler import fcode
+from farmbot_command_handler.uart_transmitter import UARTTransmitter
 
 class DeviceControl:
     '''
     ROS2 Python Module that enables the control of the different devices
-    that are connected to the Farmbot
+    that are connected to the Farmbot. The commands are encoded in-process
+    and sent straight to the UART controller
     '''
-    def __init__(self, node: Node):
+    def __init__(self, node: Node, uart: UARTTransmitter = None):
+        '''
+        Module constructor
+
+        Args:
+            node {Node}: the node the module extends
+            uart {UARTTransmitter}: the transmitter shared by the modules of the node. Created if None
+        '''
         self.node_ = node
-        # Variables used to store the device commands
-        self.pin_cmd_ = PinCommand()
-        self.water_cmd_ = Int64MultiArray()
-        self.i2c_cmd_ = I2CCommand()
-        self.servo_cmd_ = ServoCommand()
-
-        # Publishers for the command types
-        self.pin_pub_ = self.node_.create_publisher(PinCommand, 'pin_command', 10)
-        self.i2c_pub_ = self.node_.create_publisher(I2CCommand, 'i2c_command', 10)
-        self.water_pub_ = self.node_.create_publisher(Int64MultiArray, 'water_command', 10)
-        self.servo_pub_ = self.node_.create_publisher(ServoCommand, 'move_servo', 10)
+        self.uart_ = uart if uart is not None else UARTTransmitter(node)
+
+    def send(self, encode, *args):
+        '''
+        Encodes a device command and sends it, logging the commands that cannot be encoded
+
+        Args:
+            encode {function}: the fcode function encoding the command
+            args: its arguments
+
+        Returns:
+            True if the command was sent
+        '''
+        try:
+            line = encode(*args)
+        except fcode.FCodeError as e:
+            self.node_.get_logger().error(str(e))
+            return False
+        self.uart_.send(line)
+        self.node_.get_logger().info(line)
+        return True
 
     ## I2C Control Handlers
     
@@ -27,13 +45,13 @@ class DeviceControl:
         '''
         Reading from an I2C device
         '''
-        self.i2c_handler(self, mode = False, pin = pin, element = element, value = 0)
+        self.i2c_handler(mode = False, pin = pin, element = element, value = 0)
 
     def i2c_set(self, pin: int, element: int, value: int):
         '''
         Setting a value to an I2C device
         '''
-        self.i2c_handler(self, mode = True, pin = pin, element = element, value = value)
+        self.i2c_handler(mode = True, pin = pin, element = element, value = value)
 
     def i2c_handler(self, mode: bool, element: int, pin: int, value: int):
         '''
@@ -45,13 +63,10 @@ class DeviceControl:
             e {int}: Element in tool mount
             v {int}: Value number
         '''
-        
-        self.i2c_cmd_.mode = mode
-        self.i2c_cmd_.e = element
-        self.i2c_cmd_.p = pin
-        self.i2c_cmd_.v = value
-
-        self.i2c_pub_.publish(self.i2c_cmd_)
+        if mode:
+            self.send(fcode.i2c_set, element, pin, value)
+        else:
+            self.send(fcode.i2c_read, element, pin)
 
     ## Water Control Handlers
     ## NOTE: The documentation mentions that the commands are not implemented. Need to invesigate
@@ -67,9 +82,7 @@ class DeviceControl:
             unit {int}: The amount of time (in time based watering) in millisec. or the pulse
                         count of the flow meter.
         '''
-
-        self.water_cmd_.data = [int(mode), unit]
-        self.water_pub_.publish(self.water_cmd_)
+        self.send(fcode.water, int(mode), unit)
 
     ## Pin Control Handlers
 
@@ -82,7 +95,7 @@ class DeviceControl:
             value {int}: Value to set
             pin_mode {bool}: 0 for digital, 1 for analog
         '''
-        self.manipulate_pin(mode = True, set_value1 = True, pin = pin, value1 = value, pin_mode = pin_mode)
+        return self.manipulate_pin(mode = True, set_value1 = True, pin = pin, value1 = value, pin_mode = pin_mode)
         
     def set_pin_value_2(self, pin: int, value1: int, delay: int, value2: int, pin_mode: bool):
         '''
@@ -97,8 +110,8 @@ class DeviceControl:
             value2 {int}: Second value to set
             pin_mode {bool}: 0 for digital, 1 for analog
         '''
-        self.manipulate_pin(mode = True, set_value2 = True, pin = pin, value1 = value1,
-                            delay = delay, value2 = value2, pin_mode = pin_mode)
+        return self.manipulate_pin(mode = True, set_value2 = True, pin = pin, value1 = value1,
+                                   delay = delay, value2 = value2, pin_mode = pin_mode)
 
     def read_pin(self, pin: int, pin_mode: bool):
         '''
@@ -108,7 +121,7 @@ class DeviceControl:
             pin {int}: The pin to read the value from
             pin_mode{bool}: 0 for digital, 1 for analog
         '''
-        self.manipulate_pin(mode = False, pin = pin, pin_mode = pin_mode)
+        return self.manipulate_pin(mode = False, pin = pin, pin_mode = pin_mode)
 
     def set_pin_io(self, pin: int, io_mode: bool):
         '''
@@ -136,21 +149,19 @@ class DeviceControl:
             value2{int}: a second value to set on the pin after a delay
             delay{int}: time delay in millis
             pin_mode{bool}: (0-digital / 1-analog) OR (0-input / 1-output)
+
+        Returns:
+            True if the command was sent
         '''
-        
-        self.pin_cmd_.mode = mode
-        self.pin_cmd_.set_io = set_io
-        self.pin_cmd_.set_value = set_value1
-        self.pin_cmd_.set_value2 = set_value2
-        self.pin_cmd_.pin = pin
-        self.pin_cmd_.value = value1
-        self.pin_cmd_.value2 = value2
-        self.pin_cmd_.delay = delay
-        self.pin_cmd_.pin_mode = pin_mode
-
-        self.pin_pub_.publish(self.pin_cmd_)
+        if not mode:
+            return self.send(fcode.pin_read, pin, pin_mode)
+        elif set_io:
+            return self.send(fcode.pin_io, pin, pin_mode)
+        elif set_value1:
+            return self.send(fcode.pin_write, pin, value1, pin_mode)
+        elif set_value2:
+            return self.send(fcode.pin_write2, pin, value1, value2, delay, pin_mode)
+        return False
 
     def move_servo(self, pin: int, angle: float):
-        self.servo_cmd_.pin = pin
-        self.servo_cmd_.ang = angle
-        self.servo_pub_.publish(self.servo_cmd_)
+        return self.send(fcode.servo, pin, angle)
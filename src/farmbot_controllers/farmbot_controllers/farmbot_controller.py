@@ -1,30 +1,58 @@
 #!/usr/bin/env python3
 import rclpy
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup, ReentrantCallbackGroup
+from rclpy.executors import MultiThreadedExecutor
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, DurabilityPolicy
 from std_msgs.msg import String
-from farmbot_interfaces.msg import PlantManage
+from farmbot_interfaces.msg import PlantManage, PositionReport
 from farmbot_interfaces.srv import ParameterConfig, StringRepReq
+from farmbot_command_handler.uart_transmitter import UARTTransmitter
 
 # Modules
 from farmbot_controllers.sequencer import Sequencer
 from farmbot_controllers.movement import Movement
+from farmbot_controllers.jogging import ContinuousJog
 from farmbot_controllers.states import State
 from farmbot_controllers.devices import DeviceControl
 from farmbot_controllers.parameters import Parameters
+from farmbot_controllers.service_clients import ServiceClientPool
 
 class FarmbotControl(Node):
     # Node contructor
     def __init__(self):
         super().__init__('FarmbotController')
 
+        # The node runs on a multi-threaded executor. The callback groups keep the
+        # operator commands (e.g. the electronic stop) and the position feedback
+        # responsive while sequencing callbacks run or service responses are handled:
+        # - control: the operator commands, the position feedback and the jog dead man
+        #   timer. One group, as they all drive the continuous jog
+        # - sequencing: the busy state, the sequences, the pin reports and the sequencing timers
+        # - services: the service clients, whose responses can be handled in parallel
+        self.declare_parameter('executor_threads', 4)
+        self.control_group_ = MutuallyExclusiveCallbackGroup()
+        self.sequencing_group_ = MutuallyExclusiveCallbackGroup()
+        self.services_group_ = ReentrantCallbackGroup()
+
+        # The modules encode their commands in-process and send them through one transmitter,
+        # so the commands reach the UART controller in the order they were issued
+        self.uart_ = UARTTransmitter(self)
+        # Service clients shared by the node and its modules, so no callback waits for a server
+        self.services_ = ServiceClientPool(self, self.services_group_)
+        self.services_.add(StringRepReq, 'load_param_config')
+        self.services_.add(ParameterConfig, 'manage_param_config')
         # Initializing movemement module
-        self.mvm_ = Movement(self)
+        self.mvm_ = Movement(self, self.uart_)
+        # Initializing the continuous jogging module
+        self.jog_ = ContinuousJog(self, (self.mvm_.X_MAX_SPEED, self.mvm_.Y_MAX_SPEED, self.mvm_.Z_MAX_SPEED), self.uart_,
+                                  self.control_group_)
         # Initializing the state module
-        self.state_ = State(self)
+        self.state_ = State(self, self.uart_)
         # Initializing the devices and peripherals modules
-        self.devices_ = DeviceControl(self)
+        self.devices_ = DeviceControl(self, self.uart_)
         # Initializing the tool module
-        self.tools_ = Sequencer(self, self.mvm_, self.devices_)
+        self.tools_ = Sequencer(self, self.mvm_, self.devices_, self.services_, self.sequencing_group_)
         # Initializing the parameter manipulator
         self.params_ = Parameters(self)
 
@@ -35,10 +63,13 @@ class FarmbotControl(Node):
 
         # Temporary Keyboard subscriber
         self.cur_increment_ = 10.0
-        self.input_sub_ = self.create_subscription(String, 'input_topic', self.cmd_interp_callback, 10)
+        self.input_sub_ = self.create_subscription(String, 'input_topic', self.cmd_interp_callback, 10,
+                                                   callback_group = self.control_group_)
 
-        # UART Rx Subscriber
-        self.uart_rx_sub_ = self.create_subscription(String, 'uart_receive', self.uart_feedback_callback, 10)
+        # Position Subscriber (latest position, decimated by the UART controller)
+        self.position_sub_ = self.create_subscription(PositionReport, 'position', self.position_callback,
+                                                      QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL),
+                                                      callback_group = self.control_group_)
 
         # Map publishers
         self.plant_conf_ = PlantManage()
@@ -55,20 +86,26 @@ class FarmbotControl(Node):
             case 'e':
                 self.get_logger().info('CLEARING SEQUENCE')
                 self.tools_.clear_sequence()
+            ## Resume the sequence stopped by the last electronic stop or restart
+            case 'R': # R, or R H to home the gantry first
+                self.tools_.resume(home = len(code) > 1 and code[1] == 'H')
             ## Movement Commands
             case 'M':
                 if len(code) != 4:
                     self.get_logger().warning("You need to include all 3 coordinates! Command ignored!")
                 else:
-                    self.mvm_.move_gantry_abs(x_coord = float(code[1]), y_coord = float(code[2]), z_coord = float(code[3]))
+                    self.mvm_.move_gantry_abs(x_coord = float(code[1]), y_coord = float(code[2]), z_coord = float(code[3]),
+                                              interactive = True)
             case 'w' | 's':
-                self.mvm_.move_gantry_abs(x_coord = self.cur_x_ + (self.cur_increment_ * (-1 if code[0] == 's' else 1)),
-                                          y_coord = self.cur_y_,
-                                          z_coord = self.cur_z_)
+                # Relative jogs, so repeated presses add up even before the position is reported
+                self.mvm_.move_gantry_rel(x_incr = self.cur_increment_ * (-1 if code[0] == 's' else 1),
+                                          y_incr = 0.0, z_incr = 0.0)
             case 'a' | 'd':
-                self.mvm_.move_gantry_abs(x_coord = self.cur_x_,
-                                          y_coord = self.cur_y_ + self.cur_increment_ * (-1 if code[0] == 'a' else 1),
-                                          z_coord = self.cur_z_)
+                self.mvm_.move_gantry_rel(x_incr = 0.0,
+                                          y_incr = self.cur_increment_ * (-1 if code[0] == 'a' else 1),
+                                          z_incr = 0.0)
+            case 'JOG': # e.g. JOG X + (repeated while held), JOG STOP on release
+                self.jog_.command(code[1:])
             case '1':
                 self.cur_increment_ = 10.0
             case '2':
@@ -203,25 +240,20 @@ class FarmbotControl(Node):
 
     ## UART Handling Callback
     
-    def uart_feedback_callback(self, msg: String):
+    def position_callback(self, msg: PositionReport):
         '''
-        Takes the feedback from the Serial Receiver and updates
+        Takes the position reported by the Farmduino (R82) and updates
         information accordingly 
         '''
-        msgSplit = (msg.data).split(' ')
-        reportCode = msgSplit[0]
+        self.cur_x_ = msg.x
+        self.cur_y_ = msg.y
+        self.cur_z_ = msg.z
+        self.jog_.update_position(msg.x, msg.y, msg.z)
 
-        if reportCode == 'R82':
-            self.cur_x_ = float(msgSplit[1][1:])
-            self.cur_y_ = float(msgSplit[2][1:])
-            self.cur_z_ = float(msgSplit[3][1:])
-            
-            # Update the position reference within the sequencing module
-            self.tools_.x = self.cur_x_
-            self.tools_.y = self.cur_y_
-            self.tools_.z = self.cur_z_
-        elif reportCode == 'R41':
-            self.tools_.uart_message(msg.data)
+        # Update the position reference within the sequencing module
+        self.tools_.x = self.cur_x_
+        self.tools_.y = self.cur_y_
+        self.tools_.z = self.cur_z_
     
     ## Parameter Manager Clients and Future Callbacks
 
@@ -241,15 +273,10 @@ class FarmbotControl(Node):
             return
         
 
-        client = self.create_client(StringRepReq, 'load_param_config')
-        while not client.wait_for_service(1.0):
-            self.get_logger().warn('Waiting for Parameter Loading Server...')
-        
         request = StringRepReq.Request()
         request.data = ver
 
-        future = client.call_async(request = request)
-        future.add_done_callback(self.config_loading_callback)
+        self.services_.call(StringRepReq, 'load_param_config', request, self.config_loading_callback)
 
     def config_loading_callback(self, future):
         '''
@@ -268,15 +295,10 @@ class FarmbotControl(Node):
         Parameter Configuration Client
         Requests a response from the Parameter Manager Server
         '''
-        client = self.create_client(ParameterConfig, 'manage_param_config')
-        while not client.wait_for_service(1.0):
-            self.get_logger().warn('Waiting for Parameter Config Server...')
-
         request = ParameterConfig.Request()
         request.data = cmd
 
-        future = client.call_async(request = request)
-        future.add_done_callback(self.param_config_callback)
+        self.services_.call(ParameterConfig, 'manage_param_config', request, self.param_config_callback)
 
     def param_config_callback(self, future):
         '''
@@ -303,11 +325,16 @@ def main(args = None):
     rclpy.init(args = args)
 
     main_ctrl_node = FarmbotControl()
-    
+    executor = MultiThreadedExecutor(
+        num_threads = main_ctrl_node.get_parameter('executor_threads').get_parameter_value().integer_value)
+    executor.add_node(main_ctrl_node)
+
     try:
-        rclpy.spin(main_ctrl_node)
+        executor.spin()
     except KeyboardInterrupt:
-        main_ctrl_node.destroy_node()
+        pass
+
+    executor.shutdown()
 
     main_ctrl_node.destroy_node()
     rclpy.shutdown()
@@ -0,0 +1,181 @@
+import time
+from rclpy.callback_groups import CallbackGroup
+from rclpy.node import Node
+from farmbot_command_handler import fcode
+from farmbot_command_handler.uart_transmitter import UARTTransmitter
+
+# Jog directions per axis letter
+AXES = {'X': 0, 'Y': 1, 'Z': 2}
+
+
+class ContinuousJog:
+    '''
+    Continuous jogging module that extends the farmbot controller node.
+
+    While a direction is held (the client repeats 'JOG <axis> <+|->' at least every
+    'jog_timeout' seconds), the gantry moves towards a target kept 'jog_lead' mm ahead
+    of it: once it got within half of the lead, the target is streamed further with an
+    interactive abort of the running move followed by a relative move of the lead (J00).
+    The UART controller dispatches it as soon as the aborted move reports it stopped,
+    rather than after the move ran to its end, as a G00 from the position the gantry
+    stopped at, clamped to the reach of the axis (the other axes stay where they are). A change of direction or the release ('JOG STOP')
+    aborts the jog, which stops the gantry right away without touching the queued jobs.
+    If the client stops refreshing (e.g. it crashed), the jog is stopped.
+
+    The retargets and the aborts are sent straight to the interactive UART class,
+    skipping the motor command handler hop. The key to motion latency (command
+    received -> first reported movement) is measured against 'jog_latency_budget'.
+    '''
+    def __init__(self, node: Node, speeds: tuple, uart: UARTTransmitter = None, callback_group: CallbackGroup = None):
+        '''
+        Module constructor
+
+        Args:
+            node {Node}: the node the module extends
+            speeds {tuple}: the maximum (x, y, z) travel speeds of the jogs
+            uart {UARTTransmitter}: the transmitter shared by the modules of the node. Created if None
+            callback_group {CallbackGroup}: the group of the dead man timer. It has to exclude the
+                callbacks feeding the module (commands, position). The default group of the node if None
+        '''
+        self.node_ = node
+        self.speeds_ = speeds
+        self.uart_ = uart if uart is not None else UARTTransmitter(node)
+
+        node.declare_parameter('jog_lead', 100.0)
+        node.declare_parameter('jog_timeout', 1.0)
+        node.declare_parameter('jog_latency_budget', 0.3)
+        self.lead_ = node.get_parameter('jog_lead').get_parameter_value().double_value
+        self.timeout_ = node.get_parameter('jog_timeout').get_parameter_value().double_value
+        self.budget_ = node.get_parameter('jog_latency_budget').get_parameter_value().double_value
+
+        # Jog in progress: axis index, direction (+1/-1), target along the axis and the last refresh
+        self.axis_ = None
+        self.direction_ = 0
+        self.target_ = 0.0
+        self.refreshed_ = 0.0
+        # Key to motion latency of the jog in progress and of the past jogs
+        self.started_ = 0.0
+        self.start_position_ = 0.0
+        self.latencies_ = []
+        self.over_budget_ = 0
+
+        self.position_ = [0.0, 0.0, 0.0]
+        self.deadman_timer_ = node.create_timer(0.1, self.check_refresh, callback_group = callback_group)
+        self.deadman_timer_.cancel()
+
+    @property
+    def jogging(self) -> bool:
+        return self.axis_ is not None
+
+    def command(self, args: list):
+        '''
+        Handles a jog command from the input topic: ['X', '+'], ['Y', '-'] or ['STOP']
+
+        Args:
+            args {list}: the command arguments following 'JOG'
+        '''
+        if not args or args[0] == 'STOP':
+            self.stop()
+        elif args[0] in AXES and len(args) > 1 and args[1] in ('+', '-'):
+            self.start(AXES[args[0]], 1 if args[1] == '+' else -1)
+        else:
+            self.node_.get_logger().warning("Jog commands are 'JOG <X|Y|Z> <+|->' or 'JOG STOP'. Command ignored")
+
+    def start(self, axis: int, direction: int):
+        '''
+        Starts a jog, or keeps the one in progress going if it is in the same direction
+
+        Args:
+            axis {int}: 0 for X, 1 for Y and 2 for Z
+            direction {int}: 1 or -1
+        '''
+        self.refreshed_ = time.monotonic()
+        if self.axis_ == axis and self.direction_ == direction:
+            return
+        moving = self.jogging
+
+        self.axis_ = axis
+        self.direction_ = direction
+        self.started_ = self.refreshed_
+        self.start_position_ = self.position_[axis]
+        self.target_ = self.position_[axis]
+        self.retarget(abort = moving)
+        self.deadman_timer_.reset()
+
+    def stop(self):
+        '''
+        Stops the jog in progress right away
+        '''
+        if not self.jogging:
+            return
+        self.send(fcode.ABORT)
+        self.axis_ = None
+        self.direction_ = 0
+        self.deadman_timer_.cancel()
+        self.node_.get_logger().info(f'Jog stopped, {self.summary()}')
+
+    def retarget(self, abort: bool = True):
+        '''
+        Moves the target of the jog 'jog_lead' mm ahead of the gantry. Nothing is sent
+        once the target reached the end of the axis
+
+        Args:
+            abort {bool}: abort the running move of the jog first
+        '''
+        position = list(self.position_)
+        position[self.axis_] += self.lead_ * self.direction_
+        target = self.uart_.limits_.clamp(*position)[self.axis_]
+        if abort and target == self.target_:
+            return
+        increments = [0.0, 0.0, 0.0]
+        increments[self.axis_] = self.lead_ * self.direction_
+        try:
+            line = fcode.move(*increments, *self.speeds_, relative = True, limits = self.uart_.limits_)
+        except fcode.FCodeError as e:
+            self.node_.get_logger().error(f'Jog stopped. {e}')
+            self.stop()
+            return
+        if abort:
+            self.send(fcode.ABORT)
+        self.target_ = target
+        self.send(line)
+
+    def send(self, line: str):
+        self.uart_.send(line, interactive = True)
+
+    def update_position(self, x: float, y: float, z: float):
+        '''
+        Follows the reported position: measures the key to motion latency and streams
+        the target further once the gantry got within half of the lead of it
+        '''
+        self.position_ = [x, y, z]
+        if not self.jogging:
+            return
+
+        if self.started_ and self.position_[self.axis_] != self.start_position_:
+            latency, self.started_ = time.monotonic() - self.started_, 0.0
+            self.latencies_ = (self.latencies_ + [latency])[-100:]
+            if latency > self.budget_:
+                self.over_budget_ += 1
+                self.node_.get_logger().warning(f'Jog started moving after {latency * 1000.0:.0f}ms '
+                                                f'(budget {self.budget_ * 1000.0:.0f}ms)')
+
+        if (self.target_ - self.position_[self.axis_]) * self.direction_ < self.lead_ / 2.0:
+            self.retarget()
+
+    def check_refresh(self):
+        '''
+        Timer callback stopping a jog that is no longer refreshed by the client
+        '''
+        if self.jogging and time.monotonic() - self.refreshed_ > self.timeout_:
+            self.node_.get_logger().warning(f'Jog not refreshed for {self.timeout_}s, stopping')
+            self.stop()
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the key to motion latency (ms)
+        '''
+        if not self.latencies_:
+            return 'jog_latency_ms[n=0]'
+        return (f'jog_latency_ms[n={len(self.latencies_)} mean={sum(self.latencies_) / len(self.latencies_) * 1000.0:.0f} '
+                f'max={max(self.latencies_) * 1000.0:.0f} over_budget={self.over_budget_}]')
@@ -1,12 +1,30 @@
 #!/usr/bin/env python3
+import select
+import sys
+import termios
+import time
+import tty
 import rclpy
 from rclpy.node import Node
 from std_msgs.msg import String
 
+# Continuous jog keys (raw terminal mode) and the jog they hold
+JOG_KEYS = {'w': 'X +', 's': 'X -', 'd': 'Y +', 'a': 'Y -', 'r': 'Z +', 'f': 'Z -'}
+# A terminal only reports the key repeats, not the releases. The first repeat comes after the
+# auto-repeat delay, the next ones at the auto-repeat rate
+FIRST_REPEAT_TIMEOUT = 0.6
+REPEAT_TIMEOUT = 0.15
+
+
 class KeyboardTeleOp(Node):
     '''
     Node used for recording keyboard commands and sending them forward to the
     farmbot controller for interpretation and execution
+
+    With the 'continuous_jog' parameter, the terminal is read in raw mode instead:
+    holding w/s (X), a/d (Y) or r/f (Z) jogs the gantry for as long as the key is held
+    ('JOG <axis> <+|->' on every key repeat), and the jog is stopped ('JOG STOP') as
+    soon as the repeats stop, or with the space bar. q leaves the node.
     '''
     
     # Node contructor
@@ -16,6 +34,8 @@ class KeyboardTeleOp(Node):
         # Keyboard publisher
         self.cmd_ = String()
         self.input_pub_ = self.create_publisher(String, 'keyboard_topic', 10)
+        self.declare_parameter('continuous_jog', False)
+        self.continuous_jog_ = self.get_parameter('continuous_jog').get_parameter_value().bool_value
 
         # Log the initialization
         self.get_logger().info('Keyboard Controller Initialized..')
@@ -43,7 +63,7 @@ class KeyboardTeleOp(Node):
                      'D_W_1', 'D_W_0', 'D_V_1', 'D_V_0',
                      'H_0', 'H_1', 'D_S_C', 'P4_0', 'P4_1')
         compound_cmds = ('C_0', 'P_1', 'P_2', 'C_1', 'C_2', 'T_1_0', 'T_2_0', 'T_3_0',
-                         'T_4_0', 'T_5_0', 'T_6_0', 'S_1_0', 'S_2_0', 'S_3_0', 'M', 'CONF', 'H_2', 'M_S')
+                         'T_4_0', 'T_5_0', 'T_6_0', 'S_1_0', 'S_2_0', 'S_3_0', 'M', 'CONF', 'H_2', 'M_S', 'JOG', 'R')
         # Record the user input
         user_input = input('\nEnter command: ')
         
@@ -54,14 +74,55 @@ class KeyboardTeleOp(Node):
         else:
             print('Invalid input\n')
 
+    def jog_loop(self):
+        '''
+        Reads the keys from the raw terminal and streams the continuous jog commands
+        until q is pressed
+        '''
+        print('Continuous jog: hold w/s (X), a/d (Y), r/f (Z). Space stops, q quits')
+        jog = None
+        last_key = 0.0
+        repeats = 0
+        settings = termios.tcgetattr(sys.stdin)
+        try:
+            tty.setcbreak(sys.stdin.fileno())
+            while rclpy.ok():
+                ready, _, _ = select.select([sys.stdin], [], [], 0.02)
+                now = time.monotonic()
+                key = sys.stdin.read(1) if ready else None
+
+                if key == 'q':
+                    break
+                if key in JOG_KEYS:
+                    repeats = repeats + 1 if JOG_KEYS[key] == jog else 0
+                    jog = JOG_KEYS[key]
+                    last_key = now
+                    self.send_jog(jog)
+                elif jog is not None and (key == ' ' or
+                                          now - last_key > (REPEAT_TIMEOUT if repeats else FIRST_REPEAT_TIMEOUT)):
+                    # Released (no more repeats) or stopped
+                    jog = None
+                    self.send_jog('STOP')
+        finally:
+            if jog is not None:
+                self.send_jog('STOP')
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, settings)
+
+    def send_jog(self, jog: str):
+        self.cmd_.data = f'JOG {jog}'
+        self.input_pub_.publish(self.cmd_)
+
 def main(args = None):
     rclpy.init(args = args)
 
     keyboard_node = KeyboardTeleOp()
     
     try:
-        while rclpy.ok():
-            keyboard_node.check_input()
+        if keyboard_node.continuous_jog_:
+            keyboard_node.jog_loop()
+        else:
+            while rclpy.ok():
+                keyboard_node.check_input()
     except KeyboardInterrupt:
         pass
     finally:
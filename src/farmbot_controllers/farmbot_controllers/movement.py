@@ -1,29 +1,32 @@
 from rclpy.node import Node
-from farmbot_interfaces.msg import GantryCommand, HomeCommand
+from farmbot_command_handler import fcode
+from farmbot_command_handler.uart_transmitter import UARTTransmitter
 
 class Movement:
     '''
-    Movement module that extends the farmbot controller node
+    Movement module that extends the farmbot controller node. The commands are
+    encoded in-process and sent straight to the UART controller
     '''
-    def __init__(self, node: Node):
+    def __init__(self, node: Node, uart: UARTTransmitter = None):
         '''
         Module constructor
 
         Args:
             node {Node}: the node the module extends
+            uart {UARTTransmitter}: the transmitter shared by the modules of the node, so their
+                                    commands reach the UART controller in order. Created if None
         '''
         self.node_ = node
+        self.uart_ = uart if uart is not None else UARTTransmitter(node)
+
+        # Moves out of the reach of the gantry are rejected, or brought back within it if set
+        node.declare_parameter('clamp_moves', False)
+        self.clamp_moves_ = node.get_parameter('clamp_moves').get_parameter_value().bool_value
 
         self.X_MAX_SPEED = 400.0
         self.Y_MAX_SPEED = 400.0
         self.Z_MAX_SPEED = 400.0
 
-        self.gantry_config_ = HomeCommand()    # Used for gantry configuration (homing, calibration)
-        self.move_gantry_ = GantryCommand()  # Used for moving the gantry along the 3 axis
-
-        self.gantry_mvm_pub_ = self.node_.create_publisher(GantryCommand, 'move_gantry', 10)
-        self.gantry_config_pub_ = self.node_.create_publisher(HomeCommand, 'home_handler', 10)
-
     ## Calibration and Homing Functions
 
     def go_home(self):
@@ -48,7 +51,7 @@ class Movement:
             y {Bool}: True if the X-Axis should have it's home position found. Defaults to False
             z {Bool}: True if the X-Axis should have it's home position found. Defaults to False
         '''
-        self.manip_mvm_config(x_axis = x, y_axis = y, z_axis = z)
+        return self.manip_mvm_config(x_axis = x, y_axis = y, z_axis = z)
 
     def calibrate_all_axis(self):
         '''
@@ -100,19 +103,21 @@ class Movement:
             x_axis {Bool}: Specifies wheather the command manipulates the X-Axis. Defaults to False
             y_axis {Bool}: Specifies wheather the command manipulates the Y-Axis. Defaults to False
             z_axis {Bool}: Specifies wheather the command manipulates the Z-Axis. Defaults to False
-        '''
-        self.gantry_config_.go_home = all_home
-        self.gantry_config_.current_pos_home = set_this_home
-        self.gantry_config_.calib = calibrate
-        self.gantry_config_.x = x_axis
-        self.gantry_config_.y = y_axis
-        self.gantry_config_.z = z_axis
 
-        self.gantry_config_pub_.publish(self.gantry_config_)
+        Returns:
+            True if the command was sent
+        '''
+        try:
+            self.uart_.send(fcode.home(go_home = all_home, current_pos_home = set_this_home, calib = calibrate,
+                                       x = x_axis, y = y_axis, z = z_axis))
+        except fcode.FCodeError as e:
+            self.node_.get_logger().error(str(e))
+            return False
+        return True
 
     ## Gantry Movement Functions
 
-    def move_gantry_abs(self, x_coord = float, y_coord = float, z_coord = float):
+    def move_gantry_abs(self, x_coord = float, y_coord = float, z_coord = float, interactive = False):
         '''
         Moves the Gantry at max speed to the desired coordinates
 
@@ -120,9 +125,25 @@ class Movement:
             x_coord {float}: Desired X-Coordinate to move to
             y_coord {float}: Desired Y-Coordinate to move to.
             z_coord {float}: Desired Z-Coordinate to move to.
+            interactive {bool}: True for operator moves (served before queued jobs). Defaults to False
+        '''
+        return self.move_gantry(x_coord = x_coord, y_coord = y_coord, z_coord = z_coord,\
+                                x_speed = 100.0, y_speed = 100.0, z_speed = 100.0, interactive = interactive)
+
+    def move_gantry_rel(self, x_incr = float, y_incr = float, z_incr = float, interactive = True):
         '''
-        self.move_gantry(x_coord = x_coord, y_coord = y_coord, z_coord = z_coord,\
-                        x_speed = 100.0, y_speed = 100.0, z_speed = 100.0)
+        Moves the Gantry at max speed by the desired increments, from the position the previous moves end at.
+        Queued increments are added together by the UART controller (e.g. when a jog key is pressed repeatedly)
+
+        Args:
+            x_incr {float}: Desired X-Axis increment
+            y_incr {float}: Desired Y-Axis increment
+            z_incr {float}: Desired Z-Axis increment
+            interactive {bool}: True for operator moves (served before queued jobs). Defaults to True
+        '''
+        self.manip_movement(mode = False, x_coord = x_incr, y_coord = y_incr, z_coord = z_incr,\
+                            x_speed = self.X_MAX_SPEED, y_speed = self.Y_MAX_SPEED, z_speed = self.Z_MAX_SPEED,\
+                            interactive = interactive, relative = True)
 
     def move_gantry_s(self, x_coord = float, y_coord = float, z_coord = float, speed = float):
         '''
@@ -136,7 +157,8 @@ class Movement:
         '''
         self.move_gantry(x_coord = x_coord, y_coord = y_coord, z_coord = z_coord, x_speed = speed, y_speed = speed, z_speed = speed)
     
-    def move_gantry(self, x_coord = float, y_coord = float, z_coord = float, x_speed = float, y_speed = float, z_speed = float):
+    def move_gantry(self, x_coord = float, y_coord = float, z_coord = float, x_speed = float, y_speed = float, z_speed = float,
+                    interactive = False):
         '''
         Moves the Gantry to the desired coordinates at the specified per axis speed
 
@@ -147,13 +169,16 @@ class Movement:
             x_speed {float}: Desired Speed for X-Axis in percent format (0 - lowest speed, 100 - highest speed)
             y_speed {float}: Desired Speed for Y-Axis in percent format (0 - lowest speed, 100 - highest speed)
             z_speed {float}: Desired Speed for Z-Axis in percent format (0 - lowest speed, 100 - highest speed)
+            interactive {bool}: True for operator moves (served before queued jobs). Defaults to False
         '''
-        self.manip_movement(mode = False, x_coord = x_coord, y_coord = y_coord, z_coord = z_coord,\
+        return self.manip_movement(mode = False, x_coord = x_coord, y_coord = y_coord, z_coord = z_coord,\
                                 x_speed = x_speed / 100.0 * self.X_MAX_SPEED,\
                                 y_speed = y_speed / 100.0 * self.Y_MAX_SPEED,\
-                                z_speed = z_speed / 100.0 * self.Z_MAX_SPEED)
+                                z_speed = z_speed / 100.0 * self.Z_MAX_SPEED,\
+                                interactive = interactive)
         
-    def manip_movement(self, mode = False, x_coord = float, y_coord = float, z_coord = float, x_speed = float, y_speed = float, z_speed = float):
+    def manip_movement(self, mode = False, x_coord = float, y_coord = float, z_coord = float, x_speed = float, y_speed = float, z_speed = float,
+                       interactive = False, relative = False):
         '''
         Creates the command that is to be handled and translated to the FarmBot specific commands for moving the gantry along the axis.
 
@@ -165,13 +190,44 @@ class Movement:
             x_speed {Int}: The speed used to reach the x coordinate
             y_speed {Int}: The speed used to reach the y coordinate
             z_speed {Int}: The speed used to reach the z coordinate
-        '''
-        self.move_gantry_.mode = mode
-        self.move_gantry_.x = x_coord
-        self.move_gantry_.y = y_coord
-        self.move_gantry_.z = z_coord
-        self.move_gantry_.a = x_speed
-        self.move_gantry_.b = y_speed
-        self.move_gantry_.c = z_speed
+            interactive {Bool}: True for operator moves, which are served before the queued jobs. Defaults to False
+            relative {Bool}: True if the coordinates are increments from the position the previous moves end at. Defaults to False
+
+        Returns:
+            True if the move was sent
+        '''
+        x, y, z = float(x_coord), float(y_coord), float(z_coord)
+        if self.clamp_moves_ and not relative:
+            x, y, z = self.uart_.limits_.clamp(x, y, z)
+            if (x, y, z) != (x_coord, y_coord, z_coord):
+                self.node_.get_logger().warning(f'Move to ({x_coord}, {y_coord}, {z_coord}) clamped to ({x}, {y}, {z})')
+        try:
+            self.uart_.send(fcode.move(x, y, z,
+                                       float(x_speed), float(y_speed), float(z_speed),
+                                       straight = mode, relative = relative, limits = self.uart_.limits_), interactive)
+        except fcode.FCodeError as e:
+            self.node_.get_logger().error(str(e))
+            return False
+        return True
+
+    def follow_path(self, waypoints: list, speed = 100.0, interactive = False) -> bool:
+        '''
+        Moves the Gantry through the waypoints, at the speed specified. The path is encoded
+        and checked as a whole, so nothing is sent if one of the waypoints is invalid
 
-        self.gantry_mvm_pub_.publish(self.move_gantry_)
\ No newline at end of file
+        Args:
+            waypoints {list}: the (x, y, z) coordinates to move through
+            speed {float}: Desired Speed for all the axis in percent format (0 - lowest speed, 100 - highest speed)
+            interactive {bool}: True for operator moves (served before queued jobs). Defaults to False
+
+        Returns:
+            True if the path was sent
+        '''
+        speeds = (speed / 100.0 * self.X_MAX_SPEED, speed / 100.0 * self.Y_MAX_SPEED, speed / 100.0 * self.Z_MAX_SPEED)
+        try:
+            lines = fcode.moves(waypoints, speeds, limits = self.uart_.limits_)
+        except fcode.FCodeError as e:
+            self.node_.get_logger().error(f'Path not sent. {e}')
+            return False
+        self.uart_.send_all(lines, interactive)
+        return True
\ No newline at end of file
@@ -0,0 +1,195 @@
+# Sequence compiler. Turns the text sequences of the low level sequencing commands
+# (see documentation/Low Level Sequencing Commands.md) into a list of instructions
+# once, when the sequence is accepted. Every line is parsed and checked upfront, so a
+# malformed line rejects the whole sequence with its line number instead of stopping
+# the job half way, and the sequencer executes an instruction without any string work.
+
+from farmbot_command_handler import fcode
+
+# Command types set by the type lines (e.g. CC_T_x_1)
+COMMAND_TYPES = ('CC', 'DC', 'SC', 'VC', 'TD')
+
+# Opcodes
+MOVE = 0            # args: x, y, z
+SERVO = 1           # args: pin, angle
+CHECK_TOOL = 2      # args: expected value of the tool verification pin (63)
+READ_SOIL = 3       # args: plant index
+VACUUM = 4          # args: state
+WATER_PULSES = 5    # args: pulse length (ms)
+P4_PULSES = 6       # args: pulse length (ms)
+CALIB = 7           # args: calibration command ('CALIB a')
+PANORAMA = 8        # args: none
+MOSAIC = 9          # args: image count
+MULTICAM_TAKE = 10  # args: none
+DELAY = 11          # args: delay (s)
+# Not in the sequence language, queued by the sequencer (e.g. when resuming a sequence)
+HOME = 12           # args: x, y, z (the axes to find the home of)
+
+
+class SequenceError(ValueError):
+    '''
+    Raised for a line of a sequence that cannot be executed
+    '''
+    def __init__(self, message: str, line: int):
+        super().__init__(message)
+        self.line = line
+
+
+class Instruction:
+    '''
+    A compiled step of a sequence
+    '''
+    __slots__ = ('op', 'args', 'line')
+
+    def __init__(self, op: int, args: tuple, line: int):
+        '''
+        Args:
+            op {int}: the opcode
+            args {tuple}: the typed operands of the opcode
+            line {int}: the line of the sequence (1-based) the instruction was compiled from.
+                0 for the instructions queued by the sequencer itself
+        '''
+        self.op = op
+        self.args = args
+        self.line = line
+
+
+def parse_int(value: str, name: str, bounds: tuple = None) -> int:
+    try:
+        result = int(value)
+    except ValueError:
+        raise fcode.FCodeError(f"{name} '{value}' is not an integer")
+    if bounds is not None:
+        fcode.check_range(name, result, bounds)
+    return result
+
+
+def parse_pulses(value: str) -> int:
+    pulses = parse_int(value, 'Pulse length')
+    if pulses < 0:
+        raise fcode.FCodeError(f'Negative pulse length {pulses}!')
+    return pulses
+
+
+class SequenceCompiler:
+    '''
+    Compiles the sequences sent to the sequencer. The command type carries over from
+    one accepted sequence to the next, as the sequences can be sent in several parts
+    '''
+    def __init__(self, limits: fcode.Limits = fcode.NO_LIMITS, speeds: tuple = (0.0, 0.0, 0.0), clamp: bool = False):
+        '''
+        Args:
+            limits {fcode.Limits}: the reach of the gantry the moves are checked against
+            speeds {tuple}: the (x, y, z) speeds the moves are sent at
+            clamp {bool}: clamp the moves to the reach of the gantry instead of rejecting them
+        '''
+        self.limits_ = limits
+        self.speeds_ = speeds
+        self.clamp_ = clamp
+        self.command_type_ = ''
+
+    def compile(self, sequence: list) -> list:
+        '''
+        Compiles the lines of a sequence
+
+        Args:
+            sequence {list}: the sequence lines
+
+        Returns:
+            The list of instructions. The header and empty lines and the zero delays or
+            pulses do not produce any
+
+        Raises:
+            SequenceError: for the first line that cannot be executed
+        '''
+        command_type = self.command_type_
+        instructions, moves = [], []
+        for number, line in enumerate(sequence, start = 1):
+            if line[:2] in COMMAND_TYPES:
+                command_type = line[:2]
+                continue
+            fields = line.split()
+            if not fields:
+                continue
+            if command_type == '':
+                raise SequenceError(f"line {number} '{line}': Command type not set", number)
+            try:
+                instruction = self.compile_line(command_type, fields, number)
+            except fcode.FCodeError as e:
+                raise SequenceError(f"line {number} '{line}': {e}", number)
+            except IndexError:
+                raise SequenceError(f"line {number} '{line}': Missing argument", number)
+            if instruction is None:
+                continue
+            if instruction.op == MOVE:
+                moves.append(instruction)
+            instructions.append(instruction)
+
+        # The moves are sent by move_gantry_abs, at the given speeds. When clamping, it
+        # clamps them (with a warning) as they are sent
+        waypoints = [self.limits_.clamp(*move.args) if self.clamp_ else move.args for move in moves]
+        try:
+            fcode.moves(waypoints, self.speeds_, limits = self.limits_)
+        except fcode.FCodeError as e:
+            number = moves[e.index].line
+            raise SequenceError(f"line {number} '{sequence[number - 1]}': {e}", number)
+
+        self.command_type_ = command_type
+        return instructions
+
+    def compile_line(self, command_type: str, fields: list, number: int) -> Instruction:
+        '''
+        Compiles a command information line of the given command type
+        '''
+        if command_type == 'CC':
+            if len(fields) < 3:
+                raise fcode.FCodeError('Expected the X Y Z coordinates')
+            try:
+                waypoint = (float(fields[0]), float(fields[1]), float(fields[2]))
+            except ValueError as e:
+                raise fcode.FCodeError(str(e))
+            return Instruction(MOVE, waypoint, number)
+
+        if command_type == 'SC':
+            pin = parse_int(fields[0], 'Servo pin')
+            try:
+                angle = float(fields[1])
+            except ValueError as e:
+                raise fcode.FCodeError(str(e))
+            fcode.servo(pin, angle)
+            return Instruction(SERVO, (pin, angle), number)
+
+        if command_type == 'TD':
+            if fields[0][:1] != 'T':
+                raise fcode.FCodeError("Expected a delay as 'Tn'")
+            ticks = parse_int(fields[0][1:], 'Delay')
+            if ticks < 0:
+                raise fcode.FCodeError(f'Negative delay {ticks}!')
+            return Instruction(DELAY, (float(ticks),), number) if ticks else None
+
+        code = fields[0]
+        if command_type == 'DC':
+            if code == 'CHECK':
+                return Instruction(CHECK_TOOL, (parse_int(fields[1], 'Tool state', fcode.DIGITAL_RANGE),), number)
+            if code == 'READSOIL':
+                return Instruction(READ_SOIL, (parse_int(fields[1], 'Plant index'),), number)
+            if code == 'Vacuum':
+                return Instruction(VACUUM, (parse_int(fields[1], 'Vacuum pump state', fcode.DIGITAL_RANGE),), number)
+            if code == 'WaterPulses':
+                pulses = parse_pulses(fields[1])
+                return Instruction(WATER_PULSES, (pulses,), number) if pulses else None
+            if code == 'P4_Pulses':
+                pulses = parse_pulses(fields[1])
+                return Instruction(P4_PULSES, (pulses,), number) if pulses else None
+            raise fcode.FCodeError(f"Unknown device command '{code}'")
+
+        # Vision commands
+        if code == 'CALIB':
+            return Instruction(CALIB, (' '.join(fields),), number)
+        if code == 'PAN':
+            return Instruction(PANORAMA, (), number)
+        if code == 'MOSAIC':
+            return Instruction(MOSAIC, (parse_int(fields[1], 'Image count'),), number)
+        if code == 'M_CAM_TAKE':
+            return Instruction(MULTICAM_TAKE, (), number)
+        raise fcode.FCodeError(f"Unknown vision command '{code}'")
@@ -0,0 +1,117 @@
+import json
+import os
+
+from farmbot_controllers.sequence_compiler import Instruction
+
+
+class SequenceJournal:
+    '''
+    Append-only journal of the sequence in progress, so a sequence stopped by an
+    electronic stop or a restart of the node can be resumed from the last confirmed
+    step instead of from the start.
+
+    The journal is a text file with one JSON record per line:
+        {"add": [[op, [args], line], ...]} -> instructions queued (see sequence_compiler)
+        {"done": n} -> the first n instructions of the job are done
+    A job starts with an empty journal and the journal is emptied once the job is done.
+    Every record is flushed to the disk before the call returns; a torn last record
+    (e.g. power loss while writing) is ignored when the journal is loaded.
+    '''
+    def __init__(self, path: str):
+        '''
+        Args:
+            path {str}: the journal file. Created with its directory if missing
+        '''
+        self.path_ = os.path.abspath(os.path.expanduser(path))
+        os.makedirs(os.path.dirname(self.path_), exist_ok = True)
+        self.file_ = None
+        # Instructions journaled for the current job and the number of them done
+        self.queued_ = 0
+        self.done_ = 0
+
+    def start(self, instructions: list):
+        '''
+        Starts a new job, dropping the previous one
+        '''
+        self.close()
+        self.file_ = open(self.path_, 'w')
+        self.queued_ = 0
+        self.done_ = 0
+        self.extend(instructions)
+
+    def extend(self, instructions: list):
+        '''
+        Journals the instructions queued behind the current job
+        '''
+        if self.file_ is None:
+            self.file_ = open(self.path_, 'a')
+        self.write({'add': [[i.op, list(i.args), i.line] for i in instructions]})
+        self.queued_ += len(instructions)
+
+    def confirm(self):
+        '''
+        Marks the next instruction of the job as done
+        '''
+        self.done_ += 1
+        self.write({'done': self.done_})
+
+    def finish(self):
+        '''
+        Ends the job: the journal is emptied, there is nothing left to resume
+        '''
+        self.close()
+        open(self.path_, 'w').close()
+        self.queued_ = 0
+        self.done_ = 0
+
+    def load(self) -> tuple:
+        '''
+        Loads the job of the journal (e.g. written before a restart) and continues it.
+        The journal is rewritten with the job, which drops a torn last record
+
+        Returns:
+            The instructions of the job and the number of them done
+        '''
+        instructions, done = [], 0
+        try:
+            with open(self.path_) as journal:
+                for record in journal:
+                    try:
+                        record = json.loads(record)
+                    except ValueError:
+                        break
+                    if 'add' in record:
+                        instructions.extend(Instruction(op, tuple(args), line) for op, args, line in record['add'])
+                    elif 'done' in record:
+                        done = record['done']
+        except FileNotFoundError:
+            pass
+
+        done = min(done, len(instructions))
+        if not instructions or done == len(instructions):
+            self.finish()
+            return [], 0
+        self.start(instructions)
+        if done:
+            self.done_ = done
+            self.write({'done': done})
+        return instructions, done
+
+    @property
+    def pending(self) -> int:
+        '''
+        Number of instructions of the job that are not done
+        '''
+        return self.queued_ - self.done_
+
+    def write(self, record: dict):
+        if self.file_ is None:
+            self.file_ = open(self.path_, 'a')
+        self.file_.write(json.dumps(record, separators = (',', ':')) + '\n')
+        self.file_.flush()
+        os.fsync(self.file_.fileno())
+
+    def close(self):
+        if self.file_ is not None:
+            self.file_.close()
+            self.file_ = None
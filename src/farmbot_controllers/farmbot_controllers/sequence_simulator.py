@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import os
+import sys
+import time
+import yaml
+
+from farmbot_command_handler.firmware_params import ParamTracker, DEFAULT_PARAMS, ACC_DEC, MIN_SPEED, STEP_PER_MM
+from farmbot_controllers import sequence_compiler as sc
+
+
+class Estimate:
+    '''
+    Estimated duration of a sequence: in total, per phase (the command type lines of
+    the sequence, e.g. CC_P_3_4) and per instruction
+    '''
+    def __init__(self):
+        self.total = 0.0
+        self.phases = {}
+        self.durations = []
+        self.distance = 0.0
+
+    def add(self, phase: str, duration: float):
+        self.total += duration
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+        self.durations.append(duration)
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the estimate
+        '''
+        return f'{self.total:.1f}s for {len(self.durations)} steps, {self.distance / 1000.0:.1f}m travelled'
+
+
+class SequenceSimulator:
+    '''
+    Dry-run of the sequences against a kinematic model of the gantry, estimating how
+    long they take to execute without running them.
+
+    Every axis moves independently (a move lasts as long as its slowest axis), from
+    the minimum speed up to its cruise speed over its acceleration steps and back down,
+    the speed growing linearly with the steps as in the firmware. The speeds, ramps
+    and steps per mm are the firmware parameters (55-57, 41-43, 61-63, 65-67, 71-73).
+    The other steps last their delay or pulse length plus the round trip of a command,
+    the vision steps a fixed time.
+    '''
+    def __init__(self, params: ParamTracker = None, speeds: tuple = (400.0, 400.0, 400.0),
+                 command_time: float = 0.05, camera_time: float = 1.0):
+        '''
+        Args:
+            params {ParamTracker}: the firmware parameters. The firmware defaults if None
+            speeds {tuple}: the (x, y, z) speed limits (steps/s) the sequencer sends the moves with
+            command_time {float}: the round trip (s) of a command to the Farmduino
+            camera_time {float}: the duration (s) of a vision step, until the picture is taken (processed in the background)
+        '''
+        self.params_ = params if params is not None else ParamTracker()
+        self.speeds_ = speeds
+        self.command_time_ = command_time
+        self.camera_time_ = camera_time
+
+    def axis_time(self, axis: int, distance: float, speed: float) -> float:
+        '''
+        Returns the time (s) an axis needs to travel a distance
+
+        Args:
+            axis {int}: 0 for X, 1 for Y and 2 for Z
+            distance {float}: the distance in mm
+            speed {float}: the cruise speed in mm/s
+        '''
+        if distance <= 0.0 or speed <= 0.0:
+            return 0.0
+        steps_per_mm = max(self.params_.get(STEP_PER_MM[axis], 1), 1)
+        full_ramp = self.params_.get(ACC_DEC[axis], 0) / steps_per_mm
+        start_speed = max(self.params_.get(MIN_SPEED[axis], 0), 1) / steps_per_mm
+        if full_ramp <= 0.0 or start_speed >= speed:
+            return distance / speed
+
+        # Short moves decelerate before reaching the cruise speed
+        ramp = min(full_ramp, distance / 2.0)
+        peak = start_speed + (speed - start_speed) * ramp / full_ramp
+        # With the speed linear in the distance, a ramp lasts ramp * ln(peak / start) / (peak - start)
+        ramp_time = ramp * math.log(peak / start_speed) / (peak - start_speed)
+        return 2.0 * ramp_time + (distance - 2.0 * ramp) / peak
+
+    def move_time(self, start: tuple, target: tuple, homing: bool = False) -> float:
+        '''
+        Returns the time (s) of a move, the time of its slowest axis
+        '''
+        return max(self.axis_time(axis, abs(target[axis] - start[axis]),
+                                  self.params_.axis_speed(axis, None if homing else self.speeds_[axis], homing = homing))
+                   for axis in range(3))
+
+    def simulate(self, instructions: list, start: tuple = (0.0, 0.0, 0.0), phases: list = None) -> Estimate:
+        '''
+        Estimates the duration of compiled instructions (see sequence_compiler)
+
+        Args:
+            instructions {list}: the instructions
+            start {tuple}: the (x, y, z) position of the gantry at the start
+            phases {list}: the phase of every instruction. All in one phase if None
+
+        Returns:
+            The estimate
+        '''
+        estimate = Estimate()
+        position = tuple(start)
+        for index, instruction in enumerate(instructions):
+            op, args = instruction.op, instruction.args
+            duration = self.command_time_
+            if op == sc.MOVE:
+                duration += self.move_time(position, args)
+                estimate.distance += math.dist(position, args)
+                position = args
+            elif op == sc.HOME:
+                target = tuple(0.0 if home else coord for home, coord in zip(args, position))
+                duration += self.move_time(position, target, homing = True)
+                estimate.distance += math.dist(position, target)
+                position = target
+            elif op in (sc.WATER_PULSES, sc.P4_PULSES):
+                duration += args[0] / 1000.0
+            elif op == sc.DELAY:
+                duration = args[0]
+            elif op in (sc.CALIB, sc.PANORAMA, sc.MOSAIC, sc.MULTICAM_TAKE):
+                duration = self.camera_time_
+            estimate.add(phases[index] if phases is not None else '', duration)
+        return estimate
+
+    def simulate_sequence(self, sequence: list, start: tuple = (0.0, 0.0, 0.0)) -> Estimate:
+        '''
+        Estimates the duration of a text sequence (e.g. from the map handler, the tool
+        exchanger or the panorama sequencer), per phase
+
+        Args:
+            sequence {list}: the sequence lines
+            start {tuple}: the (x, y, z) position of the gantry at the start
+
+        Raises:
+            SequenceError: for a line the sequencer would reject
+        '''
+        instructions = sc.SequenceCompiler().compile(sequence)
+        # The phase of a line is the command type line above it
+        phase_of_line, phase = [], ''
+        for line in sequence:
+            if line[:2] in sc.COMMAND_TYPES:
+                phase = line.strip()
+            phase_of_line.append(phase)
+        return self.simulate(instructions, start, [phase_of_line[instruction.line - 1] for instruction in instructions])
+
+
+def load_params(config: str) -> ParamTracker:
+    '''
+    Returns the parameter table of a configuration: a yaml file (parameter id: value),
+    or the name of one of the configurations of the config server (e.g. Genesis)
+    '''
+    path = config
+    if not os.path.exists(path):
+        from ament_index_python.packages import get_package_share_directory
+        path = os.path.join(get_package_share_directory('farmbot_controllers'), 'config',
+                            config if config.endswith('.yaml') else config + '.yaml')
+    with open(path) as yaml_file:
+        values = yaml.safe_load(yaml_file) or {}
+    return ParamTracker({**DEFAULT_PARAMS, **{int(param): value for param, value in values.items()}})
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(description='Estimates how long sequences take to execute, without running them')
+    parser.add_argument('sequences', nargs='+', help="sequence files (the text sent to the sequencer), '-' for stdin")
+    parser.add_argument('--config', default='activeConfig',
+                        help='parameter configuration: a yaml file or the name of a config server configuration '
+                             '(activeConfig, Genesis, Express, Custom1, firmwareDefault)')
+    parser.add_argument('--start', type=float, nargs=3, default=(0.0, 0.0, 0.0), metavar=('X', 'Y', 'Z'),
+                        help='position of the gantry at the start (mm)')
+    parser.add_argument('--speed', type=float, default=400.0, help='speed limit (steps/s) of the sequence moves')
+    parser.add_argument('--command-time', type=float, default=0.05, help='round trip (s) of a Farmduino command')
+    parser.add_argument('--camera-time', type=float, default=1.0, help='duration (s) of a vision step, until the picture is taken')
+    parser.add_argument('--phases', action='store_true', help='print the estimate of every phase')
+    options = parser.parse_args(args)
+
+    try:
+        params = load_params(options.config)
+    except Exception as e:
+        if options.config != 'activeConfig':
+            parser.error(f'Cannot load the {options.config} configuration: {e}')
+        print('No active configuration, using the firmware defaults', file=sys.stderr)
+        params = ParamTracker()
+    simulator = SequenceSimulator(params, (options.speed,) * 3, options.command_time, options.camera_time)
+
+    for name in options.sequences:
+        with (sys.stdin if name == '-' else open(name)) as sequence_file:
+            sequence = sequence_file.read().split('\n')
+        started = time.perf_counter()
+        try:
+            estimate = simulator.simulate_sequence(sequence, tuple(options.start))
+        except sc.SequenceError as e:
+            print(f'{name}: rejected, {e}')
+            continue
+        elapsed = time.perf_counter() - started
+        print(f'{name}: {estimate.summary()}, simulated in {elapsed * 1000.0:.1f}ms')
+        if options.phases:
+            for phase, duration in estimate.phases.items():
+                print(f'    {phase or "(no phase)":<24} {duration:8.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,20 @@
+import os
+import threading
+import time
+from collections import deque
+from rclpy.callback_groups import CallbackGroup
 from rclpy.node import Node
 from std_msgs.msg import Bool, String
+from farmbot_interfaces.msg import PinReport, ParamReport
 from farmbot_interfaces.srv import StringRepReq
+from farmbot_command_handler import fcode
+from farmbot_command_handler.firmware_params import ParamTracker
 from farmbot_controllers.movement import Movement
 from farmbot_controllers.devices import DeviceControl
+from farmbot_controllers.service_clients import ServiceClientPool
+from farmbot_controllers import sequence_compiler as sc
+from farmbot_controllers.sequence_journal import SequenceJournal
+from farmbot_controllers.sequence_simulator import SequenceSimulator
 
 class WaitForRequest:
     '''
@@ -17,35 +29,195 @@ class WaitForRequest:
 
 
 class Sequencer:
-    def __init__(self, node: Node, mvm: Movement, devices: DeviceControl):
+    '''
+    Sequencer module that extends the farmbot controller node. It executes the command
+    sequences (coordinate, device, servo, vision commands and delays) one step after the
+    other, as soon as the previous step is done: the farmbot went busy and idle again for
+    the steps sent to the Farmduino, the pin reply or the service response arrived, the
+    delay ran out. A slow watchdog timer releases a step whose command never made the
+    farmbot busy (e.g. a command rejected on the way).
+
+    The sequences are compiled into instructions when they are received (see
+    sequence_compiler), so a sequence with a malformed line is rejected as a whole.
+
+    The node can run on a multi-threaded executor: the sequencing state is guarded by
+    a lock, as the service responses and the commands of the node (e.g. the electronic
+    stop clearing the sequence) come in on other threads than the sequencing callbacks.
+
+    The instructions of the sequence in progress and the steps done are journaled
+    ('sequence_journal' parameter, empty to disable), so a sequence stopped by an
+    electronic stop or a restart of the node can be resumed (see resume).
+    '''
+    def __init__(self, node: Node, mvm: Movement, devices: DeviceControl, services: ServiceClientPool = None,
+                 callback_group: CallbackGroup = None):
+        '''
+        Module constructor
+
+        Args:
+            node {Node}: the node the module extends
+            mvm {Movement}: the movement module of the node
+            devices {DeviceControl}: the device module of the node
+            services {ServiceClientPool}: the service clients shared by the node. Created if None
+            callback_group {CallbackGroup}: the group of the sequencing subscriptions and timers.
+                The default group of the node if None
+        '''
         # The farmbot node extension
         self.node_ = node
         # Objects linking to the state and movement modules
         self.mvm_ = mvm
         self.devices_ = devices
+        # Clients of the map handler and camera services, shared with the node
+        self.services_ = services if services is not None else ServiceClientPool(node)
+        for service in ['map_info', 'form_panorama', 'camera_calibration', 'panorama_sequence']:
+            self.services_.add(StringRepReq, service)
+
+        # Guards the sequencing state. Reentrant, as a step can clear the sequence
+        self.lock_ = threading.RLock()
+        self.callback_group_ = callback_group
 
+        # Last position reported by the Farmduino, written by the control callback group
         self.x = 0
         self.y = 0
         self.z = 0
-
-        self.sequence_ = []
-        self.command_type_ = ''
+        # Target of the last move of the sequence. The camera steps are taken there, as the
+        # report of the final position can arrive after the idle state that starts them
+        self.pose_ = None
+
+        # Compiled instructions of the accepted sequences
+        self.sequence_ = deque()
+        self.compiler_ = sc.SequenceCompiler(limits = mvm.uart_.limits_,
+                                             speeds = (mvm.X_MAX_SPEED, mvm.Y_MAX_SPEED, mvm.Z_MAX_SPEED),
+                                             clamp = mvm.clamp_moves_)
+        self.handlers_ = {
+            sc.MOVE: self.run_move,
+            sc.SERVO: self.run_servo,
+            sc.CHECK_TOOL: self.run_check_tool,
+            sc.READ_SOIL: self.run_read_soil,
+            sc.VACUUM: self.run_vacuum,
+            sc.WATER_PULSES: self.run_water_pulses,
+            sc.P4_PULSES: self.run_p4_pulses,
+            sc.CALIB: self.run_calib,
+            sc.PANORAMA: self.run_panorama,
+            sc.MOSAIC: self.run_mosaic,
+            sc.MULTICAM_TAKE: self.run_multicam_take,
+            sc.DELAY: self.run_delay,
+            sc.HOME: self.run_home,
+        }
+        # Kinematic model of the gantry, fed with the parameters reported by the Farmduino,
+        # estimating the duration of the accepted sequences
+        self.params_ = ParamTracker()
+        self.simulator_ = SequenceSimulator(self.params_, (mvm.X_MAX_SPEED, mvm.Y_MAX_SPEED, mvm.Z_MAX_SPEED))
+        # Instruction being executed, journaled as done once the next one can start
+        self.current_ = None
         
         self.wait_for_request_ = WaitForRequest()
         self.farmbot_busy_ = False
         self.wait_for_camera_ = False
         self.general_wait_flag_ = False
-        self.ticks_ = 0
-
-        self.busy_state_sub_ = self.node_.create_subscription(Bool, 'busy_state', self.status_callback, 10)
-        self.sequencer_sub_ = self.node_.create_subscription(String, 'sequencer', self.extend_sequence, 10)
-        self.sequencing_timer_ = self.node_.create_timer(1.0, self.sequencing_timer)
+        self.delay_timer_ = None
+
+        # Step sent to the Farmduino, done once the farmbot went busy and idle again
+        self.wait_for_busy_ = False
+        self.busy_seen_ = False
+        self.step_sent_ = 0.0
+        # Wall-clock of the sequence in progress
+        self.job_started_ = 0.0
+        self.job_steps_ = 0
+
+        node.declare_parameter('sequence_busy_timeout', 2.0)
+        node.declare_parameter('sequence_watchdog_period', 1.0)
+        node.declare_parameter('sequence_journal', os.path.join(os.path.expanduser('~'), '.ros', 'farmbot_sequence.journal'))
+        self.busy_timeout_ = node.get_parameter('sequence_busy_timeout').get_parameter_value().double_value
+        watchdog_period = node.get_parameter('sequence_watchdog_period').get_parameter_value().double_value
+        journal_path = node.get_parameter('sequence_journal').get_parameter_value().string_value
+
+        # A sequence left in the journal by the previous run can be resumed. The gantry is
+        # homed first, as it might have been moved (or the Farmduino reset) in the meantime
+        self.journal_ = SequenceJournal(journal_path) if journal_path else None
+        self.home_on_resume_ = False
+        if self.journal_ is not None:
+            instructions, done = self.journal_.load()
+            if instructions:
+                self.home_on_resume_ = True
+                self.node_.get_logger().warning(f'Unfinished sequence in {journal_path} ({done} of {len(instructions)} '
+                                                f'steps done). Send R to resume it')
+
+        self.busy_state_sub_ = self.node_.create_subscription(Bool, 'busy_state', self.status_callback, 10,
+                                                              callback_group = callback_group)
+        self.sequencer_sub_ = self.node_.create_subscription(String, 'sequencer', self.extend_sequence, 10,
+                                                             callback_group = callback_group)
+        self.pin_report_sub_ = self.node_.create_subscription(PinReport, 'report/pin', self.pin_report, 10,
+                                                              callback_group = callback_group)
+        self.param_report_sub_ = self.node_.create_subscription(ParamReport, 'report/param',
+                                                                lambda msg: self.params_.observe_value(msg.param, msg.value), 200,
+                                                                callback_group = callback_group)
+        self.watchdog_timer_ = self.node_.create_timer(watchdog_period, self.sequencing_watchdog,
+                                                       callback_group = callback_group)
  
     def clear_sequence(self):
         '''
         Clearing the sequence in cases such as an electronic stop
         '''
-        self.sequence_.clear()
+        with self.lock_:
+            self.sequence_.clear()
+            self.current_ = None
+            self.pose_ = None
+            self.wait_for_busy_ = False
+            if self.delay_timer_ is not None:
+                self.node_.destroy_timer(self.delay_timer_)
+                self.delay_timer_ = None
+            if self.job_started_:
+                self.node_.get_logger().info(f'Sequence cleared after {self.job_steps_} steps '
+                                             f'in {time.monotonic() - self.job_started_:.1f}s'
+                                             + (', send R to resume it' if self.journal_ is not None else ''))
+                self.job_started_ = 0.0
+
+    def resume(self, home: bool = False):
+        '''
+        Resumes the journaled sequence (stopped by an electronic stop or a restart of
+        the node) from its first step that was not done. The gantry first goes back to
+        the position of the last move done: it raises the Z axis, travels there and
+        lowers it again. After a restart, the gantry is homed first
+
+        Args:
+            home {bool}: home the gantry before resuming in any case
+        '''
+        with self.lock_:
+            if self.journal_ is None:
+                self.node_.get_logger().warning('The sequence journal is disabled, nothing to resume')
+                return
+            if self.sequence_ or self.job_started_:
+                self.node_.get_logger().warning('A sequence is running. Resume ignored')
+                return
+
+            instructions, done = self.journal_.load()
+            if not instructions:
+                self.node_.get_logger().info('No unfinished sequence to resume')
+                return
+
+            if home or self.home_on_resume_:
+                # Z first, so the gantry does not drag the tool through the bed
+                prelude = [sc.Instruction(sc.HOME, (False, False, True), 0),
+                           sc.Instruction(sc.HOME, (False, True, False), 0),
+                           sc.Instruction(sc.HOME, (True, False, False), 0)]
+            else:
+                x, y, _ = self.pose()
+                prelude = [sc.Instruction(sc.MOVE, (x, y, 0.0), 0)]
+            self.home_on_resume_ = False
+
+            moves_done = [instruction for instruction in instructions[:done] if instruction.op == sc.MOVE]
+            if moves_done:
+                x, y, z = moves_done[-1].args
+                if prelude[-1].args != (x, y, 0.0):
+                    prelude.append(sc.Instruction(sc.MOVE, (x, y, 0.0), 0))
+                if z != 0.0:
+                    prelude.append(sc.Instruction(sc.MOVE, (x, y, z), 0))
+
+            self.node_.get_logger().info(f'Resuming the sequence at step {done + 1} of {len(instructions)} '
+                                         f'(line {instructions[done].line})')
+            self.sequence_.extend(prelude)
+            self.sequence_.extend(instructions[done:])
+            self.advance()
 
 
     # Peripheral control functions TODO: Improve
@@ -55,49 +227,49 @@ class Sequencer:
         Turning on or off the vacuum pump
         '''
         vacuum_pin = 9
-        self.devices_.set_pin_value(pin = vacuum_pin, value = state, pin_mode = False)
+        return self.devices_.set_pin_value(pin = vacuum_pin, value = state, pin_mode = False)
 
     def water_pump(self, state: int):
         '''
         Turning on or off the water pump
         '''
         water_pin = 8
-        self.devices_.set_pin_value(pin = water_pin, value = state, pin_mode = False)
+        return self.devices_.set_pin_value(pin = water_pin, value = state, pin_mode = False)
 
     def water_pulses(self, delay = 500):
         '''
         Turning the water pump on, waiting for the specified time in ms and turning it off
         '''
         water_pin = 8
-        self.devices_.set_pin_value_2(pin = water_pin, value1 = 1, delay = delay, value2 = 0, pin_mode = False)
+        return self.devices_.set_pin_value_2(pin = water_pin, value1 = 1, delay = delay, value2 = 0, pin_mode = False)
 
     def peripheral_4(self, state: int):
         '''
         Turning on or off the peripheral 4 pin
         '''
         peripheral4_pin = 10
-        self.devices_.set_pin_value(pin = peripheral4_pin, value = state, pin_mode = False)
+        return self.devices_.set_pin_value(pin = peripheral4_pin, value = state, pin_mode = False)
 
     def peripheral4_pulses(self, delay = 500):
         '''
         Opening and closing secondary solenoid on peripheral 4 pin, waiting for the specified time
         '''
         peripheral4_pin = 10
-        self.devices_.set_pin_value_2(pin = peripheral4_pin, value1 = 1, delay = delay, value2 = 0, pin_mode = False)
+        return self.devices_.set_pin_value_2(pin = peripheral4_pin, value1 = 1, delay = delay, value2 = 0, pin_mode = False)
 
     def peripheral_5(self, state: int):
         '''
         Turning on or off the peripheral 5 pin
         '''
         peripheral5_pin = 12
-        self.devices_.set_pin_value(pin = peripheral5_pin, value = state, pin_mode = False)
+        return self.devices_.set_pin_value(pin = peripheral5_pin, value = state, pin_mode = False)
 
     def led_strip(self, state: int):
         '''
         Turning on or off the LED strip
         '''
         light_pin = 7
-        self.devices_.set_pin_value(pin = light_pin, value = state, pin_mode = False)
+        return self.devices_.set_pin_value(pin = light_pin, value = state, pin_mode = False)
 
     ## Map Handler Client
     def map_cmd_client(self, cmd: str):
@@ -108,22 +280,52 @@ class Sequencer:
         Args:
             cmd {str}: The command that is sent to the map handler
         '''
-        # Initializing the client and wait for map server confirmation
-        client = self.node_.create_client(StringRepReq, 'map_info')
-        while not client.wait_for_service(1.0):
-            self.node_.get_logger().warn('Waiting for Map Server...')
-        
         # Set the command to the service request
         request = StringRepReq.Request()
         request.data = cmd
 
-        # Call async and add the response callback
-        future = client.call_async(request = request)
-        future.add_done_callback(self.cmd_sequence_callback)
+        # Call async (queued until the map server is available) and add the response callback
+        self.services_.call(StringRepReq, 'map_info', request, self.cmd_sequence_callback)
 
     def extend_sequence(self, cmd: String):
-        temp = cmd.data.split('\n')
-        self.sequence_.extend(temp)
+        with self.lock_:
+            if self.accept_sequence(cmd.data.split('\n')):
+                self.advance()
+
+    def accept_sequence(self, sequence: list) -> bool:
+        '''
+        Compiles a sequence and queues its instructions. A sequence with a line that
+        cannot be executed (malformed, out of the reach of the gantry, ...) is rejected
+        as a whole, instead of stopping the job half way
+
+        Args:
+            sequence {list}: the sequence lines
+
+        Returns:
+            True if the sequence was queued
+        '''
+        try:
+            instructions = self.compiler_.compile(sequence)
+        except sc.SequenceError as e:
+            self.node_.get_logger().error(f'Sequence rejected, {e}')
+            return False
+
+        if self.journal_ is not None and instructions:
+            if self.sequence_ or self.job_started_:
+                self.journal_.extend(instructions)
+            else:
+                if self.journal_.pending:
+                    self.node_.get_logger().warning('New sequence, the stopped one can no longer be resumed')
+                self.journal_.start(instructions)
+                self.home_on_resume_ = False
+
+        if instructions:
+            # The sequence starts where the queued one ends
+            start = next((i.args for i in reversed(self.sequence_) if i.op == sc.MOVE), self.pose())
+            estimate = self.simulator_.simulate(instructions, start)
+            self.node_.get_logger().info(f'Sequence accepted, estimated {estimate.summary()}')
+        self.sequence_.extend(instructions)
+        return True
 
     def cmd_sequence_callback(self, future):
         '''
@@ -133,181 +335,254 @@ class Sequencer:
         Args:
             future{Service Response}: Contains the response from the service
         '''
-        # Register the response of the server
-        cmd = future.result().data.split('\n')
-        # For a coordinate command response
+        with self.lock_:
+            # Register the response of the server
+            cmd = future.result().data.split('\n')
+            # For a coordinate command response
+
+            self.node_.get_logger().info(future.result().data)
 
-        self.node_.get_logger().info(future.result().data)
+            if cmd[0] == 'SUCCESS' and self.general_wait_flag_:
+                self.general_wait_flag_ = False
+            elif cmd[0] == 'FAILED' and self.general_wait_flag_:
+                self.general_wait_flag_ = False
+                self.node_.get_logger().warning('A Server Response Failed.. Clearing sequence')
+                self.clear_sequence()
 
-        if cmd[0] == 'SUCCESS' and self.general_wait_flag_:
-            self.general_wait_flag_ = False
-        elif cmd[0] == 'FAILED' and self.general_wait_flag_:
-            self.general_wait_flag_ = False
-            self.node_.get_logger().warning('A Server Response Failed.. Clearing sequence')
-            self.clear_sequence()
+            elif cmd[0] not in ['', 'SUCCESS', 'FAILED', 'UNRECOGNIZED']:
+                self.accept_sequence(cmd)
 
-        elif cmd[0] not in ['', 'SUCCESS', 'FAILED', 'UNRECOGNIZED']:
-            self.sequence_.extend(cmd)
+            self.advance()
 
-    def sequencing_timer(self):
+    def ready(self) -> bool:
         '''
-        Sequencing timer that handles sending commands to the farmbot. If the 
-        Farmbot is busy, the commands are added in the sequence queue and the 
-        queue is emptied in FIFO fashion.
+        True if nothing holds the next step back
         '''
-        # If waiting for camera or queue is empty, return
-        if self.ticks_:
-            self.node_.get_logger().info(f'Waiting for {self.ticks_} more ticks')
-            self.ticks_ -= 1
-            return
-        
-        if self.wait_for_camera_ or self.general_wait_flag_:
-            return
-        if not len(self.sequence_):
-            return
+        return not (self.farmbot_busy_ or self.wait_for_busy_ or self.wait_for_request_.wait_flag or self.wait_for_camera_
+                    or self.general_wait_flag_ or self.delay_timer_ is not None)
 
-        # Set the sequence command type. CC - Coord. Cmd, DC - Device Cmd, 
-        # VC - Vision Cmd, SC - Servo Cmd
-        if self.sequence_[0][:2] in ['CC', 'DC', 'SC', 'VC', 'TD']:
-            self.command_type_ = self.sequence_[0][:2]
-            self.sequence_.pop(0)
-            return
+    def advance(self):
+        '''
+        Executes the steps of the sequence until one has to be waited for. Called on
+        every event that can end a wait (busy state, pin reply, service response, delay)
+        '''
+        while self.sequence_ and self.ready():
+            self.step_done()
+            if not self.job_started_:
+                self.job_started_ = time.monotonic()
+                self.job_steps_ = 0
+            self.job_steps_ += 1
+            self.step()
 
-        # If the farmbot is not busy and a request's response is not processed
-        if not self.farmbot_busy_ and not self.wait_for_request_.wait_flag:
-            # If the command type was not set, ignore
-            if self.command_type_ == '':
-                self.node_.get_logger().warn(f"Command type not set! Not enough context! Command '{self.sequence_[0]}' ignored")
-                return
-            
-            # Used to check if a tool was mounted/unmounted properly. Note that 63 represents the connection between pins B and C on the UTP
-            if (self.wait_for_request_.result != -1 and self.wait_for_request_.wait_for == 63
-                    and self.wait_for_request_.result == self.wait_for_request_.expected):
-                self.node_.get_logger().info(f"Tool {'mounted' if self.wait_for_request_.expected == 0 else 'unmounted'} successfully")
-                self.wait_for_request_.expected = -1
-                self.wait_for_request_.result = -1
-                self.wait_for_request_.wait_for = -1
-                self.wait_for_request_.index = -1
-            elif (self.wait_for_request_.result != -1 and self.wait_for_request_.wait_for == 63
-                    and self.wait_for_request_.result != self.wait_for_request_.expected):
-                self.node_.get_logger().warn(f"FAILED TOOL {'MOUNTING' if self.wait_for_request_.expected == 0 else 'UNMOUNTING'}!! Stopping sequence")
-                self.wait_for_request_.expected = -1
-                self.wait_for_request_.result = -1
-                self.wait_for_request_.wait_for = -1
-                self.wait_for_request_.index = -1
+        if not self.sequence_ and self.ready() and self.job_started_:
+            self.step_done()
+            if self.journal_ is not None:
+                self.journal_.finish()
+            services = self.services_.summary()
+            self.node_.get_logger().info(f'Sequence done: {self.job_steps_} steps '
+                                         f'in {time.monotonic() - self.job_started_:.1f}s'
+                                         + (f', service latency (ms): {services}' if services else ''))
+            self.job_started_ = 0.0
+            self.pose_ = None
+
+    def pose(self) -> tuple:
+        '''
+        The (x, y, z) position of the gantry once the steps sent so far are done: the
+        target of the last move of the sequence, or the reported position before it
+        '''
+        return self.pose_ if self.pose_ is not None else (float(self.x), float(self.y), float(self.z))
+
+    def sent_to_farmduino(self, sent: bool = True) -> bool:
+        '''
+        Marks the current step as sent to the Farmduino: the next step waits for the
+        farmbot to go busy and idle again
+
+        Args:
+            sent {bool}: False if the command of the step could not be sent (see step_rejected)
+
+        Returns:
+            sent
+        '''
+        if not sent:
+            self.step_rejected()
+            return False
+        self.wait_for_busy_ = True
+        self.busy_seen_ = self.farmbot_busy_
+        self.step_sent_ = time.monotonic()
+        return True
+
+    def step_rejected(self):
+        '''
+        Clears the sequence when the command of the current step could not be sent (e.g.
+        a move out of the reach of the gantry). The next steps would run from the wrong
+        state, e.g. lower a tool at the wrong position. The step is not journaled as done
+        '''
+        self.node_.get_logger().error(f'The step of line {self.current_.line} could not be sent. Clearing the sequence')
+        self.clear_sequence()
+
+    def sequencing_watchdog(self):
+        '''
+        Slow timer releasing a step whose command never made the farmbot busy
+        (e.g. a command dropped by the UART controller)
+        '''
+        with self.lock_:
+            if (self.wait_for_busy_ and not self.busy_seen_
+                    and time.monotonic() - self.step_sent_ > self.busy_timeout_):
+                self.node_.get_logger().warning(f'The farmbot did not get busy {self.busy_timeout_}s after the last step. Continuing')
+                self.wait_for_busy_ = False
+            self.advance()
+
+    def delay_done(self):
+        with self.lock_:
+            self.node_.destroy_timer(self.delay_timer_)
+            self.delay_timer_ = None
+            self.advance()
+
+    def step(self):
+        '''
+        Executes the next instruction of the sequence
+        '''
+        self.current_ = self.sequence_.popleft()
+        self.handlers_[self.current_.op](*self.current_.args)
+
+    def step_done(self):
+        '''
+        Journals the instruction executed last as done
+        '''
+        if self.current_ is not None and self.current_.line and self.journal_ is not None:
+            self.journal_.confirm()
+        self.current_ = None
+
+    # Instructions (see sequence_compiler)
+
+    def run_move(self, x: float, y: float, z: float):
+        '''
+        Moves the gantry to the coordinates
+        '''
+        if self.sent_to_farmduino(self.mvm_.move_gantry_abs(x_coord = x, y_coord = y, z_coord = z)):
+            self.pose_ = self.mvm_.uart_.limits_.clamp(x, y, z) if self.mvm_.clamp_moves_ else (x, y, z)
+
+    def run_servo(self, pin: int, angle: float):
+        '''
+        Moves a servo to the angle
+        '''
+        self.sent_to_farmduino(self.devices_.move_servo(pin, angle))
+
+    def run_check_tool(self, expected: int):
+        '''
+        Checks if a tool was mounted/unmounted properly. Note that 63 represents the
+        connection between pins B and C on the UTP
+        '''
+        if self.devices_.read_pin(63, False):
+            self.wait_for_pin(63, expected = expected)
+        else:
+            self.step_rejected()
+
+    def run_read_soil(self, index: int):
+        '''
+        Reads the soil sensor for the plant with the given index
+        '''
+        if self.devices_.read_pin(59, True):
+            self.wait_for_pin(59, index = index)
+        else:
+            self.step_rejected()
+
+    def run_vacuum(self, state: int):
+        self.sent_to_farmduino(self.vacuum_pump(state = state))
+
+    def run_water_pulses(self, pulses: int):
+        self.sent_to_farmduino(self.water_pulses(delay = pulses))
+
+    def run_p4_pulses(self, pulses: int):
+        self.sent_to_farmduino(self.peripheral4_pulses(delay = pulses))
+
+    def run_calib(self, cmd: str):
+        x, y, z = self.pose()
+        self.cam_calib_client(cmd = f'{cmd} {x} {y} {z}')
+
+    def run_panorama(self):
+        x, y, z = self.pose()
+        self.stitch_panorama_client(calib = False, update_map = False, mosaic = False, detect_weeds = False,
+                                    x = x, y = y, z = z)
+
+    def run_mosaic(self, num: int):
+        x, y, z = self.pose()
+        self.stitch_panorama_client(calib = False, update_map = False, mosaic = True, detect_weeds = False,
+                                    x = x, y = y, z = z, num = num)
+
+    def run_multicam_take(self):
+        self.macro_client(topic = 'multicam_toggle', info = 'TAKE')
+
+    def run_home(self, x: bool, y: bool, z: bool):
+        '''
+        Finds the home of the axes
+        '''
+        if self.sent_to_farmduino(self.mvm_.find_axis_home(x = x, y = y, z = z)):
+            self.pose_ = tuple(0.0 if homed else coord for homed, coord in zip((x, y, z), self.pose()))
+
+    def run_delay(self, delay: float):
+        '''
+        Waits for the delay (s) before moving to the next instruction
+        '''
+        self.delay_timer_ = self.node_.create_timer(delay, self.delay_done, callback_group = self.callback_group_)
+
+    def wait_for_pin(self, pin: int, expected: int = -1, index: int = -1):
+        '''
+        Holds the sequence until the reply to the pin read (R41) arrives
+        '''
+        self.wait_for_request_.wait_flag = True
+        self.wait_for_request_.wait_for = pin
+        self.wait_for_request_.expected = expected
+        self.wait_for_request_.index = index
+        self.wait_for_request_.result = -1
+        self.sent_to_farmduino()
+
+    def pin_result(self):
+        '''
+        Handles the reply to the pin read of the sequence: the tool check stops the
+        sequence if it failed, the soil reading is sent to the map handler
+        '''
+        request = self.wait_for_request_
+        if request.wait_for == 63:
+            mounting = 'mounted' if request.expected == 0 else 'unmounted'
+            if request.result == request.expected:
+                self.node_.get_logger().info(f'Tool {mounting} successfully')
+            else:
+                self.node_.get_logger().warn(f"FAILED TOOL {'MOUNTING' if request.expected == 0 else 'UNMOUNTING'}!! Stopping sequence")
                 self.clear_sequence()
-                return
+        elif request.wait_for == 59:
+            self.map_cmd_client(cmd = f'SoilReading {request.index} {request.result}')
 
-            if(self.wait_for_request_.result != -1 and self.wait_for_request_.wait_for == 59):
-                reading: str = f'SoilReading {self.wait_for_request_.index} {self.wait_for_request_.result}'
-                self.map_cmd_client(cmd = reading)
-                
-                self.wait_for_request_.expected = -1
-                self.wait_for_request_.result = -1
-                self.wait_for_request_.wait_for = -1
-                self.wait_for_request_.index = -1
-
-            if self.sequence_[0] == '':
-                self.sequence_.pop(0)
-
-            # Move the gantry to the parsed coordinates
-            if self.command_type_ == 'CC':
-                coords = self.sequence_[0].split(' ')
-                self.mvm_.move_gantry_abs(x_coord = float(coords[0]), 
-                                          y_coord = float(coords[1]), 
-                                          z_coord = float(coords[2]))
-                self.sequence_.pop(0)
-                return
-            # Node a servo to the parsed angle
-            if self.command_type_ == 'SC':
-                cmd = self.sequence_[0].split(' ')
-                pin = int(cmd[0])
-                angle = float(cmd[1])
-                
-                self.devices_.move_servo(pin, angle)
-                self.sequence_.pop(0)
-            # Manipulate the device as indicated in the command
-            elif self.command_type_ == 'DC':
-                cmd = self.sequence_[0].split(' ')
-                # Checking if a tool was mounted properly
-                if cmd[0] == 'CHECK':
-                    self.devices_.read_pin(63, False)
-                    self.wait_for_request_.wait_flag = True
-                    self.wait_for_request_.wait_for = 63
-                    self.wait_for_request_.expected = int(cmd[1])
-                    self.wait_for_request_.index = -1
-                if cmd[0] == 'READSOIL':
-                    self.devices_.read_pin(59, True)
-                    self.wait_for_request_.wait_flag = True
-                    self.wait_for_request_.wait_for = 59
-                    self.wait_for_request_.expected = -1
-                    self.wait_for_request_.index = int(cmd[1])
-                if cmd[0] == 'Vacuum':
-                    if cmd[1] in ['0', '1']:
-                        self.vacuum_pump(state = int(cmd[1]))
-                    else:
-                        self.node_.get_logger().warn(f'Vacuum pump command has a state other than on or off. Command ignored!')
-                if cmd[0] == 'WaterPulses':
-                    if int(cmd[1]):
-                        self.water_pulses(delay = int(cmd[1]))
-                if cmd[0] == 'P4_Pulses':
-                    if int(cmd[1]):
-                        self.peripheral4_pulses(delay=int(cmd[1]))
-                self.sequence_.pop(0)
-            # Handle Vision Commands
-            elif self.command_type_ == 'VC':
-                if not len(self.sequence_):
-                    return
-                cmd = self.sequence_[0].split(' ')
-                # Vision command
-                if cmd[0] == 'CALIB':
-                    self.cam_calib_client(cmd = (self.sequence_[0] + ' ' + str(self.x) + ' ' + str(self.y) + ' ' + str(self.z)))
-                elif cmd[0] == 'PAN':
-                    self.stitch_panorama_client(calib = False, update_map = False, mosaic = False, detect_weeds = False,
-                                                    x = self.x, y = self.y,
-                                                    z = self.z)
-                elif cmd[0] == 'MOSAIC':
-                    self.stitch_panorama_client(calib = False, update_map = False, mosaic = True, detect_weeds = False,
-                                                    x = self.x, y = self.y,
-                                                    z = self.z, num = int(cmd[1]))
-                elif cmd[0] == 'M_CAM_TAKE':
-                    self.macro_client(topic = 'multicam_toggle', info = 'TAKE')
-                self.sequence_.pop(0)
-            # The amount of ticks the farmbot should wait in the sequence
-            # before moving to the next command
-            elif self.command_type_ == 'TD':
-                self.ticks_ = int(self.sequence_[0][1:])
-                self.sequence_.pop(0)
-
-    def uart_message(self, msg: str):
-        '''
-        Getting the responses to the requests done in the sequencer
-        '''
-        if ' ' in msg:
-            info = msg.split(' ')
-            if info[0] == 'R41' and info[1] == f'P{str(self.wait_for_request_.wait_for)}':
-                self.wait_for_request_.result = int(info[2][1:])
+        request.expected = -1
+        request.result = -1
+        request.wait_for = -1
+        request.index = -1
+
+    def pin_report(self, msg: PinReport):
+        '''
+        Getting the responses to the pin requests done in the sequencer (R41)
+        '''
+        with self.lock_:
+            if msg.pin == self.wait_for_request_.wait_for:
+                self.wait_for_request_.result = msg.value
                 self.wait_for_request_.wait_flag = False
+                self.pin_result()
+                self.advance()
 
     def macro_client(self, topic: str, info: str):
         '''
         Used to implement experimental features
         '''
         # Set the wait flag
-        self.general_wait_flag_ = True
-        
-        # Initializing the client and wait for map server confirmation
-        client = self.node_.create_client(StringRepReq, topic)
-        while not client.wait_for_service(1.0):
-            self.node_.get_logger().warn(f'Waiting for Server with topic /{topic}...')
+        with self.lock_:
+            self.general_wait_flag_ = True
         
         # Set the command to the service request
         request = StringRepReq.Request()    
         request.data = info
 
-        # Call async and add the response callback
-        future = client.call_async(request = request)
-        future.add_done_callback(self.cmd_sequence_callback)
+        # Call async (queued until the server is available) and add the response callback
+        self.services_.call(StringRepReq, topic, request, self.cmd_sequence_callback)
 
     def stitch_panorama_client(self, detect_weeds: bool, calib: bool, update_map: bool, mosaic: bool, x: float, y: float, z: float, num = int(-1)):
         '''
@@ -317,17 +592,14 @@ class Sequencer:
         Args:
             cmd {str}: The command that is sent to the map handler
         '''
-        # Block sequencing here async
-        self.wait_for_camera_ = True
+        # Block sequencing here async, until the picture is taken. The camera controller
+        # processes it in the background while the gantry moves on
+        with self.lock_:
+            self.wait_for_camera_ = True
 
         if sum([calib, update_map, mosaic]) > 1:
             self.node_.get_logger().warn('Cannot have more than 1 command type sent at the same time!')
 
-        # Initializing the client and wait for map server confirmation
-        client = self.node_.create_client(StringRepReq, 'form_panorama')
-        while not client.wait_for_service(1.0):
-            self.node_.get_logger().warn('Waiting for Camera Stitching Server...')
-        
         # Set the command to the service request
         request = StringRepReq.Request()
         
@@ -342,18 +614,19 @@ class Sequencer:
         else:
             request.data = str(x) + ' ' + str(y) + ' ' + str(z)
 
-        # Call async and add the response callback
-        future = client.call_async(request = request)
-        future.add_done_callback(self.stitch_callback)
+        # Call async (queued until the camera stitching server is available) and add the response callback
+        self.services_.call(StringRepReq, 'form_panorama', request, self.stitch_callback)
 
     def stitch_callback(self, future):
         '''
         Camera Service Server callback
         '''
-        if future.result().data == 'FAILED':
-            self.clear_sequence()
+        with self.lock_:
+            if future.result().data == 'FAILED':
+                self.clear_sequence()
 
-        self.wait_for_camera_ = False
+            self.wait_for_camera_ = False
+            self.advance()
 
     def cam_calib_client(self, cmd: str):
         '''
@@ -367,18 +640,18 @@ class Sequencer:
             self.node_.get_logger().warn('Calibration command type not set! Command ignored')
             return
 
-        # Initializing the client and wait for map server confirmation
-        client = self.node_.create_client(StringRepReq, 'camera_calibration')
-        while not client.wait_for_service(1.0):
-            self.node_.get_logger().warn('Waiting for Camera Calibration Server...')
-        
+        # A calibration picture blocks sequencing until it is taken, as a panorama one does
+        if cmd != 'GET':
+            with self.lock_:
+                self.wait_for_camera_ = True
+
         # Set the command to the service request
         request = StringRepReq.Request()
         request.data = cmd
 
-        # Call async and add the response callback
-        future = client.call_async(request = request)
-        future.add_done_callback(self.cmd_sequence_callback if cmd == 'GET' else self.stitch_callback)
+        # Call async (queued until the camera calibration server is available) and add the response callback
+        self.services_.call(StringRepReq, 'camera_calibration', request,
+                            self.cmd_sequence_callback if cmd == 'GET' else self.stitch_callback)
     
     def panorama_client(self, mosaic = False):
         '''
@@ -388,11 +661,6 @@ class Sequencer:
         Args:
             cmd {str}: The command that is sent to the map handler
         '''
-        # Initializing the client and wait for map server confirmation
-        client = self.node_.create_client(StringRepReq, 'panorama_sequence')
-        while not client.wait_for_service(1.0):
-            self.node_.get_logger().warn('Waiting for Panorama Sequencing Server...')
-        
         # Set the command to the service request
         request = StringRepReq.Request()
         if mosaic:
@@ -400,12 +668,19 @@ class Sequencer:
         else: 
             request.data = 'ADD HERE ANY SETUP THAT MIGHT CHANGE'
 
-        # Call async and add the response callback
-        future = client.call_async(request = request)
-        future.add_done_callback(self.cmd_sequence_callback)
+        # Call async (queued until the panorama sequencing server is available) and add the response callback
+        self.services_.call(StringRepReq, 'panorama_sequence', request, self.cmd_sequence_callback)
 
     def status_callback(self, state: Bool):
         '''
-        Callback from the UART Handler that transmits the busy state of the farmbot
-        '''
-        self.farmbot_busy_ = state.data
\ No newline at end of file
+        Callback from the UART Handler that transmits the busy state of the farmbot.
+        A step sent to the Farmduino is done once the farmbot went busy and idle again
+        '''
+        with self.lock_:
+            self.farmbot_busy_ = state.data
+            if self.wait_for_busy_:
+                if state.data:
+                    self.busy_seen_ = True
+                elif self.busy_seen_:
+                    self.wait_for_busy_ = False
+            self.advance()
\ No newline at end of file
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+from rclpy.callback_groups import CallbackGroup
+from rclpy.node import Node
+
+
+class PooledClient:
+    '''
+    The client of one service, its queued requests and its call statistics
+    '''
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        # Requests waiting for the server: (request, callback, time queued)
+        self.pending = deque()
+        self.last_warning = 0.0
+        # Call statistics: calls answered, total and maximum latency (s), longest wait
+        # in the queue (s) and the latencies of the recent calls
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.max_wait = 0.0
+        self.recent = deque(maxlen = 100)
+
+    def record(self, latency: float, wait: float):
+        self.calls += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.max_wait = max(self.max_wait, wait)
+        self.recent.append(latency)
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the call latencies (ms) of the service
+        '''
+        if not self.calls and not self.pending:
+            return ''
+        if not self.calls:
+            return f'{self.name}[n=0 queued={len(self.pending)}]'
+        recent = sorted(self.recent)
+        return (f'{self.name}[n={self.calls} mean={self.total / self.calls * 1000.0:.0f} '
+                f'p50={recent[len(recent) // 2] * 1000.0:.0f} max={self.max * 1000.0:.0f} '
+                f'max_wait={self.max_wait * 1000.0:.0f}]')
+
+
+class ServiceClientPool:
+    '''
+    Service client pool shared by the modules of a node. It creates one client per
+    service, the first time the service is called, and never waits for a server in a
+    callback: a request to a server that is not available yet is queued and sent, in
+    order, once a timer sees the server come up. The response callbacks are the usual
+    future done callbacks. The clients of the services a module calls are best created
+    upfront (see add), so they are discovered by the time of the first call.
+
+    The latency of every call (request sent -> response) and the time the requests
+    waited for the server are kept per service (see summary).
+
+    The pool can be called from any thread of a multi-threaded executor.
+    '''
+    def __init__(self, node: Node, callback_group: CallbackGroup = None):
+        '''
+        Module constructor
+
+        Args:
+            node {Node}: the node the module extends
+            callback_group {CallbackGroup}: the group of the clients and of the poll timer.
+                The default group of the node if None
+        '''
+        self.node_ = node
+        self.callback_group_ = callback_group
+        self.clients_ = {}
+        self.lock_ = threading.RLock()
+
+        node.declare_parameter('service_poll_period', 0.1)
+        node.declare_parameter('service_warning_period', 2.0)
+        poll_period = node.get_parameter('service_poll_period').get_parameter_value().double_value
+        self.warning_period_ = node.get_parameter('service_warning_period').get_parameter_value().double_value
+
+        # Only runs while requests are queued
+        self.poll_timer_ = node.create_timer(poll_period, self.poll, callback_group = callback_group)
+        self.poll_timer_.cancel()
+
+    def add(self, srv_type, name: str) -> PooledClient:
+        '''
+        Returns the client of a service, created the first time
+
+        Args:
+            srv_type {type}: the service type (e.g. StringRepReq)
+            name {str}: the service name
+        '''
+        with self.lock_:
+            pooled = self.clients_.get(name)
+            if pooled is None:
+                pooled = PooledClient(self.node_.create_client(srv_type, name, callback_group = self.callback_group_), name)
+                self.clients_[name] = pooled
+            return pooled
+
+    def call(self, srv_type, name: str, request, callback):
+        '''
+        Calls a service without blocking: the request is sent right away if the server
+        is available and queued until it is otherwise
+
+        Args:
+            srv_type {type}: the service type (e.g. StringRepReq)
+            name {str}: the service name
+            request {srv_type.Request}: the request
+            callback {callable}: called with the future once the response arrived
+        '''
+        pooled = self.add(srv_type, name)
+
+        with self.lock_:
+            now = time.monotonic()
+            if not pooled.pending and pooled.client.service_is_ready():
+                self.send(pooled, request, callback, now)
+                return
+
+            if not pooled.pending:
+                pooled.last_warning = now
+            pooled.pending.append((request, callback, now))
+            self.poll_timer_.reset()
+
+    def send(self, pooled: PooledClient, request, callback, queued: float):
+        sent = time.monotonic()
+
+        def done(future):
+            with self.lock_:
+                pooled.record(time.monotonic() - sent, sent - queued)
+            callback(future)
+
+        pooled.client.call_async(request).add_done_callback(done)
+
+    def poll(self):
+        '''
+        Timer callback sending the queued requests of the servers that came up
+        '''
+        with self.lock_:
+            now = time.monotonic()
+            waiting = False
+            for pooled in self.clients_.values():
+                if not pooled.pending:
+                    continue
+                if pooled.client.service_is_ready():
+                    while pooled.pending:
+                        self.send(pooled, *pooled.pending.popleft())
+                    continue
+                waiting = True
+                if now - pooled.last_warning > self.warning_period_:
+                    pooled.last_warning = now
+                    self.node_.get_logger().warn(f'Waiting for the /{pooled.name} server... '
+                                                 f'{len(pooled.pending)} request(s) queued')
+            if not waiting:
+                self.poll_timer_.cancel()
+
+    def summary(self) -> str:
+        '''
+        Returns a one line summary of the call latencies (ms) of the services called
+        '''
+        with self.lock_:
+            return ' '.join(filter(None, (pooled.summary() for pooled in self.clients_.values())))
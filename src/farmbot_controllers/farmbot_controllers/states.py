@@ -1,24 +1,22 @@
 from rclpy.node import Node
-from farmbot_interfaces.msg import StateCommand
+from farmbot_command_handler import fcode
+from farmbot_command_handler.uart_transmitter import UARTTransmitter
 
 class State:
     '''
     ROS2 Farmbot State module
-    Forms the commands that are sent to the command handling package
+    Encodes the state commands and sends them straight to the UART controller
     '''
-    def __init__(self, node: Node):
+    def __init__(self, node: Node, uart: UARTTransmitter = None):
         '''
         ROS2 Farmbot State Module Constructor
         
         Args:
             node {Node}: The node the module extends
+            uart {UARTTransmitter}: the transmitter shared by the modules of the node. Created if None
         '''
         self.node = node
-
-        # The state interface object
-        self.state_ = StateCommand()
-        # The publisher for the state commands
-        self.state_pub_ = self.node.create_publisher(StateCommand, 'state_command', 10)
+        self.uart_ = uart if uart is not None else UARTTransmitter(node)
     
     ## State handling functions
     
@@ -71,12 +69,15 @@ class State:
             rep_curr_pos {Bool}: Requests the current position of the gantry
             rep_sw_ver   {Bool}: Requests the software version
         '''
-        
-        self.state_.estop = estop
-        self.state_.abort_movement = abort_movement
-        self.state_.reset_estop = reset_estop
-        self.state_.rep_end_stop = rep_end_stop
-        self.state_.rep_curr_pos = rep_curr_pos
-        self.state_.rep_sw_ver = rep_sw_ver
-
-        self.state_pub_.publish(self.state_)
\ No newline at end of file
+        if estop:
+            self.uart_.send(fcode.ESTOP)
+        elif abort_movement:
+            self.uart_.send(fcode.ABORT)
+        elif reset_estop:
+            self.uart_.send(fcode.RESET_ESTOP)
+        elif rep_end_stop:
+            self.uart_.send(fcode.REPORT_END_STOPS)
+        elif rep_curr_pos:
+            self.uart_.send(fcode.REPORT_POSITION)
+        elif rep_sw_ver:
+            self.uart_.send(fcode.REPORT_VERSION)
\ No newline at end of file
@@ -30,7 +30,8 @@ setup(
             "keyboard_controller = farmbot_controllers.keyboard_teleop:main",
             "autonomous_controller = farmbot_controllers.autonomous_controller:main",
             "panel_controller = farmbot_controllers.panel_controller:main",
-            "param_conf_server = farmbot_controllers.config_managers:main"
+            "param_conf_server = farmbot_controllers.config_managers:main",
+            "sequence_simulator = farmbot_controllers.sequence_simulator:main"
         ],
     },
 )
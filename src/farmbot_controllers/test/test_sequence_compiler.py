@@ -0,0 +1,73 @@
+import pytest
+
+from farmbot_command_handler import fcode
+from farmbot_controllers import sequence_compiler as sc
+
+
+def compile_lines(text: str, compiler: sc.SequenceCompiler = None) -> list:
+    compiler = compiler if compiler is not None else sc.SequenceCompiler()
+    return [(i.op, i.args, i.line) for i in compiler.compile(text.split('\n'))]
+
+
+def test_compiled_instructions():
+    sequence = ('CC_P_3_1\n100 200 -50\n'
+                'SC_T_1_0\n4 90\n'
+                'DC_T_2_1\nCHECK 1\nREADSOIL 3\nVacuum 1\nWaterPulses 500\nP4_Pulses 0\n'
+                'TD_T_0\nT2\nT0\n'
+                'VC_P\nCALIB 1\nPAN\nMOSAIC 7\nM_CAM_TAKE\n')
+    assert compile_lines(sequence) == [
+        (sc.MOVE, (100.0, 200.0, -50.0), 2),
+        (sc.SERVO, (4, 90.0), 4),
+        (sc.CHECK_TOOL, (1, ), 6),
+        (sc.READ_SOIL, (3, ), 7),
+        (sc.VACUUM, (1, ), 8),
+        (sc.WATER_PULSES, (500, ), 9),
+        (sc.DELAY, (2.0, ), 12),
+        (sc.CALIB, ('CALIB 1', ), 15),
+        (sc.PANORAMA, (), 16),
+        (sc.MOSAIC, (7, ), 17),
+        (sc.MULTICAM_TAKE, (), 18),
+    ]
+
+
+@pytest.mark.parametrize('sequence, line, message', [
+    ('10 10 10', 1, 'Command type not set'),
+    ('CC_P\n10 10 10\n10 10', 3, 'Expected the X Y Z coordinates'),
+    ('CC_P\n10 ten 10', 2, 'could not convert'),
+    ('SC_P\n7 90', 2, 'not within the valid servo pins'),
+    ('DC_P\nWaterPulses -5', 2, 'Negative pulse length'),
+    ('DC_P\nCHECK 2', 2, 'Tool state'),
+    ('DC_P\nLight 1', 2, "Unknown device command 'Light'"),
+    ('TD_P\n5', 2, "Expected a delay as 'Tn'"),
+    ('TD_P\nT1\nTx', 3, "Delay 'x' is not an integer"),
+    ('VC_P\nPAN\nMOSAIC', 3, 'Missing argument'),
+    ('VC_P\nZOOM', 2, "Unknown vision command 'ZOOM'"),
+])
+def test_rejected_lines(sequence, line, message):
+    with pytest.raises(sc.SequenceError, match=message) as error:
+        compile_lines(sequence)
+    assert error.value.line == line
+    assert str(error.value).startswith(f'line {line} ')
+
+
+def test_moves_checked_against_the_reach():
+    limits = fcode.Limits({55: 5, 56: 5, 141: 5000, 142: 5000})
+    sequence = 'CC_P\n100 100 0\nVC_P\nPAN\nCC_P\n1500 100 0\n'
+    with pytest.raises(sc.SequenceError, match='out of the reach') as error:
+        compile_lines(sequence, sc.SequenceCompiler(limits, (400.0, 400.0, 400.0)))
+    assert error.value.line == 6
+
+    # Clamped moves are accepted, move_gantry_abs clamps them when they are sent
+    instructions = compile_lines(sequence, sc.SequenceCompiler(limits, (400.0, 400.0, 400.0), clamp=True))
+    assert instructions[-1] == (sc.MOVE, (1500.0, 100.0, 0.0), 6)
+
+
+def test_command_type_carries_over():
+    compiler = sc.SequenceCompiler()
+    compile_lines('CC_P\n1 2 3', compiler)
+    assert compile_lines('4 5 6', compiler) == [(sc.MOVE, (4.0, 5.0, 6.0), 1)]
+
+    # A rejected sequence does not change the command type
+    with pytest.raises(sc.SequenceError):
+        compile_lines('DC_P\nVacuum x', compiler)
+    assert compile_lines('7 8 9', compiler) == [(sc.MOVE, (7.0, 8.0, 9.0), 1)]
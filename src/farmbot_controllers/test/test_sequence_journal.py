@@ -0,0 +1,79 @@
+from farmbot_controllers import sequence_compiler as sc
+from farmbot_controllers.sequence_journal import SequenceJournal
+
+
+def compile_lines(text: str) -> list:
+    return sc.SequenceCompiler().compile(text.split('\n'))
+
+
+def as_tuples(instructions: list) -> list:
+    return [(i.op, i.args, i.line) for i in instructions]
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'journal' / 'sequence.journal'
+    first = compile_lines('CC_P\n100 200 0\n100 200 -50')
+    second = compile_lines('DC_P\nWaterPulses 500\nVC_P\nCALIB 1')
+    journal = SequenceJournal(str(path))
+    journal.start(first)
+    journal.confirm()
+    journal.extend(second)
+    assert journal.pending == 3
+    journal.close()
+
+    # Loaded again after a restart of the node
+    instructions, done = SequenceJournal(str(path)).load()
+    assert as_tuples(instructions) == as_tuples(first + second)
+    assert done == 1
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path = tmp_path / 'sequence.journal'
+    journal = SequenceJournal(str(path))
+    journal.start(compile_lines('CC_P\n1 2 3\n4 5 6\n7 8 9'))
+    journal.confirm()
+    journal.close()
+    with open(path, 'a') as file:
+        file.write('{"done":')
+
+    journal = SequenceJournal(str(path))
+    instructions, done = journal.load()
+    assert len(instructions) == 3
+    assert done == 1
+    # The journal is rewritten without the torn record, and records can follow it
+    journal.confirm()
+    journal.close()
+    assert SequenceJournal(str(path)).load()[1] == 2
+
+
+def test_done_cursor(tmp_path):
+    path = tmp_path / 'sequence.journal'
+    journal = SequenceJournal(str(path))
+    journal.start(compile_lines('CC_P\n1 2 3\n4 5 6\n7 8 9'))
+    journal.confirm()
+    journal.confirm()
+    assert journal.pending == 1
+
+    instructions, done = SequenceJournal(str(path)).load()
+    assert done == 2
+    assert as_tuples(instructions[done:]) == [(sc.MOVE, (7.0, 8.0, 9.0), 4)]
+
+
+def test_finished_job_is_not_resumed(tmp_path):
+    path = tmp_path / 'sequence.journal'
+    journal = SequenceJournal(str(path))
+    journal.start(compile_lines('CC_P\n1 2 3'))
+    journal.finish()
+    assert path.read_text() == ''
+    assert SequenceJournal(str(path)).load() == ([], 0)
+
+    # All the steps confirmed, but the job was not finished
+    journal.start(compile_lines('CC_P\n1 2 3'))
+    journal.confirm()
+    journal.close()
+    assert SequenceJournal(str(path)).load() == ([], 0)
+    assert path.read_text() == ''
+
+
+def test_missing_journal(tmp_path):
+    assert SequenceJournal(str(tmp_path / 'sequence.journal')).load() == ([], 0)
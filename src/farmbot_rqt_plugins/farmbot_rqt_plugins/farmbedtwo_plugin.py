@@ -24,8 +24,9 @@ from PyQt5.QtWidgets import (
     QCheckBox,
 )
 
+from rclpy.qos import QoSProfile, DurabilityPolicy
 from rqt_gui_py.plugin import Plugin
-from std_msgs.msg import String
+from farmbot_interfaces.msg import PositionReport
 
 # Temp Constants TODO: remove
 WIDTH = 6000
@@ -46,8 +47,9 @@ class FarmbedTwoPlugin(Plugin):
         self.gantry_z = 0.0
 
         # Create subscriber for gantry position feedback
-        self._uart_rx_sub = self._node.create_subscription(
-            String, 'uart_receive', self._uart_feedback_callback, 10)
+        self._position_sub = self._node.create_subscription(
+            PositionReport, 'position', self._position_callback,
+            QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL))
 
         # Initialize map data
         self.active_map = None
@@ -123,22 +125,14 @@ class FarmbedTwoPlugin(Plugin):
         # Enable focus to receive key events
         self._widget.setFocusPolicy(Qt.StrongFocus)
 
-    def _uart_feedback_callback(self, msg):
-        """Handle feedback from UART to update gantry position"""
-        try:
-            msg_split = msg.data.split(' ')
-            report_code = msg_split[0]
-
-            if report_code == 'R82' and len(msg_split) >= 4:
-                self.gantry_x = float(msg_split[1][1:])  # Remove 'X' prefix
-                self.gantry_y = float(msg_split[2][1:])  # Remove 'Y' prefix
-                self.gantry_z = float(msg_split[3][1:])  # Remove 'Z' prefix
-
-                # Redraw gantry position
-                self._redraw_gantry()
-        except (ValueError, IndexError) as e:
-            self._node.get_logger().warning(
-                f'Error parsing UART feedback: {e}')
+    def _position_callback(self, msg):
+        """Handle the position reported by the Farmduino to update the gantry"""
+        self.gantry_x = msg.x
+        self.gantry_y = msg.y
+        self.gantry_z = msg.z
+
+        # Redraw gantry position
+        self._redraw_gantry()
 
     def _create_left_panel(self):
         """Create the left side panel split into toggles and plant details"""
@@ -1,10 +1,18 @@
 import os
+from rclpy.qos import QoSProfile, DurabilityPolicy
 from std_msgs.msg import String
+from farmbot_interfaces.msg import PositionReport
 from ament_index_python.packages import get_package_share_directory
 from python_qt_binding import loadUi
 from rqt_gui_py.plugin import Plugin
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QWidget
 
+# A directional button held longer than this (ms) jogs continuously until it is released
+LONG_PRESS_MS = 300
+# Period (ms) at which a held continuous jog is refreshed (FarmbotControl jog_timeout)
+JOG_REFRESH_MS = 400
+
 
 class MovementPlugin(Plugin):
     def __init__(self, context):
@@ -20,6 +28,16 @@ class MovementPlugin(Plugin):
         self._cur_z = 0.0
         self._cur_increment = 10.0
 
+        # Continuous jog of the held directional button (e.g. 'X +'), None while stepping
+        self._held_jog = None
+        self._jog = None
+        self._jog_done = False
+        self._long_press_timer = QTimer()
+        self._long_press_timer.setSingleShot(True)
+        self._long_press_timer.timeout.connect(self._start_jog)
+        self._jog_refresh_timer = QTimer()
+        self._jog_refresh_timer.timeout.connect(self._refresh_jog)
+
         # Create QWidget
         self._widget = QWidget()
 
@@ -37,8 +55,9 @@ class MovementPlugin(Plugin):
             String, 'input_topic', 10)
 
         # Create subscriber for position feedback
-        self._uart_rx_sub = self._node.create_subscription(
-            String, 'uart_receive', self._uart_feedback_callback, 10)
+        self._position_sub = self._node.create_subscription(
+            PositionReport, 'position', self._position_callback,
+            QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL))
 
         # Connect UI signals
         self._connect_signals()
@@ -57,6 +76,12 @@ class MovementPlugin(Plugin):
         self._widget.button_right.clicked.connect(self._handle_right_clicked)
         self._widget.button_home.clicked.connect(self._handle_home_clicked)
 
+        # Holding a directional button jogs continuously
+        for button, jog in ((self._widget.button_up, 'X +'), (self._widget.button_down, 'X -'),
+                            (self._widget.button_left, 'Y -'), (self._widget.button_right, 'Y +')):
+            button.pressed.connect(lambda jog=jog: self._handle_jog_pressed(jog))
+            button.released.connect(self._handle_jog_released)
+
         # Connect increment radio buttons
         self._widget.radioButton_small.toggled.connect(
             self._handle_increment_changed)
@@ -69,25 +94,64 @@ class MovementPlugin(Plugin):
         '''
         Handle Up button click - move in positive X direction
         '''
-        self._send_command('w')
+        self._send_step('w')
 
     def _handle_down_clicked(self):
         '''
         Handle Down button click - move in negative X direction
         '''
-        self._send_command('s')
+        self._send_step('s')
 
     def _handle_left_clicked(self):
         '''
         Handle Left button click - move in negative Y direction
         '''
-        self._send_command('a')
+        self._send_step('a')
 
     def _handle_right_clicked(self):
         '''
         Handle Right button click - move in positive Y direction
         '''
-        self._send_command('d')
+        self._send_step('d')
+
+    def _handle_jog_pressed(self, jog):
+        '''
+        Handle a directional button press - jog continuously if it is held long enough
+        '''
+        self._held_jog = jog
+        self._long_press_timer.start(LONG_PRESS_MS)
+
+    def _handle_jog_released(self):
+        '''
+        Handle a directional button release - stop the continuous jog right away
+        '''
+        self._long_press_timer.stop()
+        self._held_jog = None
+        if self._jog is not None:
+            self._jog = None
+            self._jog_refresh_timer.stop()
+            self._send_command('JOG STOP')
+            # The click following the release is not a step
+            self._jog_done = True
+
+    def _start_jog(self):
+        if self._held_jog is not None:
+            self._jog = self._held_jog
+            self._send_command(f'JOG {self._jog}')
+            self._jog_refresh_timer.start(JOG_REFRESH_MS)
+
+    def _refresh_jog(self):
+        if self._jog is not None:
+            self._send_command(f'JOG {self._jog}')
+
+    def _send_step(self, cmd):
+        '''
+        Send a step (fixed increment) move, unless the button was held for a continuous jog
+        '''
+        if self._jog_done:
+            self._jog_done = False
+            return
+        self._send_command(cmd)
 
     def _handle_home_clicked(self):
         '''
@@ -115,33 +179,30 @@ class MovementPlugin(Plugin):
         '''
         msg = String()
         msg.data = cmd
-        print(f"Sending: {msg.data}")  # TODO: remove
         self._input_pub.publish(msg)
 
-    def _uart_feedback_callback(self, msg):
+    def _position_callback(self, msg):
         '''
-        Handle feedback from UART
+        Handle the position reported by the Farmduino
         '''
-        print(f"Received: {msg.data}")  # TODO: remove
-
-        msg_split = msg.data.split(' ')
-        report_code = msg_split[0]
-
-        if report_code == 'R82':
-            self._cur_x = float(msg_split[1][1:])
-            self._cur_y = float(msg_split[2][1:])
-            self._cur_z = float(msg_split[3][1:])
+        self._cur_x = msg.x
+        self._cur_y = msg.y
+        self._cur_z = msg.z
 
-            # Update position display in UI
-            self._widget.label_x_value.setText(f"{self._cur_x:.1f}")
-            self._widget.label_y_value.setText(f"{self._cur_y:.1f}")
-            self._widget.label_z_value.setText(f"{self._cur_z:.1f}")
+        # Update position display in UI
+        self._widget.label_x_value.setText(f"{self._cur_x:.1f}")
+        self._widget.label_y_value.setText(f"{self._cur_y:.1f}")
+        self._widget.label_z_value.setText(f"{self._cur_z:.1f}")
 
     def shutdown_plugin(self):
         '''
         Clean up resources when plugin is shut down
         '''
-        self._node.destroy_subscription(self._uart_rx_sub)
+        self._long_press_timer.stop()
+        self._jog_refresh_timer.stop()
+        if self._jog is not None:
+            self._send_command('JOG STOP')
+        self._node.destroy_subscription(self._position_sub)
         self._node.destroy_publisher(self._input_pub)
 
     def save_settings(self, plugin_settings, instance_settings):
@@ -5,8 +5,9 @@ import math
 
 import rclpy
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, DurabilityPolicy
 from ament_index_python.packages import get_package_share_directory
-from farmbot_interfaces.msg import MapCommand, PlantManage
+from farmbot_interfaces.msg import MapCommand, PlantManage, MapBounds
 from farmbot_interfaces.srv import StringRepReq
 from map_handler.tool_sequencer import ToolDetails, ToolExchanger
 
@@ -69,6 +70,10 @@ class MapController(Node):
         self.plant_mng_sub_ = self.create_subscription(PlantManage, 'plant_mng', self.plant_mng_callback, 10)
         # Map information service server
         self.map_info_server_ = self.create_service(StringRepReq, 'map_info', self.map_command_server)
+        # Reach of the gantry from the map dimensions (latched, for the move validation of late joiners)
+        self.map_bounds_pub_ = self.create_publisher(MapBounds, 'map_bounds',
+                                                     QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL))
+        self.publish_bounds()
 
         self.get_logger().info('Map Controller Initialized')
 
@@ -114,9 +119,20 @@ class MapController(Node):
                                                  map_max_z = -self.map_instance_['map_reference']['z_len'])
             # Save the new active map
             self.save_to_yaml(self.map_instance_, self.directory_, self.active_map_file_, create_if_empty = True)
+            self.publish_bounds()
         if cmd.back_up:
             pass
 
+    def publish_bounds(self):
+        '''
+        Publishes the reach of the gantry from the dimensions of the active map
+        '''
+        bounds = MapBounds()
+        bounds.x_len = float(self.map_instance_['map_reference']['x_len'])
+        bounds.y_len = float(self.map_instance_['map_reference']['y_len'])
+        bounds.z_len = float(self.map_instance_['map_reference']['z_len'])
+        self.map_bounds_pub_.publish(bounds)
+
     def plant_mng_callback(self, cmd: PlantManage):
         '''
         Plant managing commands. Adding and removing plants from the map